@@ -0,0 +1,114 @@
+import caliscope.logger
+
+from enum import Enum
+from queue import Queue
+
+from caliscope.packets import FramePacket, SyncPacket
+
+logger = caliscope.logger.get(__name__)
+
+DISPLAY_QUEUE_SIZE = 2  # packets awaiting display in the GUI; when it falls behind, older ones are never shown
+
+
+class OverflowPolicy(Enum):
+    """
+    What a BoundedQueue does with a new item when it is already full
+    """
+
+    BLOCK = "block"  # standard Queue behavior: the producer waits for room
+    DROP_OLDEST = "drop_oldest"  # discard the oldest item to make room; producer never waits
+    DROP_FRAMES = "drop_frames"  # keep the new item but strip its frames, retaining points and timing
+
+
+def strip_frames(item):
+    """
+    Returns a copy of the packet without any image data. Points, frame indices and frame times are
+    retained so that downstream point data remains complete. Items that are not packets pass through
+    """
+    if isinstance(item, FramePacket):
+        return FramePacket(
+            port=item.port,
+            frame_index=item.frame_index,
+            frame_time=item.frame_time,
+            frame=None,
+            points=item.points,
+            draw_instructions=item.draw_instructions,
+        )
+    elif isinstance(item, SyncPacket):
+        return SyncPacket(
+            sync_index=item.sync_index,
+            frame_packets={
+                port: None if frame_packet is None else strip_frames(frame_packet)
+                for port, frame_packet in item.frame_packets.items()
+            },
+        )
+    else:
+        return item
+
+
+def _holds_frames(item) -> bool:
+    """
+    None and other sentinels signal the end of a stream to the consumer, so are never dropped
+    """
+    return isinstance(item, (FramePacket, SyncPacket))
+
+
+class BoundedQueue(Queue):
+    """
+    queue.Queue with an explicit policy for what happens once maxsize is reached,
+    along with a record of how close it has come to that limit.
+
+    With DROP_FRAMES, stripped packets are still enqueued beyond maxsize. maxsize then caps the
+    number of full-resolution frames held, while the (small) point data is never lost.
+    """
+
+    def __init__(self, maxsize: int = 0, policy: OverflowPolicy = OverflowPolicy.BLOCK, name: str = ""):
+        super().__init__(maxsize)
+        self.policy = OverflowPolicy(policy)
+        self.name = name
+
+        self.high_water_mark = 0  # largest number of items held at one time
+        self.dropped_count = 0  # items discarded under DROP_OLDEST
+        self.stripped_count = 0  # items that lost their frames under DROP_FRAMES
+
+    def put(self, item, block=True, timeout=None):
+        if self.maxsize <= 0 or self.policy == OverflowPolicy.BLOCK:
+            super().put(item, block, timeout)
+            return
+
+        with self.not_full:
+            if self._qsize() >= self.maxsize:
+                if self.policy == OverflowPolicy.DROP_OLDEST:
+                    self._drop_oldest()
+                elif self.policy == OverflowPolicy.DROP_FRAMES and _holds_frames(item):
+                    item = strip_frames(item)
+                    self.stripped_count += 1
+
+            self._put(item)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+
+    def _drop_oldest(self):
+        for position, queued_item in enumerate(self.queue):
+            if _holds_frames(queued_item):
+                del self.queue[position]
+                self.unfinished_tasks -= 1
+                self.dropped_count += 1
+                if self.dropped_count % 100 == 1:
+                    logger.info(f"Queue {self.name} full; {self.dropped_count} item(s) dropped so far")
+                return
+
+    def _put(self, item):
+        super()._put(item)
+        self.high_water_mark = max(self.high_water_mark, self._qsize())
+
+    @property
+    def metrics(self) -> dict:
+        return {
+            "maxsize": self.maxsize,
+            "policy": self.policy.value,
+            "size": self.qsize(),
+            "high_water_mark": self.high_water_mark,
+            "dropped": self.dropped_count,
+            "stripped": self.stripped_count,
+        }
@@ -5,12 +5,20 @@ import caliscope.logger
 
 from pathlib import Path
 import pickle
+from time import perf_counter
 from dataclasses import dataclass
 import numpy as np
 import cv2
+from numba import jit, prange
 from scipy.optimize import least_squares
+from scipy.sparse import csr_matrix
 
 from caliscope.calibration.capture_volume.point_estimates import PointEstimates
+from caliscope.calibration.capture_volume.schur_complement import schur_levenberg_marquardt
+from caliscope.calibration.capture_volume.helper_functions.select_sync_indices import (
+    select_sync_indices,
+    PAIR_SYNC_INDEX_BUDGET,
+)
 from caliscope.calibration.charuco import Charuco
 from caliscope.cameras.camera_array import CameraArray
 from caliscope.calibration.capture_volume.set_origin_functions import (
@@ -21,6 +29,11 @@ logger = caliscope.logger.get(__name__)
 
 CAMERA_PARAM_COUNT = 6
 
+# robust loss scale as a multiple of the robust standard deviation of reprojection error
+ROBUST_LOSS_TUNING = {"huber": 1.345, "cauchy": 2.385}
+# observations this many robust standard deviations above the median reprojection error are dropped
+OUTLIER_THRESHOLD_SIGMA = 3.0
+
 
 @dataclass
 class CaptureVolume:
@@ -87,39 +100,201 @@ class CaptureVolume:
 
         return error
 
-    def optimize(self):
+    def _solve(self, solver: str, observation_weights: np.ndarray = None):
+        """
+        Run a bundle adjustment from the current parameters and update the camera array
+        and point estimates with the result. least_sq_result.fun always holds the
+        unweighted reprojection error so that rmse reflects the actual fit.
+        """
         # Original example taken from https://scipy-cookbook.readthedocs.io/items/bundle_adjustment.html
 
         initial_param_estimate = self.get_vectorized_params()
 
-        # get a snapshot of where things are at the start
-        initial_xy_error = xy_reprojection_error(initial_param_estimate, self)
+        if solver == "trf":
+            self.least_sq_result = least_squares(
+                xy_reprojection_error,
+                initial_param_estimate,
+                jac=xy_reprojection_jacobian,
+                verbose=2,
+                x_scale="jac",
+                loss="linear",
+                ftol=1e-8,
+                method="trf",
+                # both xy_reprojection_error and its jacobian take the vectorized param estimates as first arg and capture volume as second
+                args=(self,),
+                kwargs={"observation_weights": observation_weights},
+            )
+        elif solver == "schur":
+            port_index = self.camera_array.port_index
+            self.least_sq_result = schur_levenberg_marquardt(
+                lambda x, with_jacobian: _project_capture_volume(
+                    x, self, with_jacobian, observation_weights
+                ),
+                initial_param_estimate,
+                self.point_estimates.get_camera_slots(port_index),
+                self.point_estimates.get_point_groups(),
+                len(port_index),
+                ftol=1e-8,
+            )
+        else:
+            raise ValueError(f"Unknown bundle adjustment solver: {solver}")
+
+        if observation_weights is not None:
+            self.least_sq_result.fun = xy_reprojection_error(self.least_sq_result.x, self)
 
+        self.camera_array.update_extrinsic_params(self.least_sq_result.x)
+        self.point_estimates.update_obj_xyz(self.least_sq_result.x)
+
+    def optimize(self, solver: str = "trf"):
+        """
+        solver:
+            "trf": scipy's trust region reflective least_squares over cameras and points together
+            "schur": Levenberg-Marquardt on the reduced camera system, with the points
+                eliminated by a Schur complement and recovered by back-substitution
+        """
         # logger.info(
         #     f"Prior to bundle adjustment (stage {str(self.stage)}), RMSE is: {self.rmse}"
         # )
-        logger.info(f"Beginning bundle adjustment to calculated stage {self.stage+1}")
-        self.least_sq_result = least_squares(
-            xy_reprojection_error,
-            initial_param_estimate,
-            jac_sparsity=self.point_estimates.get_sparsity_pattern(),
-            verbose=2,
-            x_scale="jac",
-            loss="linear",
-            ftol=1e-8,
-            method="trf",
-            # xy_reprojection error takes the vectorized param estimates as first arg and capture volume as second
-            args=(self,),
+        logger.info(f"Beginning bundle adjustment to calculated stage {self.stage+1} using {solver} solver")
+        self._solve(solver)
+        self.stage += 1
+
+        logger.info(
+            f"Following bundle adjustment (stage {str(self.stage)}), RMSE is: {self.rmse['overall']}"
         )
 
-        self.camera_array.update_extrinsic_params(self.least_sq_result.x)
-        self.point_estimates.update_obj_xyz(self.least_sq_result.x)
+    def optimize_robust(
+        self,
+        loss: str = "huber",
+        loss_scale: float = None,
+        outlier_threshold: float = OUTLIER_THRESHOLD_SIGMA,
+        max_passes: int = 5,
+        solver: str = "trf",
+    ):
+        """
+        Single pass alternative to optimize -> QualityController.filter_point_estimates -> optimize.
+
+        Iteratively reweighted least squares: after each warm started solve, observations are
+        reweighted according to a robust loss ("huber" or "cauchy") of their reprojection
+        error and observations whose error is more than outlier_threshold robust standard deviations
+        above the median are given zero weight. Because observations are only reweighted, the
+        jacobian structure is reused across passes. Outliers are removed from the point estimates
+        (along with any object points left with fewer than 2 observations) once at the end.
+
+        loss_scale: reprojection error in pixels beyond which the loss is down-weighted.
+            Defaults to the conventional multiple of the robust standard deviation.
+        """
+        if loss not in ROBUST_LOSS_TUNING:
+            raise ValueError(f"Unknown robust loss: {loss}")
+
+        logger.info(f"Beginning robust ({loss}) bundle adjustment to calculated stage {self.stage+1}")
+        observation_weights = None
+        inliers = np.ones(self.point_estimates.n_img_points, dtype=bool)
+
+        for robust_pass in range(max_passes):
+            self._solve(solver, observation_weights)
+
+            error = np.sqrt(np.sum(self.least_sq_result.fun.reshape(-1, 2) ** 2, axis=1))
+            if robust_pass == 0:
+                # the error distribution is characterized once from the unweighted solution.
+                # Re-estimating it each pass lets it collapse: points whose other observations
+                # were dropped fit their remaining observation exactly, dragging the median down
+                median_error = np.median(error)
+                sigma = 1.4826 * np.median(np.abs(error - median_error))
+                outlier_cutoff = median_error + outlier_threshold * sigma
+                scale = loss_scale if loss_scale is not None else ROBUST_LOSS_TUNING[loss] * sigma
+
+            new_inliers = error <= outlier_cutoff
+            scaled_error = error / max(scale, 1e-12)
+            if loss == "huber":
+                weights = np.minimum(1, 1 / np.maximum(scaled_error, 1e-12))
+            else:  # cauchy
+                weights = 1 / (1 + scaled_error**2)
+            weights[~new_inliers] = 0
+
+            # weights multiply the residuals, so they enter the least squares as their square root
+            new_observation_weights = np.sqrt(weights)
+
+            logger.info(
+                f"Robust pass {robust_pass+1}: RMSE {self.rmse['overall']:.3f}, "
+                f"{np.sum(~new_inliers)} observations flagged as outliers"
+            )
+
+            converged = (
+                observation_weights is not None
+                and (new_inliers == inliers).all()
+                and np.abs(new_observation_weights - observation_weights).max() < 1e-3
+            )
+            inliers = new_inliers
+            observation_weights = new_observation_weights
+            if converged:
+                break
+
+        # remove outliers along with object points that can no longer be located
+        obj_observation_count = np.bincount(
+            self.point_estimates.obj_indices[inliers], minlength=self.point_estimates.n_obj_points
+        )
+        keep = inliers & (obj_observation_count[self.point_estimates.obj_indices] > 1)
+        logger.info(f"Removing {np.sum(~keep)} of {keep.size} observations from the point estimates")
+
+        self.point_estimates, _ = self.point_estimates.get_observation_subset(keep)
+        self.least_sq_result.fun = xy_reprojection_error(self.get_vectorized_params(), self)
         self.stage += 1
 
         logger.info(
-            f"Following bundle adjustment (stage {str(self.stage)}), RMSE is: {self.rmse['overall']}"
+            f"Following robust bundle adjustment (stage {str(self.stage)}), RMSE is: {self.rmse['overall']}"
+        )
+
+    def optimize_coarse_to_fine(
+        self,
+        pair_budget: int = PAIR_SYNC_INDEX_BUDGET,
+        solver: str = "trf",
+        robust: bool = False,
+    ):
+        """
+        Neighbouring frames show nearly the same board pose, so most observations add little
+        information about the cameras. First optimize on a spatially and temporally stratified
+        subset of sync indices (at most pair_budget per camera pair) and then warm start
+        the optimization of the full set from the result. If robust, the refinement
+        is done with optimize_robust.
+
+        The time spent in each phase is stored in self.phase_timings
+        """
+        self.phase_timings = {}
+        start = perf_counter()
+
+        selected_sync_indices = select_sync_indices(self.point_estimates, pair_budget)
+        subset, obj_rows = self.point_estimates.get_sync_index_subset(selected_sync_indices)
+        self.phase_timings["selection"] = perf_counter() - start
+
+        logger.info(
+            f"Coarse optimization on {subset.n_img_points} of {self.point_estimates.n_img_points} observations "
+            f"from {selected_sync_indices.size} sync indices"
         )
 
+        if subset.n_img_points < self.point_estimates.n_img_points:
+            start = perf_counter()
+            # the camera array is shared so the coarse solution updates it directly
+            coarse_volume = CaptureVolume(self.camera_array, subset)
+            coarse_volume.optimize(solver=solver)
+
+            obj = self.point_estimates.obj.copy()
+            obj[obj_rows] = subset.obj
+            self.point_estimates.obj = obj
+            self.phase_timings["coarse"] = perf_counter() - start
+
+        start = perf_counter()
+        if robust:
+            self.optimize_robust(solver=solver)
+        else:
+            self.optimize(solver=solver)
+        self.phase_timings["refinement"] = perf_counter() - start
+
+        timing_summary = ", ".join(
+            f"{phase}: {seconds:.2f}s" for phase, seconds in self.phase_timings.items()
+        )
+        logger.info(f"Coarse to fine bundle adjustment timings: {timing_summary}")
+
     def get_xyz_points(self):
         """Get 3d positions arrived at by bundle adjustment"""
         n_cameras = len(self.camera_array.cameras)
@@ -159,73 +334,231 @@ class CaptureVolume:
         self.shift_origin(origin_transform)
 
 
-def xy_reprojection_error(current_param_estimates, capture_volume: CaptureVolume):
+@jit(nopython=True, parallel=True, cache=True)
+def project_observations(
+    rotations: np.ndarray,
+    rotation_jacobians: np.ndarray,
+    translations: np.ndarray,
+    intrinsics: np.ndarray,
+    distortions: np.ndarray,
+    points_3d: np.ndarray,
+    camera_slots: np.ndarray,
+    obj_indices: np.ndarray,
+    img: np.ndarray,
+    with_jacobian: bool,
+):
     """
-    current_param_estimates: the current iteration of the vector that was originally initialized for the x0 input of least squares
+    Projects every observation through its camera in one pass, applying the same
+    5 term distortion model as cv2.projectPoints.
+
+    rotations: (n_cameras, 3, 3)
+    rotation_jacobians: (n_cameras, 3, 9) derivative of the flattened rotation matrix
+        with respect to each element of the rodrigues vector (as returned by cv2.Rodrigues)
+    translations: (n_cameras, 3)
+    intrinsics: (n_cameras, 4) as fx, fy, cx, cy
+    distortions: (n_cameras, 5) as k1, k2, p1, p2, k3
+
+    returns:
+        residuals: (n, 2) projected minus observed image points
+        jacobian: (n, 2, 9) derivatives of the x and y residuals with respect to the 6 camera
+            parameters followed by the 3 object point coordinates. Empty if not requested.
+    """
+    n = camera_slots.shape[0]
+    residuals = np.empty((n, 2), dtype=np.float64)
+    if with_jacobian:
+        jacobian = np.zeros((n, 2, 9), dtype=np.float64)
+    else:
+        jacobian = np.zeros((0, 2, 9), dtype=np.float64)
+
+    for i in prange(n):
+        c = camera_slots[i]
+        o = obj_indices[i]
+
+        fx = intrinsics[c, 0]
+        fy = intrinsics[c, 1]
+        cx = intrinsics[c, 2]
+        cy = intrinsics[c, 3]
+        k1 = distortions[c, 0]
+        k2 = distortions[c, 1]
+        p1 = distortions[c, 2]
+        p2 = distortions[c, 3]
+        k3 = distortions[c, 4]
+
+        X = points_3d[o, 0]
+        Y = points_3d[o, 1]
+        Z = points_3d[o, 2]
+
+        # point in camera frame
+        P = np.empty(3)
+        for a in range(3):
+            P[a] = (
+                rotations[c, a, 0] * X
+                + rotations[c, a, 1] * Y
+                + rotations[c, a, 2] * Z
+                + translations[c, a]
+            )
 
-    This function exists outside of the CaptureVolume class because the first argument must be the vector of parameters
-    that is being adjusted by the least_squares optimization.
+        inv_z = 1.0 / P[2]
+        x = P[0] * inv_z
+        y = P[1] * inv_z
+
+        r2 = x * x + y * y
+        radial = 1 + k1 * r2 + k2 * r2 * r2 + k3 * r2 * r2 * r2
+        x_distorted = x * radial + 2 * p1 * x * y + p2 * (r2 + 2 * x * x)
+        y_distorted = y * radial + p1 * (r2 + 2 * y * y) + 2 * p2 * x * y
+
+        residuals[i, 0] = fx * x_distorted + cx - img[i, 0]
+        residuals[i, 1] = fy * y_distorted + cy - img[i, 1]
+
+        if with_jacobian:
+            # chain rule: residual <- distorted point <- normalized point <- camera frame point
+            radial_dr2 = k1 + 2 * k2 * r2 + 3 * k3 * r2 * r2
+            dxd_dx = radial + 2 * x * x * radial_dr2 + 2 * p1 * y + 6 * p2 * x
+            dxd_dy = 2 * x * y * radial_dr2 + 2 * p1 * x + 2 * p2 * y
+            dyd_dx = dxd_dy
+            dyd_dy = radial + 2 * y * y * radial_dr2 + 6 * p1 * y + 2 * p2 * x
+
+            dres_dP = np.empty((2, 3))
+            dres_dP[0, 0] = fx * dxd_dx * inv_z
+            dres_dP[0, 1] = fx * dxd_dy * inv_z
+            dres_dP[0, 2] = -fx * (dxd_dx * x + dxd_dy * y) * inv_z
+            dres_dP[1, 0] = fy * dyd_dx * inv_z
+            dres_dP[1, 1] = fy * dyd_dy * inv_z
+            dres_dP[1, 2] = -fy * (dyd_dx * x + dyd_dy * y) * inv_z
+
+            for axis in range(2):
+                # rotation: dP/dr_k = dR/dr_k @ X
+                for k in range(3):
+                    total = 0.0
+                    for a in range(3):
+                        dP_a = (
+                            rotation_jacobians[c, k, 3 * a] * X
+                            + rotation_jacobians[c, k, 3 * a + 1] * Y
+                            + rotation_jacobians[c, k, 3 * a + 2] * Z
+                        )
+                        total += dres_dP[axis, a] * dP_a
+                    jacobian[i, axis, k] = total
+
+                # translation: dP/dt = I
+                for a in range(3):
+                    jacobian[i, axis, 3 + a] = dres_dP[axis, a]
+
+                # object point: dP/dX = R
+                for b in range(3):
+                    total = 0.0
+                    for a in range(3):
+                        total += dres_dP[axis, a] * rotations[c, a, b]
+                    jacobian[i, axis, 6 + b] = total
+
+    return residuals, jacobian
+
+
+def _project_capture_volume(
+    current_param_estimates,
+    capture_volume: CaptureVolume,
+    with_jacobian: bool,
+    observation_weights: np.ndarray = None,
+):
+    """
+    Unpack the parameter vector and the camera intrinsics into arrays indexed by
+    camera slot (CameraArray.port_index) and project all observations.
 
+    observation_weights: optional (n,) multipliers applied to the residuals (and jacobian)
+        of each observation; a weight of 0 removes the observation from the fit
     """
-    # Create one combined array primarily to make sure all calculations line up
-    ## unpack the working estimates of the camera parameters (could be extr. or intr.)
-    camera_params = current_param_estimates[
-        : capture_volume.point_estimates.n_cameras * CAMERA_PARAM_COUNT
-    ].reshape((capture_volume.point_estimates.n_cameras, CAMERA_PARAM_COUNT))
+    port_index = capture_volume.camera_array.port_index
+    n_cameras = len(port_index)
+    point_estimates = capture_volume.point_estimates
+
+    ## unpack the working estimates of the camera parameters
+    camera_params = current_param_estimates[: n_cameras * CAMERA_PARAM_COUNT].reshape(
+        (n_cameras, CAMERA_PARAM_COUNT)
+    )
 
     ## similarly unpack the 3d point location estimates
-    points_3d = current_param_estimates[
-        capture_volume.point_estimates.n_cameras * CAMERA_PARAM_COUNT :
-    ].reshape((capture_volume.point_estimates.n_obj_points, 3))
-
-    ## create zero columns as placeholders for the reprojected 2d points
-    rows = capture_volume.point_estimates.camera_indices.shape[0]
-    blanks = np.zeros((rows, 2), dtype=np.float64)
-
-    ## hstack all these arrays for ease of reference
-    points_3d_and_2d = np.hstack(
-        [
-            np.array([capture_volume.point_estimates.camera_indices]).T,
-            points_3d[capture_volume.point_estimates.obj_indices],
-            capture_volume.point_estimates.img,
-            blanks,
-        ]
+    points_3d = current_param_estimates[n_cameras * CAMERA_PARAM_COUNT :].reshape(
+        (point_estimates.n_obj_points, 3)
     )
 
-    # iterate across cameras...while this injects a loop in the residual function
-    # it should scale linearly with the number of cameras...a tradeoff for stable
-    # and explicit calculations...
-    
-    for port, cam in capture_volume.camera_array.cameras.items():
-        cam_points = np.where(capture_volume.point_estimates.camera_indices == port)
-        object_points = points_3d_and_2d[cam_points][:, 1:4]
-
-        # if a camera is being ignored, it will not show up on the parameter list
-        # so you must use the port index to make sure you read the correct params
-        port_index = capture_volume.camera_array.port_index[port]
-        cam_matrix = cam.matrix
-        rvec = camera_params[port_index][0:3]
-        tvec = camera_params[port_index][3:6]
-        distortions = cam.distortions
-
-        # get the projection of the 2d points on the image plane; ignore the jacobian
-        cam_proj_points, _jac = cv2.projectPoints(
-            object_points.astype(np.float64), rvec, tvec, cam_matrix, distortions
+    rotations = np.empty((n_cameras, 3, 3), dtype=np.float64)
+    rotation_jacobians = np.empty((n_cameras, 3, 9), dtype=np.float64)
+    intrinsics = np.empty((n_cameras, 4), dtype=np.float64)
+    distortions = np.zeros((n_cameras, 5), dtype=np.float64)
+
+    for port, slot in port_index.items():
+        rotations[slot], rotation_jacobians[slot] = cv2.Rodrigues(
+            camera_params[slot, 0:3].astype(np.float64)
         )
+        cam = capture_volume.camera_array.cameras[port]
+        intrinsics[slot] = [
+            cam.matrix[0, 0],
+            cam.matrix[1, 1],
+            cam.matrix[0, 2],
+            cam.matrix[1, 2],
+        ]
+        cam_distortions = np.ravel(cam.distortions)[:5]
+        distortions[slot, : cam_distortions.size] = cam_distortions
+
+    residuals, jacobian = project_observations(
+        rotations,
+        rotation_jacobians,
+        np.ascontiguousarray(camera_params[:, 3:6], dtype=np.float64),
+        intrinsics,
+        distortions,
+        np.ascontiguousarray(points_3d, dtype=np.float64),
+        point_estimates.get_camera_slots(port_index),
+        point_estimates.obj_indices,
+        point_estimates.img,
+        with_jacobian,
+    )
 
-        points_3d_and_2d[cam_points, 6:8] = cam_proj_points[:, 0, :]
+    if observation_weights is not None:
+        residuals = residuals * observation_weights[:, None]
+        if with_jacobian:
+            jacobian = jacobian * observation_weights[:, None, None]
 
-    points_proj = points_3d_and_2d[:, 6:8]
+    return residuals, jacobian
 
-    xy_reprojection_error = (points_proj - capture_volume.point_estimates.img).ravel()
-    # capture_volume.rmse = rms_reproj_error(xy_reprojection_error)
-    # if round(perf_counter(), 2) * 10 % 1 == 0: # log less frequently
-    #     logger.info(
-    #         f"Optimizing... RMSE of reprojection = {capture_volume.rmse}"
-    #     )
+
+def xy_reprojection_error(
+    current_param_estimates, capture_volume: CaptureVolume, observation_weights=None
+):
+    """
+    current_param_estimates: the current iteration of the vector that was originally initialized for the x0 input of least squares
+    observation_weights: optional (n,) multipliers of each observation's x and y error
+
+    This function exists outside of the CaptureVolume class because the first argument must be the vector of parameters
+    that is being adjusted by the least_squares optimization.
+
+    """
+    residuals, _ = _project_capture_volume(
+        current_param_estimates, capture_volume, False, observation_weights
+    )
 
     # reshape the x,y reprojection error to a single vector
-    return xy_reprojection_error
+    return residuals.ravel()
+
+
+def xy_reprojection_jacobian(
+    current_param_estimates, capture_volume: CaptureVolume, observation_weights=None
+):
+    """
+    Analytic jacobian of xy_reprojection_error as a sparse (2*n_img_points, n_params) matrix.
+    Provided to least_squares in place of a finite difference estimate, which would
+    require many evaluations of the reprojection error per iteration.
+    """
+    _, jacobian = _project_capture_volume(
+        current_param_estimates, capture_volume, True, observation_weights
+    )
+
+    indices, indptr = capture_volume.point_estimates.get_jacobian_structure(
+        capture_volume.camera_array.port_index
+    )
+
+    return csr_matrix(
+        (jacobian.ravel(), indices, indptr),
+        shape=(indptr.size - 1, current_param_estimates.size),
+    )
 
 
 def rms_reproj_error(xy_reproj_error, camera_indices):
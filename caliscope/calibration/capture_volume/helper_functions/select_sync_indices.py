@@ -0,0 +1,95 @@
+import caliscope.logger
+
+import numpy as np
+import pandas as pd
+
+from caliscope.calibration.capture_volume.point_estimates import PointEstimates
+
+logger = caliscope.logger.get(__name__)
+
+PAIR_SYNC_INDEX_BUDGET = 50  # board snapshots retained per camera pair for the coarse optimization
+
+
+def farthest_point_sample(features: np.ndarray, budget: int, first: int) -> np.ndarray:
+    """
+    Greedily picks `budget` rows of features such that each new pick is as far as possible
+    from everything already picked. Returns the row indices of the picks.
+    """
+    picks = [first]
+    min_distance = np.sum((features - features[first]) ** 2, axis=1)
+
+    for _ in range(budget - 1):
+        next_pick = int(np.argmax(min_distance))
+        if min_distance[next_pick] == 0:
+            break  # everything remaining is a duplicate of a pick
+        picks.append(next_pick)
+        min_distance = np.minimum(
+            min_distance, np.sum((features - features[next_pick]) ** 2, axis=1)
+        )
+
+    return np.array(picks, dtype=np.int64)
+
+
+def select_sync_indices(
+    point_estimates: PointEstimates, pair_budget: int = PAIR_SYNC_INDEX_BUDGET
+) -> np.ndarray:
+    """
+    Choose a subset of sync indices (board snapshots) that remains representative of the whole
+    calibration. For each camera pair, the sync indices where both cameras observed the same points
+    are sampled so that the picks are spread out both in where the board was (its 3d centroid)
+    and when it was there (sync index). At most `pair_budget` are retained per pair and the
+    union across pairs is returned.
+    """
+    observations = pd.DataFrame(
+        {
+            "sync_index": point_estimates.sync_indices,
+            "camera": point_estimates.camera_indices,
+            "obj_index": point_estimates.obj_indices,
+        }
+    )
+
+    # board location at each sync index
+    obj_xyz = point_estimates.obj[point_estimates.obj_indices]
+    centroids = (
+        pd.DataFrame(obj_xyz, columns=["x", "y", "z"])
+        .assign(sync_index=point_estimates.sync_indices)
+        .groupby("sync_index")
+        .mean()
+    )
+
+    # all camera pairs sharing an object point, with the number of shared points at each sync index
+    shared = observations.merge(observations, on=["obj_index", "sync_index"], suffixes=("_A", "_B"))
+    shared = shared[shared["camera_A"] < shared["camera_B"]]
+    shared_counts = (
+        shared.groupby(["camera_A", "camera_B", "sync_index"]).size().rename("shared_count").reset_index()
+    )
+
+    # scale space and time comparably so neither dominates the sampling
+    centroid_scale = np.maximum(centroids.std().to_numpy(), 1e-9)
+    sync_span = max(point_estimates.sync_indices.max() - point_estimates.sync_indices.min(), 1)
+
+    selected = []
+    for (camera_A, camera_B), pair_counts in shared_counts.groupby(["camera_A", "camera_B"]):
+        pair_sync_indices = pair_counts["sync_index"].to_numpy()
+
+        if pair_sync_indices.size <= pair_budget:
+            selected.append(pair_sync_indices)
+            continue
+
+        spatial = centroids.loc[pair_sync_indices].to_numpy() / centroid_scale
+        temporal = (pair_sync_indices / sync_span * np.sqrt(3))[:, None]
+        features = np.hstack([spatial, temporal])
+
+        # start from the snapshot the pair shares the most points in
+        first = int(np.argmax(pair_counts["shared_count"].to_numpy()))
+        picks = farthest_point_sample(features, pair_budget, first)
+        selected.append(pair_sync_indices[picks])
+
+        logger.info(
+            f"Retaining {picks.size} of {pair_sync_indices.size} sync indices for pair ({camera_A}, {camera_B})"
+        )
+
+    if len(selected) == 0:
+        return np.unique(point_estimates.sync_indices)
+
+    return np.unique(np.concatenate(selected))
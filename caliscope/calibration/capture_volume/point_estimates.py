@@ -8,8 +8,6 @@ logger = caliscope.logger.get(__name__)
 
 from pathlib import Path
 
-from scipy.sparse import lil_matrix
-
 import pandas as pd
 import numpy as np
 from dataclasses import dataclass
@@ -43,6 +41,9 @@ class PointEstimates:
         self.obj_indices = self.obj_indices.astype(np.int32)
         self.obj = self.obj.astype(np.float64)    
 
+        # index arrays derived from the observations; see _get_cached
+        self._index_cache = {}
+
     @property
     def n_cameras(self):
         return np.unique(self.camera_indices).size
@@ -55,29 +56,96 @@ class PointEstimates:
     def n_img_points(self):
         return self.img.shape[0]
 
-    def get_sparsity_pattern(self):
-        """provide the sparsity structure for the Jacobian (elements that are not zero)
-        n_points: number of unique 3d points; these will each have at least one but potentially more associated 2d points
-        point_indices: a vector that maps the 2d points to their associated 3d point
+    def _get_cached(self, key, build):
+        """
+        Index arrays that only depend on which camera/object each observation belongs to
+        are built once and reused across every residual and jacobian evaluation.
+        They remain valid for as long as camera_indices and obj_indices are the same arrays.
+        """
+        # pickled point estimates from before the cache existed will not have it
+        if not hasattr(self, "_index_cache"):
+            self._index_cache = {}
+
+        cached = self._index_cache.get(key)
+        if (
+            cached is not None
+            and cached[0] is self.camera_indices
+            and cached[1] is self.obj_indices
+        ):
+            return cached[2]
+
+        value = build()
+        self._index_cache[key] = (self.camera_indices, self.obj_indices, value)
+        return value
+
+    def get_camera_slots(self, port_index: dict) -> np.ndarray:
         """
+        The row of the camera parameters associated with each observation.
+        port_index is the CameraArray.port_index mapping of port to parameter row
+        """
+
+        def build():
+            ports = np.array(sorted(port_index.keys()), dtype=np.int64)
+            slots = np.array([port_index[port] for port in ports], dtype=np.int64)
+            return slots[np.searchsorted(ports, self.camera_indices.astype(np.int64))]
 
-        m = self.camera_indices.size * 2
-        n = self.n_cameras * CAMERA_PARAM_COUNT + self.n_obj_points * 3
-        A = lil_matrix((m, n), dtype=int)
+        return self._get_cached(("camera_slots", tuple(sorted(port_index.items()))), build)
 
-        i = np.arange(self.camera_indices.size)
-        for s in range(CAMERA_PARAM_COUNT):
-            A[2 * i, self.camera_indices * CAMERA_PARAM_COUNT + s] = 1
-            A[2 * i + 1, self.camera_indices * CAMERA_PARAM_COUNT + s] = 1
+    def get_jacobian_structure(self, port_index: dict):
+        """
+        Column indices and row pointers of the CSR jacobian of the reprojection error,
+        with camera parameter blocks assigned by CameraArray.port_index
+        """
+
+        def build():
+            return get_jacobian_indices(
+                self.get_camera_slots(port_index), self.obj_indices, len(port_index)
+            )
+
+        return self._get_cached(
+            ("jacobian_structure", tuple(sorted(port_index.items())), self.n_obj_points),
+            build,
+        )
+
+    def get_point_groups(self):
+        """
+        Observations grouped by object point as (order, starts, ends), such that
+        order[starts[p]:ends[p]] are the observations of object point p
+        """
 
-        for s in range(3):
-            A[2 * i, self.n_cameras * CAMERA_PARAM_COUNT + self.obj_indices * 3 + s] = 1
-            A[
-                2 * i + 1,
-                self.n_cameras * CAMERA_PARAM_COUNT + self.obj_indices * 3 + s,
-            ] = 1
+        def build():
+            order = np.argsort(self.obj_indices, kind="stable")
+            bounds = np.searchsorted(
+                self.obj_indices[order], np.arange(self.n_obj_points + 1)
+            )
+            return order, bounds[:-1], bounds[1:]
 
-        return A
+        return self._get_cached(("point_groups", self.n_obj_points), build)
+
+    def get_observation_subset(self, keep: np.ndarray):
+        """
+        Returns the point estimates restricted to the observations flagged in the boolean mask `keep`
+        along with the rows of self.obj that were retained, in the order of the subset's obj
+        """
+        obj_rows, obj_indices = np.unique(self.obj_indices[keep], return_inverse=True)
+
+        subset = PointEstimates(
+            sync_indices=self.sync_indices[keep],
+            camera_indices=self.camera_indices[keep],
+            point_id=self.point_id[keep],
+            img=self.img[keep],
+            obj_indices=obj_indices,
+            obj=self.obj[obj_rows],
+        )
+
+        return subset, obj_rows
+
+    def get_sync_index_subset(self, sync_indices: np.ndarray):
+        """
+        Returns the point estimates restricted to the observations made at the given sync indices
+        along with the rows of self.obj that were retained
+        """
+        return self.get_observation_subset(np.isin(self.sync_indices, sync_indices))
 
     def update_obj_xyz(self, least_sq_result_x):
         """
@@ -93,6 +161,29 @@ class PointEstimates:
         
         
  
+def get_jacobian_indices(camera_slots: np.ndarray, obj_indices: np.ndarray, n_cameras: int):
+    """
+    CSR column indices and row pointers for the jacobian of the reprojection error.
+    Each observation contributes an x and a y row, and both rows are non-zero in
+    the same 9 columns: the 6 parameters of the camera followed by the 3 coordinates
+    of the object point. Columns within a row are already sorted.
+    """
+    camera_columns = (
+        np.asarray(camera_slots, dtype=np.int64)[:, None] * CAMERA_PARAM_COUNT
+        + np.arange(CAMERA_PARAM_COUNT)
+    )
+    point_columns = (
+        n_cameras * CAMERA_PARAM_COUNT
+        + np.asarray(obj_indices, dtype=np.int64)[:, None] * 3
+        + np.arange(3)
+    )
+    row_columns = np.hstack([camera_columns, point_columns])
+
+    indices = np.repeat(row_columns, 2, axis=0).ravel()
+    indptr = np.arange(0, indices.size + 1, CAMERA_PARAM_COUNT + 3)
+    return indices, indptr
+
+
 def load_point_estimates(config:dict)->PointEstimates:
     point_estimates_dict = config["point_estimates"]
 
@@ -0,0 +1,263 @@
+import caliscope.logger
+
+from time import perf_counter
+import numpy as np
+from numba import jit, prange
+from scipy.optimize import OptimizeResult
+
+logger = caliscope.logger.get(__name__)
+
+CAMERA_PARAM_COUNT = 6
+
+
+@jit(nopython=True, cache=True)
+def build_reduced_camera_system(
+    jacobian: np.ndarray,
+    residuals: np.ndarray,
+    camera_slots: np.ndarray,
+    point_order: np.ndarray,
+    point_starts: np.ndarray,
+    point_ends: np.ndarray,
+    n_cameras: int,
+    damping: float,
+):
+    """
+    Forms the damped normal equations of the bundle adjustment and eliminates the
+    point parameters with a Schur complement, leaving a system over the cameras only.
+
+    jacobian: (n, 2, 9) per observation derivatives of the x and y residuals with respect
+        to the 6 camera parameters followed by the 3 object point coordinates
+    residuals: (n, 2)
+    point_order/point_starts/point_ends: observations grouped by object point such that
+        point_order[point_starts[p]:point_ends[p]] are the observations of point p
+
+    returns:
+        reduced: (6*n_cameras, 6*n_cameras) Schur complement of the point blocks
+        reduced_rhs: (6*n_cameras,)
+        point_inverse: (n_points, 3, 3) inverse of each damped point block
+        point_gradient: (n_points, 3)
+    """
+    n_camera_params = n_cameras * CAMERA_PARAM_COUNT
+    n_points = point_starts.shape[0]
+
+    camera_block = np.zeros((n_camera_params, n_camera_params))
+    camera_gradient = np.zeros(n_camera_params)
+
+    for i in range(jacobian.shape[0]):
+        offset = camera_slots[i] * CAMERA_PARAM_COUNT
+        for a in range(CAMERA_PARAM_COUNT):
+            camera_gradient[offset + a] += (
+                jacobian[i, 0, a] * residuals[i, 0] + jacobian[i, 1, a] * residuals[i, 1]
+            )
+            for b in range(CAMERA_PARAM_COUNT):
+                camera_block[offset + a, offset + b] += (
+                    jacobian[i, 0, a] * jacobian[i, 0, b] + jacobian[i, 1, a] * jacobian[i, 1, b]
+                )
+
+    # Levenberg-Marquardt damping scaled by the diagonal
+    for a in range(n_camera_params):
+        camera_block[a, a] *= 1 + damping
+
+    reduced = camera_block
+    reduced_rhs = -camera_gradient
+    point_inverse = np.zeros((n_points, 3, 3))
+    point_gradient = np.zeros((n_points, 3))
+
+    for p in range(n_points):
+        start = point_starts[p]
+        end = point_ends[p]
+        if end == start:
+            continue
+
+        point_block = np.zeros((3, 3))
+        for k in range(start, end):
+            i = point_order[k]
+            for a in range(3):
+                point_gradient[p, a] += (
+                    jacobian[i, 0, 6 + a] * residuals[i, 0]
+                    + jacobian[i, 1, 6 + a] * residuals[i, 1]
+                )
+                for b in range(3):
+                    point_block[a, b] += (
+                        jacobian[i, 0, 6 + a] * jacobian[i, 0, 6 + b]
+                        + jacobian[i, 1, 6 + a] * jacobian[i, 1, 6 + b]
+                    )
+
+        for a in range(3):
+            point_block[a, a] = point_block[a, a] * (1 + damping) + 1e-12
+        point_inverse[p] = np.linalg.inv(point_block)
+
+        # coupling between each observing camera and this point, pre-multiplied by the point inverse
+        coupling = np.zeros((end - start, CAMERA_PARAM_COUNT, 3))
+        for k in range(start, end):
+            i = point_order[k]
+            for a in range(CAMERA_PARAM_COUNT):
+                for b in range(3):
+                    coupling[k - start, a, b] = (
+                        jacobian[i, 0, a] * jacobian[i, 0, 6 + b]
+                        + jacobian[i, 1, a] * jacobian[i, 1, 6 + b]
+                    )
+
+        for k in range(start, end):
+            offset_k = camera_slots[point_order[k]] * CAMERA_PARAM_COUNT
+            scaled = coupling[k - start] @ point_inverse[p]
+            reduced_rhs[offset_k : offset_k + CAMERA_PARAM_COUNT] += scaled @ point_gradient[p]
+
+            for j in range(start, end):
+                offset_j = camera_slots[point_order[j]] * CAMERA_PARAM_COUNT
+                reduced[
+                    offset_k : offset_k + CAMERA_PARAM_COUNT,
+                    offset_j : offset_j + CAMERA_PARAM_COUNT,
+                ] -= scaled @ coupling[j - start].T
+
+    return reduced, reduced_rhs, point_inverse, point_gradient
+
+
+@jit(nopython=True, parallel=True, cache=True)
+def back_substitute_points(
+    jacobian: np.ndarray,
+    camera_slots: np.ndarray,
+    point_order: np.ndarray,
+    point_starts: np.ndarray,
+    point_ends: np.ndarray,
+    point_inverse: np.ndarray,
+    point_gradient: np.ndarray,
+    camera_step: np.ndarray,
+) -> np.ndarray:
+    """
+    With the camera update solved, each point update is independent:
+    point_step = -point_inverse @ (point_gradient + coupling.T @ camera_step)
+    """
+    n_points = point_starts.shape[0]
+    point_step = np.zeros((n_points, 3))
+
+    for p in prange(n_points):
+        rhs = point_gradient[p].copy()
+        for k in range(point_starts[p], point_ends[p]):
+            i = point_order[k]
+            offset = camera_slots[i] * CAMERA_PARAM_COUNT
+            for b in range(3):
+                for a in range(CAMERA_PARAM_COUNT):
+                    rhs[b] += (
+                        jacobian[i, 0, a] * jacobian[i, 0, 6 + b]
+                        + jacobian[i, 1, a] * jacobian[i, 1, 6 + b]
+                    ) * camera_step[offset + a]
+
+        point_step[p] = -(point_inverse[p] @ rhs)
+
+    return point_step
+
+
+def schur_levenberg_marquardt(
+    project,
+    x0: np.ndarray,
+    camera_slots: np.ndarray,
+    point_groups: tuple,
+    n_cameras: int,
+    ftol: float = 1e-8,
+    xtol: float = 1e-8,
+    max_iterations: int = 100,
+    initial_damping: float = 1e-3,
+) -> OptimizeResult:
+    """
+    Levenberg-Marquardt bundle adjustment that solves only the reduced camera system
+    at each step and recovers the point updates by back-substitution, so the cost of
+    each iteration grows linearly with the number of points.
+
+    project: callable(x, with_jacobian) returning (residuals (n,2), jacobian (n,2,9))
+    point_groups: (order, starts, ends) grouping observations by object point
+
+    Returns an OptimizeResult with the same x/fun/cost fields as scipy's least_squares
+    """
+    point_order, point_starts, point_ends = point_groups
+    n_camera_params = n_cameras * CAMERA_PARAM_COUNT
+
+    x = np.asarray(x0, dtype=np.float64).copy()
+    residuals, jacobian = project(x, True)
+    cost = 0.5 * np.sum(residuals**2)
+    damping = initial_damping
+
+    nfev = 1
+    njev = 1
+    status = 0
+    message = "The maximum number of iterations is exceeded."
+
+    start_time = perf_counter()
+    for iteration in range(max_iterations):
+        reduced, reduced_rhs, point_inverse, point_gradient = build_reduced_camera_system(
+            jacobian,
+            residuals,
+            camera_slots,
+            point_order,
+            point_starts,
+            point_ends,
+            n_cameras,
+            damping,
+        )
+
+        try:
+            camera_step = np.linalg.solve(reduced, reduced_rhs)
+        except np.linalg.LinAlgError:
+            camera_step = np.linalg.lstsq(reduced, reduced_rhs, rcond=None)[0]
+
+        point_step = back_substitute_points(
+            jacobian,
+            camera_slots,
+            point_order,
+            point_starts,
+            point_ends,
+            point_inverse,
+            point_gradient,
+            camera_step,
+        )
+        step = np.hstack([camera_step, point_step.ravel()])
+
+        x_new = x.copy()
+        x_new[:n_camera_params] += camera_step
+        x_new[n_camera_params:] += point_step.ravel()
+        residuals_new, _ = project(x_new, False)
+        nfev += 1
+        cost_new = 0.5 * np.sum(residuals_new**2)
+
+        if cost_new < cost:
+            reduction = cost - cost_new
+            x = x_new
+            cost = cost_new
+            residuals = residuals_new
+            logger.info(
+                f"Schur LM iteration {iteration}: cost {cost:.6e}, damping {damping:.1e}"
+            )
+
+            if reduction < ftol * cost:
+                status = 2
+                message = "`ftol` termination condition is satisfied."
+                break
+            if np.linalg.norm(step) < xtol * (xtol + np.linalg.norm(x)):
+                status = 3
+                message = "`xtol` termination condition is satisfied."
+                break
+
+            damping = max(damping / 10, 1e-12)
+            residuals, jacobian = project(x, True)
+            njev += 1
+        else:
+            damping *= 10
+            if damping > 1e12:
+                status = 2
+                message = "No further reduction in cost is possible."
+                break
+
+    logger.info(
+        f"Schur LM finished after {iteration+1} iterations in {perf_counter()-start_time:.2f} seconds: {message}"
+    )
+
+    return OptimizeResult(
+        x=x,
+        fun=residuals.ravel(),
+        cost=cost,
+        nfev=nfev,
+        njev=njev,
+        status=status,
+        message=message,
+        success=status > 0,
+    )
@@ -111,11 +111,11 @@ class IntrinsicCalibrator:
                     self.auto_pop_frame_wait = max(self.auto_pop_frame_wait-1,0)       
                 
                 logger.debug(f"Current index is {index}")
-                if index == self.stream.last_frame_index:
-                # end of stream, so stop auto pop and backfill to hit grid target
+                if index == self.stream.final_frame_index:
+                # end of stream, so backfill to hit grid target and stop auto pop
                     logger.info("End of autopop detected...")
-                    self.auto_store_data.clear()
                     self.backfill_calibration_frames()
+                    self.auto_store_data.clear()
 
 
     def backfill_calibration_frames(self):
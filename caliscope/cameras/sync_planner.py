@@ -0,0 +1,316 @@
+import caliscope.logger
+
+from pathlib import Path
+from queue import Empty
+from threading import Thread, Event
+from time import sleep
+
+import numpy as np
+import pandas as pd
+from numba import jit
+
+from caliscope.packets import SyncPacket
+from caliscope.bounded_queue import BoundedQueue
+
+logger = caliscope.logger.get(__name__)
+
+PLANNED_FRAME_QUEUE_SIZE = 16  # frames per port that a stream may read ahead of synchronization
+
+
+@jit(nopython=True, cache=True)
+def plan_sync_kernel(
+    frame_times: np.ndarray, start_frame_indices: np.ndarray, frame_counts: np.ndarray
+) -> np.ndarray:
+    """
+    Replays the assignment rules of the Synchronizer over frame times that are already known.
+
+    frame_times: (n_ports, max_frame_count) frame times of each port by frame index (padded with nan)
+    start_frame_indices: (n_ports,) frame index at which each port begins playback
+    frame_counts: (n_ports,) number of frame indices at each port (i.e. last frame index + 1)
+
+    returns: (n_sync_indices, n_ports) frame index assigned to each port at each sync index, -1 if dropped
+    """
+    n_ports = frame_times.shape[0]
+    # at least one frame is assigned at every sync index so this is an upper bound
+    assignments = np.full((frame_counts.sum(), n_ports), -1, dtype=np.int64)
+    current = start_frame_indices.copy()
+    earliest_next = np.empty(n_ports)
+    latest_current = np.empty(n_ports)
+
+    sync_index = 0
+    while True:
+        # synchronization ends once any port has no next frame
+        for p in range(n_ports):
+            if current[p] + 1 >= frame_counts[p]:
+                return assignments[:sync_index]
+
+        # both must be found before any port's current frame advances
+        for p in range(n_ports):
+            earliest_next[p] = np.inf
+            latest_current[p] = -np.inf
+            for q in range(n_ports):
+                if q != p:
+                    earliest_next[p] = min(earliest_next[p], frame_times[q, current[q] + 1])
+                    latest_current[p] = max(latest_current[p], frame_times[q, current[q]])
+
+        for p in range(n_ports):
+            frame_time = frame_times[p, current[p]]
+
+            if frame_time > earliest_next[p]:
+                # definitely belongs in the next layer
+                continue
+            elif earliest_next[p] - frame_time < frame_time - latest_current[p]:
+                # closer to the earliest next frame than the latest current frame
+                continue
+            else:
+                assignments[sync_index, p] = current[p]
+                current[p] += 1
+
+        sync_index += 1
+
+
+def plan_synchronization(frame_times: dict) -> pd.DataFrame:
+    """
+    Compute the complete sync_index -> {port: frame_index} assignment for recorded video in one pass,
+    applying the same earliest-next/latest-current rules as the Synchronizer.
+
+    frame_times: {port: array of frame times indexed by frame_index}. Leading nan values
+    (frame indices before the recording began at that port) are skipped, as in the RecordedStream
+
+    returns: dataframe with columns sync_index, port, frame_index, frame_time for every assigned frame
+    """
+    ports = sorted(frame_times.keys())
+    frame_counts = np.array([len(frame_times[port]) for port in ports], dtype=np.int64)
+
+    start_frame_indices = np.array(
+        [np.flatnonzero(~np.isnan(frame_times[port]))[0] for port in ports], dtype=np.int64
+    )
+
+    padded_frame_times = np.full((len(ports), frame_counts.max()), np.nan)
+    for row, port in enumerate(ports):
+        padded_frame_times[row, : frame_counts[row]] = frame_times[port]
+
+    assignments = plan_sync_kernel(padded_frame_times, start_frame_indices, frame_counts)
+
+    sync_indices, port_rows = np.nonzero(assignments >= 0)
+    frame_indices = assignments[sync_indices, port_rows]
+
+    return pd.DataFrame(
+        {
+            "sync_index": sync_indices,
+            "port": np.array(ports)[port_rows],
+            "frame_index": frame_indices,
+            "frame_time": padded_frame_times[port_rows, frame_indices],
+        }
+    )
+
+
+def plan_from_frame_time_history(frame_time_history_path: Path) -> pd.DataFrame:
+    """
+    Sync plan for a recording based on its frame_time_history.csv. Frame indices are assigned
+    by the order of the frame times at each port, as in the RecordedStream
+    """
+    frame_history = pd.read_csv(frame_time_history_path, usecols=["port", "frame_time"])
+
+    frame_times = {
+        port: np.sort(port_history["frame_time"].to_numpy(dtype=np.float64))
+        for port, port_history in frame_history.groupby("port")
+    }
+
+    return plan_synchronization(frame_times)
+
+
+def sample_plan(plan: pd.DataFrame, sync_index_count: int) -> pd.DataFrame:
+    """
+    Subset of the plan with only sync_index_count sync indices, spread evenly across the recording.
+    Used when processing every frame is unnecessary (e.g. extrinsic calibration)
+    """
+    sync_indices = np.unique(plan["sync_index"])
+    if sync_index_count >= len(sync_indices):
+        return plan
+
+    positions = np.linspace(0, len(sync_indices) - 1, sync_index_count).round().astype(np.int64)
+    sampled_sync_indices = sync_indices[np.unique(positions)]
+    return plan[plan["sync_index"].isin(sampled_sync_indices)].reset_index(drop=True)
+
+
+class PlannedSynchronizer:
+    """
+    Drop-in replacement for the Synchronizer when processing recorded video.
+
+    Because all frame times are known in advance, the sync plan is computed up front and
+    frames are simply consumed from each stream in order. There are no harvester threads
+    or polling for frames to arrive, and the resulting sync indices are deterministic.
+
+    plan: a precomputed (e.g. sampled) plan. The streams must then be playing exactly the frames
+    it includes. By default every frame of the streams is planned.
+    """
+
+    def __init__(self, streams: dict, max_pending_frames: int = PLANNED_FRAME_QUEUE_SIZE, plan: pd.DataFrame = None):
+        self.streams = streams
+        self.ports = list(self.streams.keys())
+
+        self.synched_frames_subscribers = []
+        self.stop_event = Event()
+        self.frames_complete = False
+        self.current_sync_packet = None
+        self.held_frame_packets = {}  # port: packet received ahead of its planned sync index
+
+        if plan is None:
+            plan = plan_synchronization({port: stream.frame_times for port, stream in self.streams.items()})
+        self.plan = plan
+        self.sync_index_count = int(self.plan["sync_index"].nunique())
+        logger.info(f"Planned {self.sync_index_count} sync indices across ports {self.ports}")
+
+        # a bounded queue per port means streams cannot get far ahead of synchronization
+        # frames cannot be dropped without departing from the plan, so streams always wait for room
+        self.frame_packet_queues = {
+            port: BoundedQueue(max_pending_frames, name=f"planned_synchronizer_port_{port}")
+            for port in self.ports
+        }
+        self.subscribed_to_streams = False
+        self.subscribe_to_streams()
+
+        self.start()
+
+    @property
+    def queue_metrics(self):
+        return {q.name: q.metrics for q in self.frame_packet_queues.values()}
+
+    @property
+    def dropped_fps(self):
+        """
+        Fraction of sync indices at which each port had no frame
+        """
+        assigned_counts = self.plan.groupby("port").size()
+        return {
+            port: 1 - assigned_counts.get(port, 0) / max(self.sync_index_count, 1)
+            for port in sorted(self.ports)
+        }
+
+    def subscribe_to_streams(self):
+        for port, stream in self.streams.items():
+            logger.info(f"Subscribing planned synchronizer to stream from port {port}")
+            stream.subscribe(self.frame_packet_queues[port])
+        self.subscribed_to_streams = True
+
+    def unsubscribe_from_streams(self):
+        for port, stream in self.streams.items():
+            logger.info(f"unsubscribe planned synchronizer from port {port}")
+            stream.unsubscribe(self.frame_packet_queues[port])
+        self.subscribed_to_streams = False
+
+    def subscribe_to_sync_packets(self, q):
+        logger.info("Adding queue to receive synched frames")
+        self.synched_frames_subscribers.append(q)
+
+    def release_sync_packet_q(self, q):
+        logger.info("Releasing record queue")
+        self.synched_frames_subscribers.remove(q)
+
+    def start(self):
+        logger.info("Starting planned frame synchronizer...")
+        self.thread = Thread(target=self.synch_frames_worker, args=(), daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
+
+    def next_frame_packet(self, port):
+        """
+        Blocks until the stream at port provides its next frame packet.
+        Returns None if the stream ends (or stops) before providing one
+        """
+        stream = self.streams[port]
+        while not self.stop_event.is_set():
+            try:
+                frame_packet = self.frame_packet_queues[port].get(timeout=0.5)
+            except Empty:
+                if hasattr(stream, "thread") and not stream.thread.is_alive():
+                    return None
+                continue
+
+            if frame_packet.frame_time == -1:
+                return None
+            return frame_packet
+
+        return None
+
+    def planned_frame_packet(self, port, frame_index):
+        """
+        Reads forward through the stream at port to the planned frame, skipping any earlier ones.
+        Returns None if the planned frame was dropped, holding the later packet that arrived in
+        its place for the sync index it was planned for. Also returns None once the stream ends.
+        """
+        frame_packet = self.held_frame_packets.pop(port, None)
+        while frame_packet is None or frame_packet.frame_index < frame_index:
+            if frame_packet is not None:
+                logger.warning(f"Skipping unplanned frame {frame_packet.frame_index} at port {port}")
+            frame_packet = self.next_frame_packet(port)
+            if frame_packet is None:
+                return None
+
+        if frame_packet.frame_index > frame_index:
+            logger.warning(
+                f"Expected frame {frame_index} at port {port} but received {frame_packet.frame_index}; "
+                f"leaving port {port} out of this sync index"
+            )
+            self.held_frame_packets[port] = frame_packet
+            return None
+
+        return frame_packet
+
+    def synch_frames_worker(self):
+        # packets are not replayed, so hold off until something is listening for them
+        spinlock_looped = False
+        while len(self.synched_frames_subscribers) == 0 and not self.stop_event.is_set():
+            if not spinlock_looped:
+                logger.info("Planned synchronizer waiting for a sync packet subscriber")
+                spinlock_looped = True
+            sleep(0.1)
+
+        frame_index_table = (
+            self.plan.pivot(index="sync_index", columns="port", values="frame_index")
+            .reindex(columns=self.ports)
+            .fillna(-1)
+            .astype(int)
+        )
+
+        for sync_index, planned_frames in frame_index_table.iterrows():
+            current_frame_packets = {}
+            for port in self.ports:
+                if planned_frames[port] == -1:
+                    current_frame_packets[port] = None
+                    continue
+
+                frame_packet = self.planned_frame_packet(port, planned_frames[port])
+                if frame_packet is None and port not in self.held_frame_packets:
+                    logger.info(f"End of frames at port {port} detected; ending synchronization")
+                    self.stop_event.set()
+                    break
+
+                current_frame_packets[port] = frame_packet
+
+            if self.stop_event.is_set():
+                break
+
+            self.current_sync_packet = SyncPacket(sync_index, current_frame_packets)
+            for q in self.synched_frames_subscribers:
+                q.put(self.current_sync_packet)
+
+            # provide infrequent notice of synchronizer activity
+            if sync_index % 100 == 0:
+                logger.info(f"Placing new synched frames with index {sync_index}")
+
+        self.frames_complete = True
+        self.current_sync_packet = None
+        logger.info("Sending `None` on queue to signal end of synced frames.")
+        for q in self.synched_frames_subscribers:
+            q.put(None)
+
+        # streams may still be holding frames beyond the final sync index
+        for port, stream in self.streams.items():
+            stream.stop_event.set()
+
+        logger.info("Planned frame synch worker successfully ended")
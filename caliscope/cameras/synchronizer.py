@@ -4,26 +4,44 @@ import caliscope.logger
 # logger.setLevel(logging.DEBUG)
 
 import time
-from queue import Queue
-from threading import Thread, Event
+from collections import deque
+from queue import Empty
+from threading import Thread, Event, Condition
 
 import numpy as np
 from caliscope.packets import SyncPacket
+from caliscope.bounded_queue import BoundedQueue, OverflowPolicy
 
 logger = caliscope.logger.get(__name__)
 
 DROPPED_FRAME_TRACK_WINDOW = 100 # trailing frames tracked for reporting purposes
 
 class Synchronizer:
-    def __init__(self, streams: dict):
+    def __init__(
+        self,
+        streams: dict,
+        max_pending_frames: int = None,
+        overflow_policy: OverflowPolicy = OverflowPolicy.BLOCK,
+    ):
+        """
+        max_pending_frames: if provided, at most this many unsynchronized frames are held per port.
+        Streams block when the limit is reached, so that processing of recorded video
+        is paced by the slowest consumer rather than by a target fps.
+        overflow_policy: how the queue from each stream handles a full queue. Live streams cannot be
+        paused, so DROP_OLDEST keeps memory capped at the cost of skipped frames.
+        """
         self.streams = streams
+        self.max_pending_frames = max_pending_frames
         self.current_synched_frames = None
 
         self.synched_frames_subscribers = (
             []
         )  # queues that will receive actual frame data
 
-        self.all_frame_packets = {}
+        # unassigned frames of each port in the order they were read; the first is the current frame
+        self.frame_packets = {}
+        # notified whenever a frame arrives or is assigned so that waiting threads wake immediately
+        self.frame_packets_changed = Condition()
         self.stop_event = Event()
         self.frames_complete = False  # only relevant for video playback, but provides a way to wrap up the thread
 
@@ -31,7 +49,13 @@ class Synchronizer:
         self.frame_packet_queues = {}
         for port, stream in self.streams.items():
             self.ports.append(port)
-            q = Queue(-1)
+            self.frame_packets[port] = deque()
+            if self.max_pending_frames is None:
+                q = BoundedQueue(-1, name=f"synchronizer_port_{port}")
+            else:
+                # the synchronizer needs both the current and next frame of every port
+                self.max_pending_frames = max(self.max_pending_frames, 2)
+                q = BoundedQueue(self.max_pending_frames, overflow_policy, name=f"synchronizer_port_{port}")
             self.frame_packet_queues[port] = q
 
         self.subscribed_to_streams = False # not subscribed yet
@@ -58,6 +82,13 @@ class Synchronizer:
             self.dropped_frame_history[port].append(dropped)
             self.dropped_frame_history[port] = self.dropped_frame_history[port][-DROPPED_FRAME_TRACK_WINDOW:]
 
+    @property
+    def queue_metrics(self):
+        """
+        Occupancy and overflow counts of the queue from each stream
+        """
+        return {q.name: q.metrics for q in self.frame_packet_queues.values()}
+
     @property 
     def dropped_fps(self):
         """
@@ -86,6 +117,8 @@ class Synchronizer:
 
     def stop(self):
         self.stop_event.set()
+        with self.frame_packets_changed:
+            self.frame_packets_changed.notify_all()
         self.thread.join()
         for t in self.threads:
             t.join()
@@ -121,45 +154,63 @@ class Synchronizer:
 
     def harvest_frame_packets(self, stream):
         port = stream.port
+        port_frame_packets = self.frame_packets[port]
 
         logger.info(f"Beginning to collect data generated at port {port}")
 
         while not self.stop_event.is_set():
-            frame_packet = self.frame_packet_queues[port].get()
-            frame_index = self.port_frame_count[port]
-
-            self.all_frame_packets[f"{port}_{frame_index}"] = frame_packet
-            self.port_frame_count[port] += 1
+            try:
+                frame_packet = self.frame_packet_queues[port].get(timeout=0.1)
+            except Empty:
+                continue
+
+            with self.frame_packets_changed:
+                if self.max_pending_frames is not None:
+                    # hold the frame here until the synchronizer has room for it
+                    while (
+                        len(port_frame_packets) >= self.max_pending_frames
+                        and not self.stop_event.is_set()
+                    ):
+                        self.frame_packets_changed.wait()
+
+                port_frame_packets.append(frame_packet)
+                self.port_frame_count[port] += 1
+                self.frame_packets_changed.notify_all()
 
             logger.debug(
-                f"Frame data harvested from reel {frame_packet.port} with index {frame_index} and frame time of {frame_packet.frame_time}"
+                f"Frame data harvested from reel {frame_packet.port} with index {self.port_frame_count[port]-1} and frame time of {frame_packet.frame_time}"
             )
 
         logger.info(f"Frame harvester for port {port} completed")
 
+    def wait_for_next_frames(self):
+        """
+        Blocks until every port has both its current and next frame available.
+        Returns False if the synchronizer was stopped while waiting
+        """
+        with self.frame_packets_changed:
+            while not self.stop_event.is_set():
+                if all(len(self.frame_packets[p]) >= 2 for p in self.ports):
+                    return True
+
+                logger.debug("Waiting for frame data to populate")
+                if self.subscribed_to_streams:
+                    self.frame_packets_changed.wait()
+                else:
+                    # provide infrequent updates of busy waiting
+                    if int(time.time()) % 10 == 0:
+                        logger.info("Synchronizer not subscribed to any streams and waiting...")
+                    self.frame_packets_changed.wait(timeout=1)
+
+        return False
+
     # get minimum value of frame_time for next layer
     def earliest_next_frame(self, port):
         """Looks at next unassigned frame across the ports to determine
         the earliest time at which each of them was read"""
         times_of_next_frames = []
         for p in self.ports:
-            next_index = self.port_current_frame[p] + 1
-            frame_data_key = f"{p}_{next_index}"
-
-            # problem with outpacing the threads reading data in, so wait if need be
-            while frame_data_key not in self.all_frame_packets.keys():
-                logger.debug(
-                    f"Waiting in a loop for frame data to populate with key: {frame_data_key}"
-                )
-                if self.subscribed_to_streams:
-                    time.sleep(0.1)
-                else:
-                    # provide infrequent updates of busy waiting
-                    if int(time.time()) % 10 ==0:
-                        logger.info("Synchronizer not subscribed to any streams and busy waiting...")
-                    time.sleep(1)
-                    
-            next_frame_time = self.all_frame_packets[frame_data_key].frame_time
+            next_frame_time = self.frame_packets[p][1].frame_time
 
             if next_frame_time == -1:
                 logger.info(
@@ -178,9 +229,7 @@ class Synchronizer:
         """Provides the latest frame_time of the current frames not inclusive of the provided port"""
         times_of_current_frames = []
         for p in self.ports:
-            current_index = self.port_current_frame[p]
-            frame_data_key = f"{p}_{current_index}"
-            current_frame_time = self.all_frame_packets[frame_data_key].frame_time
+            current_frame_time = self.frame_packets[p][0].frame_time
             if p != port:
                 times_of_current_frames.append(current_frame_time)
 
@@ -213,6 +262,13 @@ class Synchronizer:
         logger.info("About to start synchronizing frames...")
         while not self.stop_event.is_set():
 
+            if not self.wait_for_next_frames():
+                # stopped from outside while waiting; no layer to assemble
+                self.current_sync_packet = None
+                for q in self.synched_frames_subscribers:
+                    q.put(self.current_sync_packet)
+                break
+
             current_frame_packets = {}
 
             layer_frame_times = []
@@ -229,10 +285,7 @@ class Synchronizer:
 
             for port in self.ports:
                 current_frame_index = self.port_current_frame[port]
-
-                port_index_key = f"{port}_{current_frame_index}"
-                current_frame_packet = self.all_frame_packets[port_index_key]
-                frame_time = current_frame_packet.frame_time
+                frame_time = self.frame_packets[port][0].frame_time
 
                 # don't put a frame in a synched frame packet if the next packet has a frame before it
                 if frame_time > earliest_next[port]:
@@ -250,9 +303,9 @@ class Synchronizer:
                     )
                 else:
                     # add the data and increment the index
-                    current_frame_packets[port] = self.all_frame_packets.pop(
-                        port_index_key
-                    )
+                    with self.frame_packets_changed:
+                        current_frame_packets[port] = self.frame_packets[port].popleft()
+                        self.frame_packets_changed.notify_all()
                     # frame_packets[port]["sync_index"] = sync_index
                     self.port_current_frame[port] += 1
                     layer_frame_times.append(frame_time)
@@ -260,7 +313,7 @@ class Synchronizer:
                         f"Adding to layer from port {port} at index {current_frame_index} and frame time: {frame_time}"
                     )
 
-            logger.debug(f"Unassigned Frames: {len(self.all_frame_packets)}")
+            logger.debug(f"Unassigned Frames: {sum(len(frames) for frames in self.frame_packets.values())}")
 
             self.mean_frame_times.append(np.mean(layer_frame_times))
 
@@ -291,5 +344,15 @@ class Synchronizer:
                     
             self.fps_mean = self.average_fps()
 
+        # release any harvesters waiting for room in a full port
+        with self.frame_packets_changed:
+            self.frame_packets_changed.notify_all()
+
+        if self.max_pending_frames is not None:
+            # streams that have not yet reached their end would otherwise wait on a full queue indefinitely
+            for port, stream in self.streams.items():
+                logger.info(f"Stopping stream at port {port} now that synchronization is complete")
+                stream.stop_event.set()
+
         logger.info("Frame synch worker successfully ended")
 
@@ -28,6 +28,7 @@ class ConfigSettings(Enum):
     camera_count = "camera_count"
     save_tracked_points_video = "save_tracked_points_video"
     fps_sync_stream_processing = "fps_sync_stream_processing"
+    extrinsic_sync_sample_count = "extrinsic_sync_sample_count"
 
     
 #%%
@@ -86,6 +87,16 @@ class Configurator:
             return 100 
         else:
             return self.dict[ConfigSettings.fps_sync_stream_processing.value]
+
+    def get_extrinsic_sync_sample_count(self):
+        """
+        Number of sync indices tracked for the extrinsic calibration. 0 tracks every frame,
+        which is the default; sampling is opted into by setting a count in config.toml
+        """
+        if ConfigSettings.extrinsic_sync_sample_count.value not in self.dict.keys():
+            return 0
+        else:
+            return self.dict[ConfigSettings.extrinsic_sync_sample_count.value]
         
         
     def refresh_config_from_toml(self):
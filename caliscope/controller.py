@@ -33,9 +33,6 @@ import caliscope.logger
 logger = caliscope.logger.get(__name__)
 
 
-FILTERED_FRACTION = 0.025  # by default, 2.5% of image points with highest reprojection error are filtered out during calibration
-
-
 # class CalibrationStage(Enum):
 #     NO_INTRINSIC_VIDEO = auto()
 #     INTRINSIC_VIDEO_NO_INTRINSIC_CAL = auto()
@@ -162,6 +159,7 @@ class Controller(QObject):
             recording_dir=self.workspace_guide.extrinsic_dir,
             all_camera_data=self.camera_array.cameras,
             tracker=self.charuco_tracker,
+            sync_sample_count=self.config.get_extrinsic_sync_sample_count(),
         )
 
     # def process_extrinsic_streams(self, fps_target=None):
@@ -390,18 +388,14 @@ class Controller(QObject):
             )
 
             self.capture_volume = CaptureVolume(self.camera_array, self.point_estimates)
-            self.capture_volume.optimize()
+            # outliers are down-weighted and removed within the optimization rather than
+            # by filtering a fixed fraction of points and optimizing again
+            self.capture_volume.optimize_coarse_to_fine(robust=True)
 
             self.quality_controller = QualityController(
                 self.capture_volume, self.charuco
             )
 
-            logger.info(
-                f"Removing the worst fitting {FILTERED_FRACTION*100} percent of points from the model"
-            )
-            self.quality_controller.filter_point_estimates(FILTERED_FRACTION)
-            self.capture_volume.optimize()
-
             # saves both point estimates and camera array
             self.config.save_capture_volume(self.capture_volume)
 
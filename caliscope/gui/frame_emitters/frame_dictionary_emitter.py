@@ -2,12 +2,12 @@ import caliscope.logger
 import numpy as np
 
 from threading import Event
-from queue import Queue
 
 from PySide6.QtCore import Qt, QThread, Signal
 from PySide6.QtGui import QPixmap
 from caliscope.cameras.synchronizer import Synchronizer
 from caliscope.cameras.camera_array import CameraData
+from caliscope.bounded_queue import BoundedQueue, OverflowPolicy, DISPLAY_QUEUE_SIZE
 from caliscope.gui.frame_emitters.tools import resize_to_square, apply_rotation, cv2_to_qlabel
 
 logger = caliscope.logger.get(__name__)
@@ -30,7 +30,10 @@ class FrameDictionaryEmitter(QThread):
         self.streams = self.synchronizer.streams
         self.all_camera_data = all_camera_data
 
-        self.sync_packet_q = Queue()
+        # display only needs the most recent sync packets, and must not hold up the synchronizer
+        self.sync_packet_q = BoundedQueue(
+            DISPLAY_QUEUE_SIZE, OverflowPolicy.DROP_OLDEST, name="frame_dictionary_emitter"
+        )
         self.synchronizer.subscribe_to_sync_packets(self.sync_packet_q)
         self.pixmap_edge_length = pixmap_edge_length
         self.keep_collecting = Event()
@@ -52,7 +55,8 @@ class FrameDictionaryEmitter(QThread):
             logger.debug(f"Sync packet: {sync_packet}")
             emitted_dict = {}
             for port, frame_packet in sync_packet.frame_packets.items():
-                if frame_packet is None:
+                # frames may also be absent when only cached points were read for them
+                if frame_packet is None or frame_packet.frame is None:
                     logger.info("plugging blank frame data")
                     frame = np.zeros((self.pixmap_edge_length, self.pixmap_edge_length, 3), dtype=np.uint8)
                 else:
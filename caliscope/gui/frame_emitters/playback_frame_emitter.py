@@ -9,6 +9,7 @@ from PySide6.QtCore import Qt, QThread, Signal
 from PySide6.QtGui import QImage, QPixmap
 import caliscope.calibration.draw_charuco as draw_charuco
 from caliscope.recording.recorded_stream import RecordedStream
+from caliscope.bounded_queue import BoundedQueue, OverflowPolicy, DISPLAY_QUEUE_SIZE
 from caliscope.gui.frame_emitters.tools import resize_to_square, apply_rotation, cv2_to_qlabel
 
 logger = caliscope.logger.get(__name__)
@@ -31,7 +32,10 @@ class PlaybackFrameEmitter(QThread):
         # used only when applying the undistortion
         self.scaling_factor = 1
 
-        self.frame_packet_q = Queue()
+        # display only needs the most recent frames, and must not hold up the stream
+        self.frame_packet_q = BoundedQueue(
+            DISPLAY_QUEUE_SIZE, OverflowPolicy.DROP_OLDEST, name=f"playback_frame_emitter_{self.port}"
+        )
         self.grid_history_q = grid_history_q  # received a tuple of ids, img_loc
 
         self.stream.subscribe(self.frame_packet_q)
@@ -7,9 +7,12 @@ from caliscope.cameras.camera_array import CameraData
 from caliscope.packets import Tracker
 from caliscope.gui.frame_emitters.playback_frame_emitter import PlaybackFrameEmitter
 from caliscope.calibration.intrinsic_calibrator import IntrinsicCalibrator
+from caliscope.recording.frame_sampler import sample_charuco_frames
 
 logger = caliscope.logger.get(__name__)
 
+SAMPLED_FRAMES_PER_GRID = 2  # frames tracked during autocalibration for each grid in the target count
+
 
 class IntrinsicStreamManager:
     def __init__(
@@ -36,6 +39,7 @@ class IntrinsicStreamManager:
                 rotation_count=camera.rotation_count,
                 tracker=self.tracker,
                 break_on_last=False,
+                cache_points=True,
             )
 
             self.streams[camera.port] = stream
@@ -136,17 +140,23 @@ class IntrinsicStreamManager:
 
         logger.info(f"Corners for charuco are {board_corners}")
 
+        # only a sample of frames (those showing the most of the board in a quick low resolution
+        # screening pass) are decoded and tracked rather than the whole video
+        frame_sample = sample_charuco_frames(
+            stream.video_path,
+            stream.start_frame_index,
+            stream.last_frame_index,
+            grid_count * SAMPLED_FRAMES_PER_GRID,
+            charuco=self.tracker.charuco,
+        )
+
         # calculate basic wait time between board collections 
         # if many frames have incomplete data, this will fail to reach the target board count
-        start_frame_index = stream.start_frame_index
-        last_frame_index = stream.last_frame_index
-        total_frames = last_frame_index - start_frame_index + 1
-        wait_between = int(total_frames / grid_count)
+        wait_between = max(int(len(frame_sample) / grid_count) - 1, 0)
 
         stream.set_fps_target(100)  # speed through the stream
+        stream.set_frame_sample(frame_sample)
 
-        # jump to first frame, play videos and cycle quickly through frames
-        stream.jump_to(0)
         frame_emitter.initialize_grid_capture_history()
         intrinsic_calibrator.initiate_auto_pop(
             wait_between=wait_between,
@@ -154,10 +164,15 @@ class IntrinsicStreamManager:
             target_grid_count=grid_count,
         )
 
+        # jump to first sampled frame, play videos and cycle quickly through the sample
+        stream.jump_to(int(frame_sample[0]))
         stream.unpause()
 
-        while intrinsic_calibrator.grid_count < grid_count:
+        # auto pop ends (after backfilling as needed) once the last sampled frame is reached
+        while intrinsic_calibrator.auto_store_data.is_set():
             logger.info(f"Waiting for sufficient calibration boards to become populated at port {port}")
             sleep(2)
-        
+
+        # restore every frame for manual review
+        stream.set_frame_sample(None)
         intrinsic_calibrator.calibrate_camera()
\ No newline at end of file
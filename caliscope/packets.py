@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 import numpy as np
 from numba.typed import List
 from abc import ABC, abstractmethod
@@ -41,6 +41,19 @@ class PointPacket:
 
         return [obj_loc_x, obj_loc_y]
 
+    @property
+    def confidence_list(self) -> list:
+        """
+        as with obj_loc_list, fill with None when the tracker does not provide a confidence
+        so that the tidy table retains consistent column lengths
+        """
+        if self.confidence is not None:
+            confidence = self.confidence.tolist()
+        else:
+            confidence = [None] * len(self.point_id)
+
+        return confidence
+
 
 class Tracker(ABC):
     @property
@@ -156,6 +169,8 @@ class FramePacket:
     frame: np.ndarray
     points: PointPacket = None
     draw_instructions: callable = None
+    # rendered on first access and shared by every consumer (recorder, display, etc.)
+    _frame_with_points: np.ndarray = field(default=None, init=False, repr=False, compare=False)
 
     def to_tidy_table(self, sync_index) -> dict:
         """
@@ -176,6 +191,7 @@ class FramePacket:
                     "img_loc_y": self.points.img_loc[:, 1].tolist(),
                     "obj_loc_x": self.points.obj_loc_list[0],
                     "obj_loc_y": self.points.obj_loc_list[1],
+                    "confidence": self.points.confidence_list,
                 }
             else:
                 table = None
@@ -185,6 +201,12 @@ class FramePacket:
 
     @property
     def frame_with_points(self):
+        if self._frame_with_points is None:
+            # frozen dataclass, but this is only a cache of a value derived from the frame
+            object.__setattr__(self, "_frame_with_points", self._draw_points())
+        return self._frame_with_points
+
+    def _draw_points(self):
         if self.points is not None:
             drawn_frame = self.frame.copy()
             ids = self.points.point_id
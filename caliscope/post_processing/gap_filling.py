@@ -55,10 +55,14 @@ def gap_fill_xy(xy_base:pd.DataFrame, max_gap_size=3) -> pd.DataFrame:
         merged = pd.merge(all_frames, group, on=['port', 'point_id', index_key], how='left')
 
         # Calculate the size of each gap
-        merged['gap_size'] = merged['img_loc_x'].isnull().astype(int).groupby((merged['img_loc_x'].notnull()).cumsum()).cumsum()
+        missing = merged['img_loc_x'].isnull()
+        gap_group = merged['img_loc_x'].notnull().cumsum()
+        merged['gap_size'] = missing.astype(int).groupby(gap_group).cumsum()
 
         # Remove the rows where the gap is larger than GAP_SIZE_TO_FILL
-        merged = merged[merged['gap_size'] <= max_gap_size]
+        # (all of them, so the start of a long gap is not interpolated toward a point far beyond it)
+        gap_length = missing.groupby(gap_group).transform('sum')
+        merged = merged[~missing | (gap_length <= max_gap_size)]
 
         # Interpolate the values for img_loc_x and img_loc_y, limit the interpolation to GAP_SIZE_TO_FILL
         merged['frame_time'] = merged['frame_time'].interpolate(method='linear', limit=max_gap_size).astype('float64')
@@ -98,10 +102,14 @@ def gap_fill_xyz(xyz_base:pd.DataFrame, max_gap_size=3) -> pd.DataFrame:
         merged = pd.merge(all_frames, group, on=['point_id', "sync_index"], how='left')
 
         # Calculate the size of each gap
-        merged['gap_size'] = merged['x_coord'].isnull().astype(int).groupby((merged['x_coord'].notnull()).cumsum()).cumsum()
+        missing = merged['x_coord'].isnull()
+        gap_group = merged['x_coord'].notnull().cumsum()
+        merged['gap_size'] = missing.astype(int).groupby(gap_group).cumsum()
 
         # Remove the rows where the gap is larger than GAP_SIZE_TO_FILL
-        merged = merged[merged['gap_size'] <= max_gap_size]
+        # (all of them, so the start of a long gap is not interpolated toward a point far beyond it)
+        gap_length = missing.groupby(gap_group).transform('sum')
+        merged = merged[~missing | (gap_length <= max_gap_size)]
 
         # Interpolate the values for img_loc_x and img_loc_y, limit the interpolation to GAP_SIZE_TO_FILL
         merged['x_coord'] = merged['x_coord'].interpolate(method='linear', limit=max_gap_size).astype('float64')
@@ -6,9 +6,11 @@ from time import sleep
 from pathlib import Path
 import pandas as pd
 from caliscope.triangulate.triangulation import triangulate_xy
+from caliscope.triangulate.undistorter import Undistorter
 from caliscope.synchronized_stream_manager import SynchronizedStreamManager
 
 from caliscope.trackers.tracker_enum import TrackerEnum
+from caliscope.trackers.tracker_pool import TrackerPool, default_worker_count
 from caliscope.cameras.camera_array import CameraArray
 
 from caliscope.export import xyz_to_trc, xyz_to_wide_labelled
@@ -32,13 +34,29 @@ class PostProcessor:
     """
 
     def __init__(
-        self, camera_array: CameraArray, recording_path: Path, tracker_enum: TrackerEnum
+        self,
+        camera_array: CameraArray,
+        recording_path: Path,
+        tracker_enum: TrackerEnum,
+        tracker_workers: int = None,
     ):
+        """
+        tracker_workers: number of processes running the tracker. Defaults to one per camera when there
+        are enough cores to go around. 0 tracks within the stream threads of this process
+        """
         self.camera_array = camera_array
         self.recording_path = recording_path
         self.tracker_enum = tracker_enum
         self.tracker_name = tracker_enum.name
-        self.tracker = tracker_enum.value()
+
+        if tracker_workers is None:
+            tracker_workers = default_worker_count(len(self.camera_array.cameras))
+
+        if tracker_workers > 0:
+            logger.info(f"Running {self.tracker_name} tracker across {tracker_workers} worker processes")
+            self.tracker = TrackerPool(tracker_enum.value, worker_count=tracker_workers)
+        else:
+            self.tracker = tracker_enum.value()
 
         # save out current camera array to output folder
         tracker_subdirectory = Path(self.recording_path, self.tracker_name)
@@ -48,8 +66,9 @@ class PostProcessor:
         logger.info(
             f"Creating sync stream manager for videos stored in {self.recording_path}"
         )
+        # post processing is never viewed live so there is no reason to throttle it
         self.sync_stream_manager = SynchronizedStreamManager(
-            self.recording_path, self.camera_array.cameras, self.tracker
+            self.recording_path, self.camera_array.cameras, self.tracker, batch=True
         )
 
     def create_xy(self, fps_target=100, include_video=True):
@@ -57,7 +76,8 @@ class PostProcessor:
         Reads through all .mp4  files in the recording path and applies the tracker to them
         The xy_TrackerName.csv file is saved out to the same directory by the VideoRecorder
 
-        Note that high fps target and including video will increase processing overhead
+        Streams are processed in batch mode, so fps_target does not apply; including video
+        will increase processing overhead
         """
         self.sync_stream_manager.process_streams(include_video=include_video, fps_target=fps_target)
 
@@ -74,8 +94,17 @@ class PostProcessor:
                 f"(Stage 1 of 2): {percent_complete}% of frames processed for (x,y) landmark detection"
             )
 
+        if isinstance(self.tracker, TrackerPool):
+            self.tracker.close()
+
     def create_xyz(
-        self, xy_gap_fill=3, xyz_gap_fill=3, cutoff_freq=6, include_trc=True
+        self,
+        xy_gap_fill=3,
+        xyz_gap_fill=3,
+        cutoff_freq=6,
+        include_trc=True,
+        robust_triangulation=False,
+        xy_chunk_size=None,
     ) -> None:
         """
         creates xyz_{tracker name}.csv file within the recording_path directory
@@ -83,6 +112,12 @@ class PostProcessor:
         Uses the two functions above, first creating the xy points based on the tracker if they
         don't already exist, the triangulating them. Makes use of an internal method self.triangulate_xy_data
 
+        robust_triangulation: weight views by tracker confidence and reject outlier views.
+        The xyz output will include the reprojection error and inlier camera count of each point
+
+        xy_chunk_size: if provided, the xy data is read, gap filled, undistorted and triangulated
+        this many rows at a time, with each chunk appended to the xyz csv. Peak memory is then
+        bounded by the chunk size rather than the length of the recording.
         """
 
         tracker_output_path = Path(self.recording_path, self.tracker_name)
@@ -92,17 +127,35 @@ class PostProcessor:
         if not xy_csv_path.exists():
             self.create_xy()
 
-        # load in 2d data and triangulate it
-        logger.info("Reading in (x,y) data..")
-        xy = pd.read_csv(xy_csv_path)
-        if xy.shape[0] > 0:
-            logger.info("Filling small gaps in (x,y) data")
-            xy = gap_fill_xy(xy, max_gap_size=xy_gap_fill)
-            logger.info("Beginning data triangulation")
-            xyz = triangulate_xy(xy, self.camera_array)
+        xyz_csv_path = Path(tracker_output_path, f"xyz_{self.tracker_name}.csv")
+
+        if xy_chunk_size is None:
+            # load in 2d data and triangulate it
+            logger.info("Reading in (x,y) data..")
+            xy = pd.read_csv(xy_csv_path)
+            if xy.shape[0] > 0:
+                logger.info("Filling small gaps in (x,y) data")
+                xy = gap_fill_xy(xy, max_gap_size=xy_gap_fill)
+                logger.info("Beginning data triangulation")
+                xyz = triangulate_xy(xy, self.camera_array, robust=robust_triangulation)
+            else:
+                logger.warn("No points tracked. Terminating post-processing early.")
+                return
         else:
-            logger.warn("No points tracked. Terminating post-processing early.")
-            return
+            xyz_row_count = stream_xyz(
+                xy_csv_path,
+                xyz_csv_path,
+                self.camera_array,
+                xy_chunk_size,
+                xy_gap_fill=xy_gap_fill,
+                robust_triangulation=robust_triangulation,
+            )
+            if xyz_row_count == 0:
+                logger.warn("No points triangulated. Terminating post-processing early.")
+                return
+
+            # xyz data is a fraction of the size of the xy data, so the downstream exports work from it whole
+            xyz = pd.read_csv(xyz_csv_path, index_col=0)
 
         if xyz.shape[0] > 0:
             if APPLY_EXPERIMENTAL_POST_PROCESSING:
@@ -116,9 +169,10 @@ class PostProcessor:
                 )
 
 
-            logger.info("Saving (x,y,z) to csv file")
-            xyz_csv_path = Path(tracker_output_path, f"xyz_{self.tracker_name}.csv")
-            xyz.to_csv(xyz_csv_path)
+            # when streaming, the xyz csv has already been written chunk by chunk
+            if xy_chunk_size is None or APPLY_EXPERIMENTAL_POST_PROCESSING:
+                logger.info("Saving (x,y,z) to csv file")
+                xyz.to_csv(xyz_csv_path)
             xyz_wide_csv_path = Path(
                 tracker_output_path, f"xyz_{self.tracker_name}_labelled.csv"
             )
@@ -141,6 +195,106 @@ class PostProcessor:
             )
 
 
+def read_xy_chunks(xy_csv_path: Path, chunk_size: int):
+    """
+    Yields the xy data in chunks of roughly chunk_size rows that never split a sync_index.
+    Relies on the xy csv being written in sync_index order, as it is by the VideoRecorder
+    """
+    pending = None
+    for chunk in pd.read_csv(xy_csv_path, chunksize=chunk_size):
+        if pending is not None:
+            chunk = pd.concat([pending, chunk])
+
+        last_sync_index = chunk["sync_index"].max()
+        pending = chunk[chunk["sync_index"] == last_sync_index]
+        complete = chunk[chunk["sync_index"] < last_sync_index]
+
+        if complete.shape[0] > 0:
+            yield complete
+
+    if pending is not None and pending.shape[0] > 0:
+        yield pending
+
+
+def stream_xyz(
+    xy_csv_path: Path,
+    xyz_csv_path: Path,
+    camera_array: CameraArray,
+    chunk_size: int,
+    xy_gap_fill=3,
+    robust_triangulation=False,
+) -> int:
+    """
+    Triangulates the xy data in sync_index ordered chunks, appending each to xyz_csv_path.
+
+    Gap filling needs to see a few frames on either side of a gap, so the sync indices at the
+    end of each window are held back and carried into the next one along with a short lookback.
+    Gaps of up to xy_gap_fill frames are then filled just as they would be in a single pass, and
+    the xyz csv matches the one create_xyz writes without chunking.
+    Returns the number of xyz rows written.
+    """
+    # frames needed on either side of a sync index for it to be gap filled as it would be whole
+    margin = xy_gap_fill + 1
+
+    # built once and reused for every chunk
+    undistorter = Undistorter(camera_array)
+
+    buffer = None
+    next_sync_index = 0
+    xyz_row_count = 0
+
+    for xy_chunk in read_xy_chunks(xy_csv_path, chunk_size):
+        buffer = xy_chunk if buffer is None else pd.concat([buffer, xy_chunk])
+        last_sync_index = xy_chunk["sync_index"].max()
+        emit_through = last_sync_index - margin
+
+        if emit_through >= next_sync_index:
+            xyz_row_count += _triangulate_window(
+                buffer, next_sync_index, emit_through, xyz_csv_path, xyz_row_count, camera_array, xy_gap_fill, robust_triangulation, undistorter
+            )
+            next_sync_index = emit_through + 1
+            buffer = buffer[buffer["sync_index"] > emit_through - margin]
+
+        logger.info(f"(Stage 2 of 2): Triangulation has reached sync index {next_sync_index}")
+
+    if buffer is not None and buffer.shape[0] > 0:
+        xyz_row_count += _triangulate_window(
+            buffer, next_sync_index, buffer["sync_index"].max(), xyz_csv_path, xyz_row_count, camera_array, xy_gap_fill, robust_triangulation, undistorter
+        )
+
+    return xyz_row_count
+
+
+def _triangulate_window(
+    xy_window: pd.DataFrame,
+    first_sync_index: int,
+    last_sync_index: int,
+    xyz_csv_path: Path,
+    xyz_row_count: int,
+    camera_array: CameraArray,
+    xy_gap_fill: int,
+    robust_triangulation: bool,
+    undistorter: Undistorter,
+) -> int:
+    """
+    gap fill the window, then triangulate and append only the sync indices from first to last (inclusive)
+    """
+    xy = gap_fill_xy(xy_window, max_gap_size=xy_gap_fill)
+    xy = xy[(xy["sync_index"] >= first_sync_index) & (xy["sync_index"] <= last_sync_index)]
+
+    if xy.shape[0] == 0:
+        return 0
+
+    xyz = triangulate_xy(xy, camera_array, robust=robust_triangulation, undistorter=undistorter)
+    # keep the row labels continuous so the file matches one written in a single pass
+    xyz.index = range(xyz_row_count, xyz_row_count + xyz.shape[0])
+
+    first_write = xyz_row_count == 0
+    xyz.to_csv(xyz_csv_path, mode="w" if first_write else "a", header=first_write)
+
+    return xyz.shape[0]
+
+
 if __name__ == "__main__":
     from caliscope.controller import Controller
 
@@ -0,0 +1,118 @@
+import caliscope.logger
+
+from queue import Queue, Empty
+from threading import Thread, Event, Lock
+
+import cv2
+
+from caliscope.recording.frame_store import FrameStore
+
+logger = caliscope.logger.get(__name__)
+
+DEFAULT_PREFETCH_DEPTH = 8  # frames decoded ahead of the tracker during batch processing
+
+
+class FramePrefetcher:
+    """
+    Decodes frames from a cv2.VideoCapture on its own thread so that video decoding can
+    overlap with landmark tracking. At most `depth` frames are decoded ahead of the consumer.
+
+    Each frame is decoded into memory of its own and handed out without a copy, as FramePackets
+    outlive the read (they sit on subscriber queues, get written to video, displayed, etc.).
+    That memory is a slot of the FrameStore if one is provided, recycled once the frame is no
+    longer referenced, and otherwise a new array from the decoder.
+    """
+
+    def __init__(
+        self,
+        capture: cv2.VideoCapture,
+        depth: int = DEFAULT_PREFETCH_DEPTH,
+        frame_store: FrameStore = None,
+    ):
+        self.capture = capture
+        self.depth = depth
+        self.frame_store = frame_store
+
+        # slots here only limit how far ahead decoding runs; each holds a decoded frame until it is read
+        self.buffers = [None] * depth
+
+        self._free_slots = Queue()
+        for slot in range(depth):
+            self._free_slots.put(slot)
+        self._ready = Queue()
+
+        # a seek invalidates everything decoded before it; each decoded frame is tagged with
+        # the generation it was read under so that stale frames can be dropped by the reader
+        self._lock = Lock()
+        self._generation = 0
+        self._seek_target = None
+        self._seek_event = Event()
+
+        self.stop_event = Event()
+        self.thread = Thread(target=self._decode_worker, args=[], daemon=True)
+        self.thread.start()
+
+    def _decode_worker(self):
+        generation = 0
+
+        while not self.stop_event.is_set():
+            if self._seek_event.is_set():
+                with self._lock:
+                    generation = self._generation
+                    target = self._seek_target
+                    self._seek_event.clear()
+                logger.debug(f"Prefetcher seeking to frame {target}")
+                self.capture.set(cv2.CAP_PROP_POS_FRAMES, target)
+
+            try:
+                slot = self._free_slots.get(timeout=0.1)
+            except Empty:
+                continue
+
+            if self.frame_store is not None:
+                success, frame = self.capture.read(self.frame_store.acquire())
+            else:
+                success, frame = self.capture.read()
+
+            if success:
+                # the decoder only reuses the store's buffer when the frame has the expected layout
+                self.buffers[slot] = frame
+                self._ready.put((generation, slot))
+            else:
+                self._free_slots.put(slot)
+                self._ready.put((generation, None))
+                # nothing more to decode unless the reader seeks elsewhere
+                while not (self._seek_event.is_set() or self.stop_event.is_set()):
+                    self._seek_event.wait(0.1)
+
+    def read(self):
+        """
+        Same return signature as cv2.VideoCapture.read
+        """
+        while True:
+            generation, slot = self._ready.get()
+
+            with self._lock:
+                stale = generation != self._generation
+
+            if slot is None:
+                if stale:
+                    continue
+                return False, None
+
+            frame = self.buffers[slot]
+            self.buffers[slot] = None
+            self._free_slots.put(slot)
+            if stale:
+                continue
+            return True, frame
+
+    def seek(self, frame_index: int):
+        with self._lock:
+            self._generation += 1
+            self._seek_target = frame_index
+            self._seek_event.set()
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
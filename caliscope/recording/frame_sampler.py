@@ -0,0 +1,110 @@
+import caliscope.logger
+
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from caliscope.calibration.charuco import Charuco
+from caliscope.recording.seek_index import SeekIndex, FrameSeeker
+
+logger = caliscope.logger.get(__name__)
+
+CANDIDATES_PER_SAMPLE = 3  # frames screened for each frame ultimately sampled
+SCREENING_SCALE = 0.25  # resolution of the screening pass relative to the recorded frames
+UNREADABLE = -1  # score of a candidate frame that could not be decoded, so it is never sampled
+
+
+def strided_frame_indices(start_frame_index: int, last_frame_index: int, count: int) -> np.ndarray:
+    """
+    count frame indices spread evenly from start to last (inclusive). Every frame if there are no more than count
+    """
+    frame_count = last_frame_index - start_frame_index + 1
+    if count >= frame_count:
+        return np.arange(start_frame_index, last_frame_index + 1)
+
+    return np.unique(np.linspace(start_frame_index, last_frame_index, count).round().astype(np.int64))
+
+
+def count_charuco_markers(frame: np.ndarray, charuco: Charuco, scale: float = SCREENING_SCALE) -> int:
+    """
+    Number of aruco markers found in a downscaled copy of the frame. Much cheaper than full charuco
+    corner detection and sufficient to tell which frames show the board well
+    """
+    small = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    if charuco.inverted:
+        gray = ~gray
+
+    marker_corners, _, _ = cv2.aruco.detectMarkers(gray, charuco.dictionary_object)
+    if len(marker_corners) == 0:
+        # as in the tracker, the board may only be found in the mirror image
+        marker_corners, _, _ = cv2.aruco.detectMarkers(cv2.flip(gray, 1), charuco.dictionary_object)
+
+    return len(marker_corners)
+
+
+def screen_frames(video_path: Path, frame_indices: np.ndarray, charuco: Charuco, scale: float = SCREENING_SCALE) -> np.ndarray:
+    """
+    Marker count at each of the frame indices. Only these frames are decoded.
+    Frames from the first that cannot be read onward are scored UNREADABLE
+    """
+    capture = cv2.VideoCapture(str(video_path))
+    seeker = FrameSeeker(capture, SeekIndex.load_or_build(video_path), cache_size=0)
+
+    marker_counts = np.full(len(frame_indices), UNREADABLE, dtype=np.int64)
+    for i, frame_index in enumerate(frame_indices):
+        success, frame = seeker.read(int(frame_index))
+        if not success:
+            logger.warning(f"Unable to read frame {frame_index} of {video_path} while screening")
+            break
+        marker_counts[i] = count_charuco_markers(frame, charuco, scale)
+
+    capture.release()
+    return marker_counts
+
+
+def select_spread(frame_indices: np.ndarray, scores: np.ndarray, count: int) -> np.ndarray:
+    """
+    The best scoring frame from each of count consecutive runs of the candidates, so that the
+    selection favors clear views of the board while still covering the whole recording
+    """
+    if count >= len(frame_indices):
+        return np.asarray(frame_indices)
+
+    selected = []
+    for run in np.array_split(np.arange(len(frame_indices)), count):
+        selected.append(frame_indices[run[np.argmax(scores[run])]])
+
+    return np.array(selected, dtype=np.int64)
+
+
+def sample_charuco_frames(
+    video_path: Path,
+    start_frame_index: int,
+    last_frame_index: int,
+    sample_count: int,
+    charuco: Charuco = None,
+    candidates_per_sample: int = CANDIDATES_PER_SAMPLE,
+) -> np.ndarray:
+    """
+    Decide up front which frames of a calibration video are worth decoding and tracking at full resolution.
+
+    Without a charuco the frames are simply spread evenly across the video. With one, a few times as many
+    evenly spread candidates are first screened at low resolution, and the frames showing the most
+    markers are kept.
+    """
+    if charuco is None:
+        return strided_frame_indices(start_frame_index, last_frame_index, sample_count)
+
+    candidates = strided_frame_indices(start_frame_index, last_frame_index, sample_count * candidates_per_sample)
+    marker_counts = screen_frames(video_path, candidates, charuco)
+
+    readable = marker_counts != UNREADABLE
+    frame_sample = select_spread(candidates[readable], marker_counts[readable], sample_count)
+
+    logger.info(
+        f"Sampled {len(frame_sample)} of {last_frame_index - start_frame_index + 1} frames from {video_path} "
+        f"after screening {len(candidates)}"
+    )
+    return frame_sample
@@ -0,0 +1,128 @@
+import caliscope.logger
+
+import weakref
+from multiprocessing import shared_memory
+from queue import Queue, Empty
+
+import numpy as np
+
+logger = caliscope.logger.get(__name__)
+
+# stores that are currently open, so that a frame can be traced back to its shared memory
+_open_stores = weakref.WeakSet()
+# closed stores whose memory was still referenced by frames at the time
+_lingering_memory = []
+
+
+class FrameStore:
+    """
+    A fixed number of frame-sized slots in one block of shared memory.
+
+    `acquire` hands out a slot as an ordinary np.ndarray that views the shared memory, so decoding
+    can write into it and every consumer downstream (tracker, synchronizer, recorder, display)
+    reads the same pixels without copying them. Tracker processes can map the same memory by
+    name via `locate_frame`.
+
+    Slots are reference counted by Python itself: a slot returns to the store once the array and
+    every view derived from it have been garbage collected, so consumers never release anything
+    explicitly. If all slots are in use, acquire falls back to an ordinary heap allocation rather
+    than stalling the pipeline.
+    """
+
+    def __init__(self, frame_shape: tuple, slot_count: int, dtype=np.uint8, name: str = ""):
+        self.frame_shape = tuple(frame_shape)
+        self.dtype = np.dtype(dtype)
+        self.slot_count = slot_count
+        self.name = name
+
+        self.frame_bytes = int(np.prod(self.frame_shape)) * self.dtype.itemsize
+        self.shm = shared_memory.SharedMemory(create=True, size=self.frame_bytes * slot_count)
+        self.base_address = np.frombuffer(self.shm.buf, dtype=np.uint8).ctypes.data
+
+        self.free_slots = Queue()
+        for slot in range(slot_count):
+            self.free_slots.put(slot)
+
+        self.high_water_mark = 0  # most slots in use at one time
+        self.overflow_count = 0  # frames allocated on the heap because every slot was in use
+
+        self._finalizer = weakref.finalize(self, _unlink, self.shm)
+        _open_stores.add(self)
+
+    @property
+    def slots_in_use(self) -> int:
+        return self.slot_count - self.free_slots.qsize()
+
+    def acquire(self, timeout: float = 0) -> np.ndarray:
+        """
+        Returns an uninitialized frame. It is backed by shared memory unless every slot is in use
+        for longer than timeout seconds
+        """
+        try:
+            slot = self.free_slots.get(timeout=timeout) if timeout > 0 else self.free_slots.get_nowait()
+        except Empty:
+            self.overflow_count += 1
+            if self.overflow_count % 100 == 1:
+                logger.info(f"Frame store {self.name} full; {self.overflow_count} frame(s) allocated on heap")
+            return np.empty(self.frame_shape, dtype=self.dtype)
+
+        self.high_water_mark = max(self.high_water_mark, self.slots_in_use)
+
+        # frombuffer (unlike np.ndarray(buffer=...)) holds an export of the shared memory, so the
+        # mapping cannot be closed out from under a frame that is still in use
+        flat_frame = np.frombuffer(
+            self.shm.buf, dtype=self.dtype, count=int(np.prod(self.frame_shape)), offset=slot * self.frame_bytes
+        )
+        # every view of the frame (including the reshape) refers back to flat_frame, so the slot is free
+        # once it is gone. free_slots is referenced directly so the callback does not keep the store alive
+        weakref.finalize(flat_frame, self.free_slots.put, slot)
+        return flat_frame.reshape(self.frame_shape)
+
+    def locate(self, frame: np.ndarray):
+        """
+        (shared memory name, byte offset) of a contiguous frame held in this store, otherwise None
+        """
+        if not frame.flags.c_contiguous:
+            return None
+
+        offset = frame.ctypes.data - self.base_address
+        if 0 <= offset and offset + frame.nbytes <= self.frame_bytes * self.slot_count:
+            return self.shm.name, offset
+        return None
+
+    def close(self):
+        _open_stores.discard(self)
+        self._finalizer()
+
+    @property
+    def metrics(self) -> dict:
+        return {
+            "slot_count": self.slot_count,
+            "in_use": self.slots_in_use,
+            "high_water_mark": self.high_water_mark,
+            "overflow": self.overflow_count,
+        }
+
+
+def _unlink(shm: shared_memory.SharedMemory):
+    shm.unlink()
+    _lingering_memory.append(shm)
+
+    # memory can only be closed once no frames reference it; anything still in use is retried next time
+    for lingering in list(_lingering_memory):
+        try:
+            lingering.close()
+            _lingering_memory.remove(lingering)
+        except BufferError:
+            pass
+
+
+def locate_frame(frame: np.ndarray):
+    """
+    (shared memory name, byte offset) if the frame lives in any open FrameStore, otherwise None
+    """
+    for store in list(_open_stores):
+        location = store.locate(frame)
+        if location is not None:
+            return location
+    return None
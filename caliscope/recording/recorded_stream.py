@@ -3,7 +3,8 @@ import caliscope.logger
 import logging
 
 from pathlib import Path
-from queue import Queue
+from collections import deque
+from queue import Queue, Full
 from threading import Thread, Event
 import rtoml
 
@@ -15,6 +16,10 @@ import numpy as np
 from caliscope.packets import FramePacket, Tracker
 from caliscope.cameras.camera_array import CameraData
 from caliscope.configurator import Configurator
+from caliscope.recording.frame_prefetcher import FramePrefetcher
+from caliscope.recording.frame_store import FrameStore
+from caliscope.recording.seek_index import SeekIndex, FrameSeeker
+from caliscope.trackers.tracker_cache import TrackerCache, hash_playback
 
 logger = caliscope.logger.get(__name__)
 logger.setLevel(logging.INFO)
@@ -36,17 +41,40 @@ class RecordedStream:
         fps_target: int = None,
         tracker: Tracker = None,
         break_on_last=True,
+        prefetch_depth: int = 0,
+        frame_store_slots: int = 0,
+        tracker_batch_size: int = 1,
+        cache_points: bool = False,
     ):
         # self.port = port
         self.directory = directory
         self.port = port
         self.rotation_count = rotation_count
         self.break_on_last = break_on_last  # stop while loop if end reached. Preferred behavior for automated file processing, not interactive frame selection
+        self.prefetch_depth = prefetch_depth  # frames decoded ahead on a separate thread; 0 decodes inline
+        self.prefetcher = None
+        self.frame_store_slots = frame_store_slots  # frames decoded into shared memory during playback; 0 uses the heap
+        self.frame_store = None
+        self.seeker = None  # created on the first jump; sequential playback never needs it
+        self.frame_sample = None  # sorted frame indices to play when only a subset is processed; None plays every frame
+        self.tracker_batch_size = tracker_batch_size  # frames read ahead and handed to the tracker together
+        self._tracked_ahead = deque()  # (frame_index, frame, points) already read and tracked, but not yet published
+        self.cache_points = cache_points  # points are read from the tracker cache when available and saved to it when not
+        self.tracker_cache = None
+        # when False, frames with cached points are not decoded and are published without a frame
+        # (for processing that only needs the points)
+        self.decode_cached_frames = True
+        self._skip_cached_frames = False
+        # points of a stateful tracker depend on the frames it was given before, so they are cached against
+        # the planned sequence of frames and only read back once that whole sequence has been cached.
+        # Nothing is cached once playback leaves the plan (e.g. a jump)
+        self._read_cached_points = True
+        self._playback_broken = False
 
         self.tracker = tracker
 
-        video_path = str(Path(self.directory, f"port_{self.port}.mp4"))
-        self.capture = cv2.VideoCapture(video_path)
+        self.video_path = Path(self.directory, f"port_{self.port}.mp4")
+        self.capture = cv2.VideoCapture(str(self.video_path))
 
         # for playback, set the fps target to the actual
         self.original_fps = int(self.capture.get(cv2.CAP_PROP_FPS))
@@ -64,32 +92,30 @@ class RecordedStream:
         self.subscribers = []
 
         ############ PROCESS WITH TRUE TIME STAMPS IF AVAILABLE #########################
+        # frame times are held in an array indexed by frame_index so that the lookup for each frame is O(1)
         synched_frames_history_path = Path(self.directory, "frame_time_history.csv")
 
         if synched_frames_history_path.exists():
-            synched_frames_history = pd.read_csv(synched_frames_history_path)
-
-            self.port_history = synched_frames_history[
-                synched_frames_history["port"] == self.port
-            ]
-
-            self.port_history["frame_index"] = (
-                self.port_history["frame_time"].rank(method="min").astype(int) - 1
+            synched_frames_history = pd.read_csv(
+                synched_frames_history_path, usecols=["port", "frame_time"]
             )
+            ports = synched_frames_history["port"].to_numpy()
+            port_frame_times = synched_frames_history["frame_time"].to_numpy(dtype=np.float64)[ports == self.port]
+
+            # frame index is the order in which the frame was read (i.e. rank of the frame time)
+            frame_indices = np.searchsorted(np.sort(port_frame_times), port_frame_times, side="left")
+            self.frame_times = np.full(frame_indices.max() + 1, np.nan)
+            self.frame_times[frame_indices] = port_frame_times
 
         ########### INFER TIME STAMP IF NOT AVAILABLE ####################################
         else:
             frame_count = int(self.capture.get(cv2.CAP_PROP_FRAME_COUNT))
-            mocked_port_history = {
-                "frame_index": [i for i in range(0, frame_count)],
-                "frame_time": [i / self.original_fps for i in range(0, frame_count)],
-            }
-            self.port_history = pd.DataFrame(mocked_port_history)
+            self.frame_times = np.arange(0, frame_count) / self.original_fps
 
         # note that this is not simply 0 and frame count because the syncronized recording might start recording many frames into pulling from a camera
         # this is one of those unhappy artifacts that may be a good candidate for simplification in a future refactor
-        self.start_frame_index = self.port_history["frame_index"].min()
-        self.last_frame_index = self.port_history["frame_index"].max()
+        self.start_frame_index = int(np.flatnonzero(~np.isnan(self.frame_times))[0])
+        self.last_frame_index = len(self.frame_times) - 1
 
         # initialize properties
         self.frame_index = 0
@@ -130,6 +156,9 @@ class RecordedStream:
             )
 
     def set_fps_target(self, fps):
+        """
+        fps of None removes all throttling so that frames are read as fast as they can be processed
+        """
         self.fps = fps
         if self.fps is None:
             self.milestones = None
@@ -156,6 +185,49 @@ class RecordedStream:
         else:
             return future_wait_times[0]
 
+    def set_frame_sample(self, frame_indices):
+        """
+        Restrict playback to these frame indices (e.g. a sparse set of calibration frames).
+        Frames in between are neither published nor tracked, and are not decoded at all when
+        a keyframe lies between them and the next sampled frame. None restores every frame.
+        """
+        if frame_indices is None:
+            logger.info(f"Playing every frame at port {self.port}")
+            self.frame_sample = None
+        else:
+            self.frame_sample = np.unique(np.asarray(frame_indices, dtype=np.int64))
+            logger.info(f"Playing {len(self.frame_sample)} sampled frames at port {self.port}")
+
+        if self.tracker_cache is not None and self.tracker_cache.playback is not None:
+            self._playback_broken = True
+
+    @property
+    def final_frame_index(self):
+        """
+        Last frame index that playback will reach
+        """
+        if self.frame_sample is None or len(self.frame_sample) == 0:
+            return self.last_frame_index
+        return int(min(self.frame_sample[-1], self.last_frame_index))
+
+    def _planned_frame_indices(self, first_frame_index: int) -> np.ndarray:
+        """
+        Frames that playback will reach from first_frame_index onward, unless it is interrupted
+        """
+        if self.frame_sample is None:
+            return np.arange(first_frame_index, self.last_frame_index + 1)
+        in_range = (self.frame_sample >= first_frame_index) & (self.frame_sample <= self.last_frame_index)
+        return self.frame_sample[in_range]
+
+    def _next_frame_index(self, frame_index: int) -> int:
+        if self.frame_sample is None:
+            return frame_index + 1
+
+        position = np.searchsorted(self.frame_sample, frame_index, side="right")
+        if position < len(self.frame_sample):
+            return int(self.frame_sample[position])
+        return self.last_frame_index + 1
+
     def jump_to(self, frame_index: int):
         logger.info(f"Placing {frame_index} on jump q to reset capture position")
         self._jump_q.put(frame_index)
@@ -173,18 +245,203 @@ class RecordedStream:
         self.thread = Thread(target=self._play_worker, args=[], daemon=False)
         self.thread.start()
 
+    def _publish(self, frame_packet: FramePacket):
+        """
+        Place the frame packet on all subscriber queues. Subscribers with bounded queues
+        apply backpressure here; the wait is abandoned if the stream is stopped
+        """
+        for q in self.subscribers:
+            while True:
+                try:
+                    q.put(frame_packet, timeout=0.1)
+                    break
+                except Full:
+                    if self.stop_event.is_set():
+                        return
+
+    def _read_frame(self, frame_index: int):
+        if self.prefetcher is not None:
+            return self.prefetcher.read()
+        elif self.seeker is not None:
+            return self.seeker.read(frame_index)
+        elif self.frame_store is not None:
+            return self.capture.read(self.frame_store.acquire())
+        else:
+            return self.capture.read()
+
+    def _get_tracker_cache(self):
+        if not self.cache_points or self.tracker is None:
+            return None
+
+        if self._playback_broken and self.tracker.stateful:
+            if self.tracker_cache is not None:
+                logger.info(f"Playback at port {self.port} left the planned frames; no longer caching points")
+                self.tracker_cache.close()
+                self.tracker_cache = None
+            return None
+
+        # the tracker may be swapped (e.g. a new charuco) or the stream rotated during playback,
+        # and points are cached separately for each
+        if (
+            self.tracker_cache is None
+            or self.tracker_cache.tracker is not self.tracker
+            or self.tracker_cache.rotation_count != self.rotation_count
+        ):
+            if self.tracker_cache is not None:
+                self.tracker_cache.close()
+
+            if self.tracker.stateful:
+                # the tracker sees the planned frames from here on
+                planned_frame_indices = self._planned_frame_indices(self.frame_index)
+                self.tracker_cache = TrackerCache(
+                    self.video_path, self.tracker, self.rotation_count, playback=hash_playback(planned_frame_indices)
+                )
+                self._read_cached_points = self.tracker_cache.covers(planned_frame_indices)
+            else:
+                self.tracker_cache = TrackerCache(self.video_path, self.tracker, self.rotation_count)
+                self._read_cached_points = True
+        return self.tracker_cache
+
+    def _cached_points(self, frame_index: int):
+        tracker_cache = self._get_tracker_cache()
+        if tracker_cache is None or not self._read_cached_points:
+            return None
+        return tracker_cache.get(frame_index)
+
+    def _store_points(self, frame_index: int, point_packet):
+        tracker_cache = self._get_tracker_cache()
+        if tracker_cache is not None:
+            tracker_cache.put(frame_index, point_packet)
+
+    def _track_batch(self):
+        """
+        Read up to tracker_batch_size frames starting at the current frame index and
+        track them with a single call so the tracker can pipeline its work across them.
+        Frames with cached points are not tracked again
+        """
+        frame_indices = []
+        frames = []
+        point_packets = []
+        frame_index = self.frame_index
+        while len(frame_indices) < self.tracker_batch_size and frame_index <= self.last_frame_index:
+            point_packet = self._cached_points(frame_index)
+            if point_packet is not None and self._skip_cached_frames:
+                frame = None
+            else:
+                if frame_indices and frame_index != frame_indices[-1] + 1:
+                    self._seek(frame_index)
+                success, frame = self._read_frame(frame_index)
+                if not success:
+                    break
+            frame_indices.append(frame_index)
+            frames.append(frame)
+            point_packets.append(point_packet)
+            frame_index = self._next_frame_index(frame_index)
+
+        untracked = [i for i, point_packet in enumerate(point_packets) if point_packet is None]
+        if len(untracked) > 0:
+            tracked = self.tracker.get_points_batch(
+                [frames[i] for i in untracked], [self.port] * len(untracked), [self.rotation_count] * len(untracked)
+            )
+            for i, point_packet in zip(untracked, tracked):
+                point_packets[i] = point_packet
+                self._store_points(frame_indices[i], point_packet)
+
+        self._tracked_ahead.extend(zip(frame_indices, frames, point_packets))
+
+    def _read_tracked_frame(self):
+        """
+        returns success, frame and the points tracked in it (None without a tracker)
+        """
+        if self.tracker is None:
+            success, frame = self._read_frame(self.frame_index)
+            return success, frame, None
+
+        if self.tracker_batch_size <= 1:
+            point_packet = self._cached_points(self.frame_index)
+            if point_packet is not None and self._skip_cached_frames:
+                return True, None, point_packet
+
+            success, frame = self._read_frame(self.frame_index)
+            if not success:
+                return False, None, None
+            if point_packet is None:
+                point_packet = self.tracker.get_points(frame, self.port, self.rotation_count)
+                self._store_points(self.frame_index, point_packet)
+            return True, frame, point_packet
+
+        if len(self._tracked_ahead) == 0:
+            self._track_batch()
+        if len(self._tracked_ahead) == 0:
+            return False, None, None
+
+        frame_index, frame, point_packet = self._tracked_ahead.popleft()
+        return True, frame, point_packet
+
+    def _seek(self, frame_index: int):
+        if self.prefetcher is not None:
+            self.prefetcher.seek(frame_index)
+            return
+
+        # interactive scrubbing: frames are reached from the nearest keyframe and recent ones are cached
+        if self.seeker is None:
+            self.seeker = FrameSeeker(self.capture, SeekIndex.load_or_build(self.video_path))
+        self.seeker.seek(frame_index)
+
     def _play_worker(self):
         """
         Places FramePacket on the out_q, mimicking the behaviour of the LiveStream.
         """
+        if self.frame_store_slots > 0:
+            width, height = self.size
+            self.frame_store = FrameStore(
+                (height, width, 3), self.frame_store_slots, name=f"recorded_stream_{self.port}"
+            )
 
-        self.frame_index = self.start_frame_index
+        # frames are only left undecoded once there are cached points to stand in for them
+        self.frame_index = self._next_frame_index(self.start_frame_index - 1)
+        self._playback_broken = False
+        tracker_cache = self._get_tracker_cache()
+        self._skip_cached_frames = (
+            not self.decode_cached_frames
+            and tracker_cache is not None
+            and self._read_cached_points
+            and len(tracker_cache) > 0
+        )
+        if self._skip_cached_frames:
+            logger.info(f"Frames with cached points will not be decoded at port {self.port}")
+            # frames that do need decoding are reached by seeking past the cached ones
+            self.seeker = FrameSeeker(self.capture, SeekIndex.load_or_build(self.video_path))
+
+        # sampled playback skips ahead, which would discard whatever had been decoded in advance
+        if self.prefetch_depth > 0 and self.frame_sample is None and not self._skip_cached_frames:
+            logger.info(f"Decoding up to {self.prefetch_depth} frames ahead at port {self.port}")
+            self.prefetcher = FramePrefetcher(self.capture, self.prefetch_depth, frame_store=self.frame_store)
+
+        try:
+            self._play_loop()
+        finally:
+            self._tracked_ahead.clear()
+            if self.tracker_cache is not None:
+                self.tracker_cache.close()
+                self.tracker_cache = None
+            if self.prefetcher is not None:
+                self.prefetcher.stop()
+                self.prefetcher = None
+            if self.frame_store is not None:
+                # frames still held downstream remain valid until they are released
+                logger.info(f"Frame store at port {self.port} ending with {self.frame_store.metrics}")
+                self.frame_store.close()
+                self.frame_store = None
+
+    def _play_loop(self):
+        self.frame_index = self._next_frame_index(self.start_frame_index - 1)
+        if self.frame_index != self.start_frame_index:
+            self._seek(self.frame_index)
         logger.info(f"Beginning playback of video for port {self.port}")
 
         while not self.stop_event.is_set():
-            current_frame = self.port_history["frame_index"] == self.frame_index
-            self.frame_time = self.port_history[current_frame]["frame_time"]
-            self.frame_time = float(self.frame_time)
+            self.frame_time = float(self.frame_times[self.frame_index])
 
             ########## BEGIN NO SUBSCRIBERS SPINLOCK ##################
             spinlock_looped = False
@@ -202,19 +459,14 @@ class RecordedStream:
             logger.debug(
                 f"about to read frame {self.frame_index} from capture at port {self.port}"
             )
-            success, self.frame = self.capture.read()
+            success, self.frame, self.point_data = self._read_tracked_frame()
 
             if not success:
                 break
 
-
             if self.tracker is not None:
-                self.point_data = self.tracker.get_points(
-                    self.frame, self.port, self.rotation_count
-                )
                 draw_instructions = self.tracker.scatter_draw_instructions
             else:
-                self.point_data = None
                 draw_instructions = None
 
             frame_packet = FramePacket(
@@ -230,11 +482,18 @@ class RecordedStream:
                 f"Placing frame on q {self.port} for frame time: {self.frame_time} and frame index: {self.frame_index}"
             )
 
-            for q in self.subscribers:
-                q.put(frame_packet)
+            self._publish(frame_packet)
 
             # self.out_q.put(frame_packet)
-            self.frame_index += 1
+            next_frame_index = self._next_frame_index(self.frame_index)
+            # frames already read ahead for the tracker leave the capture positioned past them
+            if (
+                len(self._tracked_ahead) == 0
+                and next_frame_index != self.frame_index + 1
+                and next_frame_index <= self.last_frame_index
+            ):
+                self._seek(next_frame_index)
+            self.frame_index = next_frame_index
 
             if self.frame_index > self.last_frame_index and self.break_on_last:
                 logger.info(f"Ending recorded playback at port {self.port}")
@@ -247,13 +506,13 @@ class RecordedStream:
                     points=None,
                 )
 
-                for q in self.subscribers:
-                    q.put(frame_packet)
+                self._publish(frame_packet)
                 break
 
             ############ Autopause if last frame and in playback mode (i.e. break_on_last == False)
             if not self.break_on_last and self.frame_index > self.last_frame_index:
                 self.frame_index = self.last_frame_index
+                self._playback_broken = True  # the last frame will be shown again
                 self._pause_event.set()
 
             ############ SPIN LOCK FOR PAUSE ##################
@@ -273,8 +532,10 @@ class RecordedStream:
             ############
             if not self._jump_q.empty():
                 self.frame_index = self._jump_q.get()
+                self._tracked_ahead.clear()
+                self._playback_broken = True
                 logger.info(
                     f"Setting port {self.port} capture object to frame index {self.frame_index}"
                 )
-                self.capture.set(cv2.CAP_PROP_POS_FRAMES, self.frame_index)
+                self._seek(self.frame_index)
 
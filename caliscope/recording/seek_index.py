@@ -0,0 +1,228 @@
+import caliscope.logger
+
+import struct
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from caliscope import __app_dir__
+from caliscope.recording.video_hash import hash_video
+
+logger = caliscope.logger.get(__name__)
+
+SEEK_CACHE_SIZE = 16  # recently decoded frames held for back-and-forth scrubbing
+SEEK_INDEX_DIR = Path(__app_dir__, "seek_index")
+
+
+def _read_boxes(f, start: int, end: int) -> dict:
+    """
+    Box type -> list of (payload start, payload end) for the ISO base media boxes between start and end
+    """
+    boxes = {}
+    position = start
+    while position + 8 <= end:
+        f.seek(position)
+        size, box_type = struct.unpack(">I4s", f.read(8))
+        header_size = 8
+        if size == 1:
+            size = struct.unpack(">Q", f.read(8))[0]
+            header_size = 16
+        elif size == 0:
+            size = end - position
+        if size < header_size:
+            break  # malformed; stop rather than loop forever
+
+        boxes.setdefault(box_type, []).append((position + header_size, position + size))
+        position += size
+    return boxes
+
+
+def _read_table(f, payload: tuple, row_format: str) -> np.ndarray:
+    """
+    Reads a full box (version/flags, entry count, then entries) into an (entry_count, columns) array
+    """
+    f.seek(payload[0] + 4)  # skip version and flags
+    entry_count = struct.unpack(">I", f.read(4))[0]
+    columns = len(row_format)
+    values = np.frombuffer(f.read(4 * columns * entry_count), dtype=">u4")
+    return values.reshape(entry_count, columns).astype(np.int64)
+
+
+def read_mp4_seek_tables(video_path: Path) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Reads the sample tables of the first video track of an mp4 file without decoding anything.
+
+    returns:
+        keyframes: sorted frame indices (in presentation order) at which decoding can begin
+        frame_times: presentation time of each frame in seconds
+    """
+    with open(video_path, "rb") as f:
+        f.seek(0, 2)
+        top_level = _read_boxes(f, 0, f.tell())
+        if b"moov" not in top_level:
+            raise ValueError(f"No moov box in {video_path}")
+
+        moov = _read_boxes(f, *top_level[b"moov"][0])
+        for trak_payload in moov.get(b"trak", []):
+            mdia = _read_boxes(f, *_read_boxes(f, *trak_payload)[b"mdia"][0])
+
+            hdlr_start, _ = mdia[b"hdlr"][0]
+            f.seek(hdlr_start + 8)  # version/flags and pre_defined precede the handler type
+            if f.read(4) != b"vide":
+                continue
+
+            mdhd_start, _ = mdia[b"mdhd"][0]
+            f.seek(mdhd_start)
+            version = f.read(1)[0]
+            f.seek(mdhd_start + (20 if version == 1 else 12))
+            timescale = struct.unpack(">I", f.read(4))[0]
+
+            stbl = _read_boxes(f, *_read_boxes(f, *mdia[b"minf"][0])[b"stbl"][0])
+
+            # decode time of each sample from run lengths of sample durations
+            stts = _read_table(f, stbl[b"stts"][0], "cd")
+            durations = np.repeat(stts[:, 1], stts[:, 0])
+            decode_times = np.concatenate([[0], np.cumsum(durations)[:-1]])
+
+            # composition offsets place samples in presentation order when there are B-frames
+            if b"ctts" in stbl:
+                ctts = _read_table(f, stbl[b"ctts"][0], "co")
+                offsets = np.repeat(ctts[:, 1].astype(np.uint32).view(np.int32), ctts[:, 0])
+                presentation_times = decode_times + offsets
+            else:
+                presentation_times = decode_times
+
+            presentation_order = np.argsort(presentation_times, kind="stable")
+            frame_index_of_sample = np.empty_like(presentation_order)
+            frame_index_of_sample[presentation_order] = np.arange(len(presentation_order))
+
+            # without a sync sample table, every sample is a keyframe
+            if b"stss" in stbl:
+                sync_samples = _read_table(f, stbl[b"stss"][0], "s")[:, 0] - 1  # 1-based
+            else:
+                sync_samples = np.arange(len(decode_times))
+
+            keyframes = np.sort(frame_index_of_sample[sync_samples])
+            frame_times = presentation_times[presentation_order] / timescale
+            return keyframes, frame_times
+
+    raise ValueError(f"No video track in {video_path}")
+
+
+@dataclass
+class SeekIndex:
+    """
+    Keyframe positions and frame times of a video, so that any frame can be reached by decoding
+    forward from the nearest keyframe before it
+    """
+
+    keyframes: np.ndarray
+    frame_times: np.ndarray
+
+    def keyframe_before(self, frame_index: int) -> int:
+        position = np.searchsorted(self.keyframes, frame_index, side="right") - 1
+        return int(self.keyframes[max(position, 0)])
+
+    @classmethod
+    def load_or_build(cls, video_path: Path, index_dir: Path = None):
+        """
+        The index is saved the first time it is built, named for the content hash of the video so
+        that a changed video is indexed again and recording directories are never written to.
+        Returns None if the video's sample tables cannot be read
+
+        index_dir: defaults to SEEK_INDEX_DIR within the application data directory
+        """
+        video_path = Path(video_path)
+        index_dir = Path(SEEK_INDEX_DIR if index_dir is None else index_dir)
+        index_path = Path(index_dir, f"{hash_video(video_path)}.npz")
+
+        if index_path.exists():
+            try:
+                with np.load(index_path) as saved:
+                    return cls(saved["keyframes"], saved["frame_times"])
+            except Exception as e:
+                logger.warning(f"Unable to load seek index at {index_path}: {e}")
+
+        try:
+            keyframes, frame_times = read_mp4_seek_tables(video_path)
+        except Exception as e:
+            logger.warning(f"Unable to build seek index for {video_path}: {e}")
+            return None
+
+        logger.info(f"Built seek index for {video_path} with {len(keyframes)} keyframes")
+        seek_index = cls(keyframes, frame_times)
+        try:
+            index_dir.mkdir(exist_ok=True, parents=True)
+            np.savez(index_path, keyframes=keyframes, frame_times=frame_times)
+        except OSError as e:
+            logger.warning(f"Unable to save seek index to {index_path}: {e}")
+
+        return seek_index
+
+
+class FrameSeeker:
+    """
+    Random access to the frames of a cv2.VideoCapture.
+
+    A frame is decoded forward from the current position when that is no further than decoding from
+    the nearest keyframe; only otherwise does the capture seek (to the keyframe itself). Recently decoded
+    frames are held in a small LRU cache so stepping back and forth does not decode at all.
+    """
+
+    def __init__(self, capture: cv2.VideoCapture, seek_index: SeekIndex = None, cache_size: int = SEEK_CACHE_SIZE):
+        self.capture = capture
+        self.seek_index = seek_index
+        self.cache_size = cache_size
+        self.cache = OrderedDict()  # frame_index: frame
+
+        self.position = int(self.capture.get(cv2.CAP_PROP_POS_FRAMES))  # index of the next frame decoded
+
+    def seek(self, frame_index: int) -> bool:
+        """
+        Position the capture so that frame_index is the next frame decoded. Frames already
+        in the cache need no decoding, so the capture is left where it is
+        """
+        if frame_index in self.cache or frame_index == self.position:
+            return True
+
+        if self.seek_index is None:
+            keyframe = frame_index  # no knowledge of keyframes; let the capture find its own way there
+        else:
+            keyframe = self.seek_index.keyframe_before(frame_index)
+
+        if not keyframe <= self.position <= frame_index:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, keyframe)
+            self.position = keyframe
+
+        # frames short of the target only need to pass through the decoder
+        while self.position < frame_index:
+            if not self.capture.grab():
+                return False
+            self.position += 1
+
+        return True
+
+    def read(self, frame_index: int):
+        """
+        Same return signature as cv2.VideoCapture.read
+        """
+        if frame_index in self.cache:
+            self.cache.move_to_end(frame_index)
+            return True, self.cache[frame_index]
+
+        if not self.seek(frame_index):
+            return False, None
+
+        success, frame = self.capture.read()
+        if not success:
+            return False, None
+        self.position += 1
+
+        self.cache[frame_index] = frame
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+        return True, frame
@@ -0,0 +1,65 @@
+import caliscope.logger
+
+import os
+import json
+import hashlib
+from pathlib import Path
+from threading import Lock
+
+from caliscope import __app_dir__
+
+logger = caliscope.logger.get(__name__)
+
+VIDEO_HASH_PATH = Path(__app_dir__, "video_hashes.json")
+HASH_CHUNK_SIZE = 1 << 20
+
+_video_hashes = {}  # (path, size, mtime_ns): content hash, so a video is read in full at most once per session
+_video_hash_lock = Lock()
+
+
+def hash_video(video_path: Path) -> str:
+    """
+    Hash of the content of the video, so that anything derived from it (tracked points, seek indices)
+    can be stored in the application data directory and found again from copies and moves of a recording.
+
+    Hashes are remembered against the path, size and modification time of the file in VIDEO_HASH_PATH;
+    the video is only read again once it changes
+    """
+    memo_path = Path(VIDEO_HASH_PATH)
+    video_path = Path(video_path).resolve()
+    video_stat = video_path.stat()
+    key = (str(video_path), video_stat.st_size, video_stat.st_mtime_ns)
+
+    with _video_hash_lock:
+        if key in _video_hashes:
+            return _video_hashes[key]
+
+        memo = {}
+        if memo_path.exists():
+            try:
+                memo = json.loads(memo_path.read_text())
+            except (OSError, ValueError) as e:
+                logger.warning(f"Unable to read video hashes at {memo_path}: {e}")
+
+        entry = memo.get(key[0])
+        if entry is not None and [entry["size"], entry["mtime_ns"]] == list(key[1:]):
+            content_hash = entry["hash"]
+        else:
+            logger.info(f"Hashing content of {video_path}")
+            digest = hashlib.blake2b(digest_size=16)
+            with open(video_path, "rb") as f:
+                while chunk := f.read(HASH_CHUNK_SIZE):
+                    digest.update(chunk)
+            content_hash = digest.hexdigest()
+
+            memo[key[0]] = {"size": key[1], "mtime_ns": key[2], "hash": content_hash}
+            try:
+                memo_path.parent.mkdir(exist_ok=True, parents=True)
+                temp_path = memo_path.with_suffix(f".{os.getpid()}.tmp")
+                temp_path.write_text(json.dumps(memo))
+                temp_path.replace(memo_path)
+            except OSError as e:
+                logger.warning(f"Unable to save video hashes to {memo_path}: {e}")
+
+        _video_hashes[key] = content_hash
+        return content_hash
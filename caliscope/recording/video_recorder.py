@@ -1,22 +1,31 @@
 # from PySide6.QtCore import QObject, Signal
 from pathlib import Path
-from queue import Queue
 from threading import Thread, Event
 import cv2
 import pandas as pd
 
 from caliscope.cameras.synchronizer import Synchronizer
 from caliscope.packets import SyncPacket
+from caliscope.bounded_queue import BoundedQueue, OverflowPolicy
 import caliscope.logger
 
 logger = caliscope.logger.get(__name__)
 
 
 class VideoRecorder:
-    def __init__(self, synchronizer: Synchronizer, suffix: str = None):
+    def __init__(
+        self,
+        synchronizer: Synchronizer,
+        suffix: str = None,
+        max_queue_size: int = -1,
+        overflow_policy: OverflowPolicy = OverflowPolicy.BLOCK,
+    ):
         """
         suffix: provide a way to clarify any modifications to the video that are being saved
         This is likely going to be the name of the tracker used in most cases
+        max_queue_size: bound on unsaved sync packets
+        overflow_policy: what happens when max_queue_size is reached. BLOCK has the synchronizer wait on the
+        recorder. DROP_FRAMES leaves those frames out of the video but still saves their point data.
         """
         super().__init__()
         self.synchronizer = synchronizer
@@ -33,7 +42,7 @@ class VideoRecorder:
         # build dict that will be stored to csv
         self.trigger_stop = Event()
 
-        self.sync_packet_in_q = Queue(-1)
+        self.sync_packet_in_q = BoundedQueue(max_queue_size, overflow_policy, name="video_recorder")
 
     def build_video_writers(self):
         """
@@ -78,6 +87,7 @@ class VideoRecorder:
             "img_loc_y": [],
             "obj_loc_x": [],
             "obj_loc_y": [],
+            "confidence": [],
         }
 
         self.synchronizer.subscribe_to_sync_packets(self.sync_packet_in_q)
@@ -106,16 +116,17 @@ class VideoRecorder:
             for port, frame_packet in sync_packet.frame_packets.items():
                 if frame_packet is not None:
                     logger.debug("Processiong frame packet...")
-                    # read in the data for this frame for this port
-                    if show_points:
-                        frame = frame_packet.frame_with_points
-                    else:
-                        frame = frame_packet.frame
-
                     frame_index = frame_packet.frame_index
                     frame_time = frame_packet.frame_time
 
-                    if include_video:
+                    # frames may have been stripped if the recorder fell behind; points are still saved
+                    if include_video and frame_packet.frame is not None:
+                        # read in the data for this frame for this port
+                        if show_points:
+                            frame = frame_packet.frame_with_points
+                        else:
+                            frame = frame_packet.frame
+
                         # store the frame
                         if self.sync_index % 50 == 0:
                             logger.debug(
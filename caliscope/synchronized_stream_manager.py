@@ -3,13 +3,21 @@ import statistics
 import cv2
 from pathlib import Path
 from caliscope.cameras.synchronizer import Synchronizer
+from caliscope.cameras.sync_planner import PlannedSynchronizer, plan_synchronization, sample_plan
 from caliscope.recording.recorded_stream import RecordedStream
+from caliscope.recording.frame_prefetcher import DEFAULT_PREFETCH_DEPTH
 from caliscope.cameras.camera_array import CameraData
 from caliscope.packets import Tracker
 from caliscope.recording.video_recorder import VideoRecorder
 
 logger = caliscope.logger.get(__name__)
 
+BATCH_MAX_PENDING_FRAMES = 16  # frames per port held between stream and recorder in batch mode
+BATCH_TRACKER_FRAMES = 8  # frames per port handed to the tracker in a single call in batch mode
+# shared memory frames per port in batch mode: enough for the prefetcher, the tracker batch, the synchronizer
+# and recorder queues, and the few frames in hand at each stage; beyond this frames fall back to the heap
+BATCH_FRAME_STORE_SLOTS = DEFAULT_PREFETCH_DEPTH + BATCH_TRACKER_FRAMES + 2 * BATCH_MAX_PENDING_FRAMES + 4
+
 
 class SynchronizedStreamManager:
     """
@@ -31,10 +39,24 @@ class SynchronizedStreamManager:
         recording_dir: Path,
         all_camera_data: dict[CameraData],
         tracker: Tracker = None,
+        batch: bool = False,
+        sync_sample_count: int = None,
     ) -> None:
+        """
+        batch: process the streams as fast as possible without any fps throttling. Flow is
+        instead controlled by bounded queues between the streams, synchronizer and recorder
+        so that a slow consumer pauses the streams rather than building up a backlog.
+        Synchronization follows a plan computed up front from the recorded frame times.
+
+        sync_sample_count: only process this many sync indices, spread evenly across the recording.
+        Frames outside of them are never tracked (or where possible decoded). Sampling relies on the
+        plan, so this implies batch processing. None or 0 processes every frame.
+        """
         self.recording_dir = recording_dir
         self.all_camera_data = all_camera_data
         self.tracker = tracker
+        self.sync_sample_count = sync_sample_count
+        self.batch = batch or bool(sync_sample_count)
 
         self.subfolder_name = "processed" if tracker is None else self.tracker.name
         self.output_dir = Path(self.recording_dir, self.subfolder_name)
@@ -53,20 +75,54 @@ class SynchronizedStreamManager:
                 rotation_count=camera.rotation_count,
                 tracker=self.tracker,
                 break_on_last=True,
+                prefetch_depth=DEFAULT_PREFETCH_DEPTH,
+                frame_store_slots=BATCH_FRAME_STORE_SLOTS if self.batch else 0,
+                tracker_batch_size=BATCH_TRACKER_FRAMES if self.batch else 1,
+                cache_points=True,
             )
 
             self.streams[camera.port] = stream
 
         logger.info(f"Creating synchronizer based off of streams: {self.streams}")
-        self.synchronizer = Synchronizer(self.streams)
-        self.recorder = VideoRecorder(self.synchronizer, suffix=self.subfolder_name)
+        if self.batch:
+            plan = None
+            if self.sync_sample_count:
+                plan = plan_synchronization({port: stream.frame_times for port, stream in self.streams.items()})
+                plan = sample_plan(plan, self.sync_sample_count)
+                for port, stream in self.streams.items():
+                    stream.set_frame_sample(plan.loc[plan["port"] == port, "frame_index"])
+
+            self.synchronizer = PlannedSynchronizer(
+                self.streams, max_pending_frames=BATCH_MAX_PENDING_FRAMES, plan=plan
+            )
+            self.recorder = VideoRecorder(
+                self.synchronizer,
+                suffix=self.subfolder_name,
+                max_queue_size=BATCH_MAX_PENDING_FRAMES,
+            )
+        else:
+            self.synchronizer = Synchronizer(self.streams)
+            self.recorder = VideoRecorder(self.synchronizer, suffix=self.subfolder_name)
+
+    @property
+    def queue_metrics(self):
+        """
+        Occupancy and overflow counts of each queue between the streams and the saved output
+        """
+        metrics = dict(self.synchronizer.queue_metrics)
+        metrics[self.recorder.sync_packet_in_q.name] = self.recorder.sync_packet_in_q.metrics
+        return metrics
 
     def process_streams(self, fps_target=None, include_video=True):
         """
         Output file will be created in a subfolder named `tracker.name`
         This will include mp4 files with visualized landmarks as well as the file `xy.csv`
         Default behavior is to process streams at the mean frame rate they were recorded at.
-        But this can be overridden with a new fps_target
+        But this can be overridden with a new fps_target. In batch mode the fps_target is ignored
+        and the streams are not throttled at all.
+
+        Frames whose points are already in the tracker cache are not tracked again, and in batch
+        mode without video they are not decoded either.
         """
         logger.info(f"beginning to create recording for files saved to {self.output_dir}")
         self.recorder.start_recording(
@@ -82,7 +138,11 @@ class SynchronizedStreamManager:
         logger.info(f"About to start playing video streams to be processed. Streams: {self.streams}")
         for port, stream in self.streams.items():
 
-            if fps_target is not None:
+            if self.batch:
+                stream.set_fps_target(None)
+                # without video output, frames whose points are already cached never need decoding
+                stream.decode_cached_frames = include_video
+            elif fps_target is not None:
                 stream.set_fps_target(fps_target)
 
             stream.play_video()
@@ -34,6 +34,23 @@ class Tracker(ABC):
         """
         pass
 
+    def get_points_batch(
+        self, frames: list[np.ndarray], ports: list[int], rotation_counts: list[int]
+    ) -> list[PointPacket]:
+        """
+        OPTIONAL METHOD
+        Track many frames in one call, returning a PointPacket for each frame in the order given.
+        Frames of the same port are in playback order.
+
+        By default this simply calls get_points on one frame at a time. Trackers that can
+        pipeline work internally (e.g. keeping a model busy while the next frame is handed over,
+        or running ports in parallel) can override it.
+        """
+        return [
+            self.get_points(frame, port, rotation_count)
+            for frame, port, rotation_count in zip(frames, ports, rotation_counts)
+        ]
+
     @abstractmethod
     def get_point_name(self, point_id: int) -> str:
         """
@@ -64,6 +81,30 @@ class Tracker(ABC):
         """
         pass
 
+    @property
+    def cache_parameters(self) -> dict:
+        """
+        OPTIONAL PROPERTY
+
+        Settings that change the points returned (e.g. detection thresholds, model version or the
+        calibration board). Together with the name these identify the tracker's results in the
+        tracker cache, so any change here means frames are tracked again rather than read back.
+        Values only need to be JSON serializable (or have a stable str).
+        """
+        return {}
+
+    @property
+    def stateful(self) -> bool:
+        """
+        OPTIONAL PROPERTY
+
+        True when the points found in a frame depend on the frames tracked before it from the
+        same port (e.g. mediapipe tracking landmarks from the last frame rather than detecting
+        them afresh). Cached points of a stateful tracker are only reused when the same
+        sequence of frames is played again.
+        """
+        return False
+
     @property
     def metarig_mapped(self):
         """
@@ -12,8 +12,21 @@ from caliscope.tracker import Tracker
 
 logger = caliscope.logger.get(__name__)
 
+# detection region around the board's last known outline, expanded on each side by this fraction
+# of its extent to allow for movement between frames
+ROI_MARGIN = 0.25
+ROI_MIN_MARGIN = 32  # pixels
+# finding fewer than this fraction of the previous frame's corners within the region counts as losing the board
+ROI_MIN_CORNER_FRACTION = 0.5
+
+# pyramid detection: markers are found in a downscaled image such that they are still at least this many pixels across
+PYRAMID_MIN_MARKER_PIXELS = 32
+PYRAMID_MIN_SCALE = 0.25  # never downscale further than this
+PYRAMID_MAX_SCALE = 0.8  # above this there is too little to be gained, so detect at full resolution
+
+
 class CharucoTracker(Tracker):
-    def __init__(self, charuco):
+    def __init__(self, charuco, track_roi: bool = False, pyramid: bool = False):
 
         # need camera to know resolution and to assign calibration parameters
         # to camera
@@ -25,10 +38,38 @@ class CharucoTracker(Tracker):
         self.criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 30, 0.0001)
         self.conv_size = (11, 11)  # Don't make this too large.
 
+        # temporal tracking: detection is limited to the region around where the board was found
+        # in the previous frame from the same port. Full frame detection only happens on loss.
+        # Opt in: corners near the edge of the region can occasionally be missed
+        self.track_roi = track_roi
+        self.board_regions = {}  # port: (x_min, y_min, x_max, y_max) or None if board lost
+        self.last_corner_counts = {}  # port: number of corners found in the previous frame
+        self.last_mirrored = {}  # port: whether the board was last seen in the mirror image
+
+        # multi-scale detection: markers are found at a resolution chosen from how large they appeared
+        # in the previous frame from the same port; corners are always refined at full resolution.
+        # Opt in: a few corners found at full resolution can be missed when markers are small
+        self.pyramid = pyramid
+        self.marker_sizes = {}  # port: apparent marker side length in pixels, or None if board lost
+
     @property
     def name(self):
         return "CHARUCO"
 
+    @property
+    def cache_parameters(self) -> dict:
+        return {
+            "opencv": cv2.__version__,
+            "charuco": self.charuco.__dict__,
+            "track_roi": self.track_roi,
+            "pyramid": self.pyramid,
+        }
+
+    @property
+    def stateful(self) -> bool:
+        # both the search region and the detection scale come from the previous frame
+        return self.track_roi or self.pyramid
+
     def get_points(self, frame:np.ndarray, port:int, rotation_count:int)->PointPacket:
         """Will check for charuco corners in the frame, if it doesn't find any, 
         then it will look for corners in the mirror image of the frame"""
@@ -38,11 +79,15 @@ class CharucoTracker(Tracker):
         if self.charuco.inverted:
             gray = ~gray  # invert
 
-        ids, img_loc = self.find_corners_single_frame(gray, mirror=False)
+        scale = self.get_detection_scale(port)
+        ids, img_loc = self.find_corners(gray, port, scale)
 
-        if not ids.any():
-            gray = cv2.flip(gray, 1)
-            ids, img_loc = self.find_corners_single_frame(gray, mirror=True)
+        if len(ids) == 0 and scale < 1:
+            # the board may have moved away, so that its markers are now too small at that scale
+            ids, img_loc = self.find_corners(gray, port, 1)
+
+        if self.pyramid:
+            self.marker_sizes[port] = self.get_marker_size(ids, img_loc)
         
         obj_loc = self.get_obj_loc(ids) 
         point_packet = PointPacket(ids, img_loc, obj_loc)
@@ -58,15 +103,145 @@ class CharucoTracker(Tracker):
     def get_connected_points(self):
         return self.charuco.get_connected_points()
 
-    def find_corners_single_frame(self,gray_frame, mirror):
+    def find_corners(self, gray_frame, port, scale):
+        if self.track_roi:
+            return self.find_corners_tracked(gray_frame, port, scale)
+
+        ids, img_loc = self.find_corners_single_frame(gray_frame, mirror=False, scale=scale)
+
+        if not ids.any():
+            gray_frame = cv2.flip(gray_frame, 1)
+            ids, img_loc = self.find_corners_single_frame(gray_frame, mirror=True, scale=scale)
+
+        return ids, img_loc
+
+    def get_detection_scale(self, port) -> float:
+        """
+        Scale at which to look for markers, based on their size in the last frame. Without a previous
+        sighting of the board nothing can be assumed about its size, so the full resolution is used
+        """
+        marker_size = self.marker_sizes.get(port)
+        if not self.pyramid or marker_size is None:
+            return 1
+
+        scale = PYRAMID_MIN_MARKER_PIXELS / marker_size
+        if scale > PYRAMID_MAX_SCALE:
+            return 1
+        return max(scale, PYRAMID_MIN_SCALE)
+
+    def get_marker_size(self, ids, img_loc):
+        """
+        Apparent side length of the aruco markers in pixels. Taken from a low percentile of the
+        pixel/board distance ratios between corners so that markers foreshortened by the angle
+        of the board are not downscaled out of detection
+        """
+        if len(ids) < 2:
+            return None
+
+        obj_loc = self.board.getChessboardCorners()[ids, :2]
+        first, second = np.triu_indices(len(ids), 1)
+        pixel_distance = np.linalg.norm(img_loc[first] - img_loc[second], axis=1)
+        board_distance = np.linalg.norm(obj_loc[first] - obj_loc[second], axis=1)
+
+        pixels_per_unit = np.percentile(pixel_distance / board_distance, 10)
+        return pixels_per_unit * self.board.getMarkerLength()
+
+    def find_corners_tracked(self, gray_frame, port, scale=1):
+        """
+        Search the region where the board was last seen at this port, and in the orientation
+        (mirrored or not) it was last seen in. The full frame is only searched (and the other
+        orientation only tried) when the board is lost from that region
+        """
+        mirrored = self.last_mirrored.get(port, False)
+        region = self.board_regions.get(port)
+        ids, img_loc = np.array([]), np.array([])
+
+        if region is not None:
+            ids, img_loc = self.find_corners_in_region(gray_frame, region, mirrored, scale)
+
+            # the board has moved largely out of the region, so it is treated as lost
+            if len(ids) < self.last_corner_counts.get(port, 0) * ROI_MIN_CORNER_FRACTION:
+                ids, img_loc = np.array([]), np.array([])
+
+        if len(ids) == 0:
+            for mirror in (mirrored, not mirrored):
+                frame = cv2.flip(gray_frame, 1) if mirror else gray_frame
+                ids, img_loc = self.find_corners_single_frame(frame, mirror=mirror, scale=scale)
+                if len(ids) > 0:
+                    self.last_mirrored[port] = mirror
+                    break
+
+        if len(ids) > 0:
+            self.board_regions[port] = self.get_search_region(ids, img_loc, gray_frame.shape)
+        else:
+            self.board_regions[port] = None
+        self.last_corner_counts[port] = len(ids)
+
+        return ids, img_loc
+
+    def find_corners_in_region(self, gray_frame, region, mirror, scale=1):
+        x_min, y_min, x_max, y_max = region
+        crop = gray_frame[y_min:y_max, x_min:x_max]
+        if mirror:
+            crop = cv2.flip(crop, 1)
+
+        ids, img_loc = self.find_corners_single_frame(crop, mirror=mirror, scale=scale)
+
+        if len(ids) > 0:
+            # back to the coordinates of the full frame
+            img_loc = img_loc + np.array([x_min, y_min], dtype=img_loc.dtype)
+
+        return ids, img_loc
+
+    def get_search_region(self, ids, img_loc, frame_shape):
+        """
+        Bounding box of the whole board, not just the corners that were found. Otherwise a board that
+        was only partly found would only ever be searched for within that part
+        """
+        points = img_loc
+        if len(ids) >= 4:
+            # project the outline of the board through the homography of the corners that were found
+            homography, _ = cv2.findHomography(self.board.getChessboardCorners()[ids, :2], img_loc)
+            if homography is not None:
+                columns, rows = self.board.getChessboardSize()
+                width = columns * self.board.getSquareLength()
+                height = rows * self.board.getSquareLength()
+                outline = np.array([[0, 0], [width, 0], [width, height], [0, height]], dtype=np.float32)
+                projected = cv2.perspectiveTransform(outline.reshape(-1, 1, 2), homography)[:, 0]
+                if np.isfinite(projected).all():
+                    points = np.vstack([img_loc, projected])
+
+        frame_height, frame_width = frame_shape[:2]
+        x_min, y_min = points.min(axis=0)
+        x_max, y_max = points.max(axis=0)
+
+        margin = max(ROI_MARGIN * max(x_max - x_min, y_max - y_min), ROI_MIN_MARGIN)
+
+        return (
+            int(np.clip(x_min - margin, 0, frame_width)),
+            int(np.clip(y_min - margin, 0, frame_height)),
+            int(np.clip(x_max + margin + 1, 0, frame_width)),
+            int(np.clip(y_max + margin + 1, 0, frame_height)),
+        )
+
+    def find_corners_single_frame(self,gray_frame, mirror, scale=1):
 
         ids = np.array([])
         img_loc = np.array([])
 
         # detect if aruco markers are present
-        aruco_corners, aruco_ids, rejected = cv2.aruco.detectMarkers(
-            gray_frame, self.dictionary_object
-        )
+        if scale < 1:
+            # coarse marker corners from a downscaled image are mapped back to full resolution
+            # the charuco corners interpolated from them are then refined at full resolution below
+            small_frame = cv2.resize(gray_frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            aruco_corners, aruco_ids, rejected = cv2.aruco.detectMarkers(
+                small_frame, self.dictionary_object
+            )
+            aruco_corners = tuple(((corners + 0.5) / scale - 0.5).astype(np.float32) for corners in aruco_corners)
+        else:
+            aruco_corners, aruco_ids, rejected = cv2.aruco.detectMarkers(
+                gray_frame, self.dictionary_object
+            )
 
         # if so, then interpolate to the Charuco Corners and return what you found
         if len(aruco_corners) >3:
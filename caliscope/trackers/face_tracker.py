@@ -1,94 +1,45 @@
 import caliscope.logger
 
-from threading import Thread
-from queue import Queue
-
 import mediapipe as mp
-import numpy as np
-import cv2
 
-# cap = cv2.VideoCapture(0)
-from caliscope.packets import PointPacket
-from caliscope.tracker import Tracker
-from caliscope.trackers.helper import apply_rotation, unrotate_points
+from caliscope.trackers.helper import (
+    MediapipeTracker,
+    landmark_id_map,
+    extract_landmarks,
+)
 logger = caliscope.logger.get(__name__)
 
-class FaceTracker(Tracker):
-    # Initialize MediaPipe Facemeshes and Drawing utility
-    def __init__(self) -> None:
-        self.in_queue = Queue(-1)
-        self.out_queue = Queue(-1)
-
-        # each port gets its own mediapipe context manager
-        # use a dictionary of queues for passing 
-        self.in_queues = {}
-        self.out_queues = {}
-        self.threads = {}
+FACE_POINT_IDS = landmark_id_map(478)  # face mesh with refined eye and iris landmarks
 
+MEDIAPIPE_SETTINGS = {
+    "static_image_mode": False,
+    "max_num_faces": 1,
+    "refine_landmarks": True,
+    "min_detection_confidence": 0.5,
+}
 
+class FaceTracker(MediapipeTracker):
     @property
     def name(self):
         return "FACE"
 
-    def run_frame_processor(self, port: int, rotation_count: int):
-        # Create a MediaPipe FaceMesh instance
-        with mp.solutions.face_mesh.FaceMesh(
-            static_image_mode=False,
-            max_num_faces=1,
-            refine_landmarks=True,
-            min_detection_confidence=0.5
-        ) as facemeshes:
-            while True:
-                frame = self.in_queues[port].get()
-                # apply rotation as needed
-                frame = apply_rotation(frame, rotation_count)
-
-                height, width, color = frame.shape
-                # Convert the image to RGB format
-                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                results = facemeshes.process(frame)
-
-                # initialize variables so none will be created if no points detected
-                point_ids = []
-                landmark_xy = []
-
-                if results.multi_face_landmarks:
-                    for face_landmarks in results.multi_face_landmarks:
-                        for landmark_id, landmark in enumerate(face_landmarks.landmark):
-                            point_ids.append(landmark_id)
-
-                            # mediapipe expresses in terms of percent of frame, so must map to pixel position
-                            x, y = int(landmark.x * width), int(landmark.y * height)
-                            landmark_xy.append((x, y))
-
-                point_ids = np.array(point_ids)
-                landmark_xy = np.array(landmark_xy)
-                landmark_xy = unrotate_points(landmark_xy, rotation_count, width,height)
-
-                point_packet = PointPacket(point_ids, landmark_xy)
-
-                self.out_queues[port].put(point_packet)
-
-
-    def get_points(
-        self, frame: np.ndarray, port: int, rotation_count: int
-    ) -> PointPacket:
-        if port not in self.in_queues.keys():
-            self.in_queues[port] = Queue(1)
-            self.out_queues[port] = Queue(1)
-
-            self.threads[port] = Thread(
-                target=self.run_frame_processor,
-                args=(port, rotation_count),
-                daemon=True,
-            )
-            self.threads[port].start()
-
-
-        self.in_queues[port].put(frame)
-        point_packet = self.out_queues[port].get()
-
-        return point_packet
+    @property
+    def cache_parameters(self) -> dict:
+        return {"mediapipe": mp.__version__, **MEDIAPIPE_SETTINGS}
+
+    @property
+    def stateful(self) -> bool:
+        return not MEDIAPIPE_SETTINGS["static_image_mode"]
+
+    def create_model(self):
+        return mp.solutions.face_mesh.FaceMesh(**MEDIAPIPE_SETTINGS)
+
+    def landmarks_from_results(self, results, width: int, height: int) -> list[tuple]:
+        extracted = []
+        if results.multi_face_landmarks:
+            for face_landmarks in results.multi_face_landmarks:
+                extracted.append(extract_landmarks(face_landmarks, FACE_POINT_IDS, width, height))
+        return extracted
 
     def get_point_name(self, point_id: int) -> str:
         return str(point_id)
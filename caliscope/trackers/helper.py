@@ -1,6 +1,13 @@
+from abc import abstractmethod
+from threading import Thread
+from queue import Queue
+
 import cv2
 import numpy as np
 
+from caliscope.packets import PointPacket
+from caliscope.tracker import Tracker
+
 def apply_rotation(frame: np.ndarray, rotation_count: int) -> np.ndarray:
     if rotation_count == 0:
         pass
@@ -37,3 +44,143 @@ def unrotate_points(
         xy_unrotated[:, 0], xy_unrotated[:, 1] = frame_height - xy[:, 1], xy[:, 0]
 
     return xy_unrotated
+
+
+def landmark_id_map(landmark_count: int, offset: int = 0, point_names: dict = None) -> np.ndarray:
+    """
+    point id for each landmark index of a mediapipe result, computed once up front.
+    When point_names is given, landmarks without a name map to -1 and are dropped during extraction
+    """
+    point_ids = np.arange(landmark_count, dtype=np.int64) + offset
+    if point_names is not None:
+        point_ids[~np.isin(point_ids, list(point_names.keys()))] = -1
+    return point_ids
+
+
+def extract_landmarks(
+    landmarks, point_id_map: np.ndarray, width: int, height: int, in_frame_only: bool = False
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Convert a mediapipe NormalizedLandmarkList into point ids, pixel positions and confidence in one pass.
+
+    Confidence is the landmark visibility (or presence when that is all the model provides).
+    Models that report neither (e.g. hands and face mesh) give NaN, which downstream is taken as full weight.
+    in_frame_only drops landmarks that mediapipe has placed outside of the frame
+    """
+    landmark_list = landmarks.landmark
+    values = np.array([(lm.x, lm.y, lm.visibility, lm.presence) for lm in landmark_list], dtype=np.float64)
+    values = values.reshape(-1, 4)[: len(point_id_map)]
+    point_ids = point_id_map[: len(values)]
+
+    keep = point_ids >= 0
+    if in_frame_only:
+        x, y = values[:, 0], values[:, 1]
+        keep &= (x >= 0) & (x <= 1) & (y >= 0) & (y <= 1)
+
+    # mediapipe expresses in terms of percent of frame, so must map to pixel position
+    # (truncated toward zero as int() would)
+    xy = (values[keep, :2] * (width, height)).astype(np.int64)
+
+    if len(landmark_list) > 0 and landmark_list[0].HasField("visibility"):
+        confidence = values[keep, 2]
+    elif len(landmark_list) > 0 and landmark_list[0].HasField("presence"):
+        confidence = values[keep, 3]
+    else:
+        confidence = np.full(keep.sum(), np.nan)
+
+    return point_ids[keep], xy, confidence
+
+
+def combine_landmarks(extracted: list[tuple]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Stack the (point_ids, xy, confidence) of each landmark set found in a frame
+    """
+    if len(extracted) == 0:
+        return np.empty(0, dtype=np.int64), np.empty((0, 2), dtype=np.int64), np.empty(0)
+
+    point_ids, xy, confidence = zip(*extracted)
+    return np.concatenate(point_ids), np.concatenate(xy), np.concatenate(confidence)
+
+
+class MediapipeTracker(Tracker):
+    """
+    Each port gets its own mediapipe model running on a thread, with frames handed over and
+    points returned on a pair of queues. Subclasses provide the model and pull the landmarks
+    out of its results.
+    """
+
+    def __init__(self) -> None:
+        self.in_queues = {}
+        self.out_queues = {}
+        self.threads = {}
+
+    @abstractmethod
+    def create_model(self):
+        """
+        A mediapipe solution (e.g. mp.solutions.pose.Pose) used as a context manager to process the frames of one port
+        """
+        pass
+
+    @abstractmethod
+    def landmarks_from_results(self, results, width: int, height: int) -> list[tuple]:
+        """
+        The (point_ids, xy, confidence) of each set of landmarks in the results, typically from extract_landmarks
+        """
+        pass
+
+    def run_frame_processor(self, port: int, rotation_count: int):
+        with self.create_model() as model:
+            while True:
+                frame = self.in_queues[port].get()
+                # apply rotation as needed
+                frame = apply_rotation(frame, rotation_count)
+
+                height, width, color = frame.shape
+                # Convert the image to RGB format
+                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                results = model.process(frame)
+
+                extracted = self.landmarks_from_results(results, width, height)
+                point_ids, landmark_xy, confidence = combine_landmarks(extracted)
+
+                # adjust for previous shift due to camera rotation count
+                landmark_xy = unrotate_points(landmark_xy, rotation_count, width, height)
+                point_packet = PointPacket(point_ids, landmark_xy, confidence=confidence)
+
+                self.out_queues[port].put(point_packet)
+
+    def _start_frame_processor(self, port: int, rotation_count: int):
+        # queues are unbounded so that a whole batch of frames can be handed over before any result is collected
+        if port not in self.in_queues.keys():
+            self.in_queues[port] = Queue()
+            self.out_queues[port] = Queue()
+
+            self.threads[port] = Thread(
+                target=self.run_frame_processor,
+                args=(port, rotation_count),
+                daemon=True,
+            )
+            self.threads[port].start()
+
+    def get_points(self, frame: np.ndarray, port: int, rotation_count: int) -> PointPacket:
+        """
+        The frame is placed on the queue of the port's mediapipe thread and its points are waited on
+        """
+        self._start_frame_processor(port, rotation_count)
+        self.in_queues[port].put(frame)
+        point_packet = self.out_queues[port].get()
+
+        return point_packet
+
+    def get_points_batch(
+        self, frames: list[np.ndarray], ports: list[int], rotation_counts: list[int]
+    ) -> list[PointPacket]:
+        """
+        Every frame is queued before any result is collected, so the mediapipe thread of each
+        port moves straight from one frame to the next and ports are processed side by side
+        """
+        for frame, port, rotation_count in zip(frames, ports, rotation_counts):
+            self._start_frame_processor(port, rotation_count)
+            self.in_queues[port].put(frame)
+
+        return [self.out_queues[port].get() for port in ports]
@@ -1,16 +1,13 @@
-
-from threading import Thread
-from queue import Queue
 from pathlib import Path
 
 import mediapipe as mp
-import numpy as np
-import cv2
 
-# cap = cv2.VideoCapture(0)
-from caliscope.packets import PointPacket
-from caliscope.tracker import Tracker, WireFrameView, Segment
-from caliscope.trackers.helper import apply_rotation, unrotate_points
+from caliscope.tracker import WireFrameView, Segment
+from caliscope.trackers.helper import (
+    MediapipeTracker,
+    landmark_id_map,
+    extract_landmarks,
+)
 from caliscope.trackers.wireframe_builder import get_wireframe
 
 import caliscope.logger
@@ -123,15 +120,19 @@ RIGHT_HAND_OFFSET = 100
 LEFT_HAND_OFFSET = 200
 FACE_OFFSET = 500
 
+# point id of each landmark index in the holistic results
+POSE_POINT_IDS = landmark_id_map(33, POSE_OFFSET)
+RIGHT_HAND_POINT_IDS = landmark_id_map(21, RIGHT_HAND_OFFSET)
+LEFT_HAND_POINT_IDS = landmark_id_map(21, LEFT_HAND_OFFSET)
+FACE_POINT_IDS = landmark_id_map(478, FACE_OFFSET)
+
+MEDIAPIPE_SETTINGS = {"min_detection_confidence": 0.8, "min_tracking_confidence": 0.8}
+
 
 ###
-class HolisticTracker(Tracker):
+class HolisticTracker(MediapipeTracker):
     def __init__(self) -> None:
-        # each port gets its own mediapipe context manager
-        # use a dictionary of queues for passing
-        self.in_queues = {}
-        self.out_queues = {}
-        self.threads = {}
+        super().__init__()
         wireframe_spec_path = Path(Path(__file__).parent,"holistic_wireframe.toml")
         self.wireframe = get_wireframe(wireframe_spec_path, POINT_NAMES)
 
@@ -139,125 +140,28 @@ class HolisticTracker(Tracker):
     def name(self):
         return "HOLISTIC"
 
-    def run_frame_processor(self, port: int, rotation_count: int):
-        # Create a MediaPipe pose instance
-        with mp.solutions.holistic.Holistic(
-            min_detection_confidence=0.8, min_tracking_confidence=0.8
-        ) as holistic:
-            while True:
-                frame = self.in_queues[port].get()
-                # apply rotation as needed
-                frame = apply_rotation(frame, rotation_count)
-
-                height, width, color = frame.shape
-                # Convert the image to RGB format
-                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                results = holistic.process(frame)
-
-                # initialize variables so none will be created if no points detected
-                point_ids = []
-                landmark_xy = []
-
-                if results.pose_landmarks:
-                    for landmark_id, landmark in enumerate(
-                        results.pose_landmarks.landmark
-                    ):
-                        # mediapipe expresses in terms of percent of frame, so must map to pixel position
-                        x, y = int(landmark.x * width), int(landmark.y * height)
-                        if (
-                            landmark.x < 0
-                            or landmark.x > 1
-                            or landmark.y < 0
-                            or landmark.y > 1
-                        ):
-                            # ignore
-                            pass
-                        else:
-                            point_ids.append(landmark_id + POSE_OFFSET)
-                            landmark_xy.append((x, y))
-
-                if results.right_hand_landmarks:
-                    for landmark_id, landmark in enumerate(
-                        results.right_hand_landmarks.landmark
-                    ):
-                        # mediapipe expresses in terms of percent of frame, so must map to pixel position
-                        x, y = int(landmark.x * width), int(landmark.y * height)
-                        if (
-                            landmark.x < 0
-                            or landmark.x > 1
-                            or landmark.y < 0
-                            or landmark.y > 1
-                        ):
-                            # ignore
-                            pass
-                        else:
-                            point_ids.append(landmark_id + RIGHT_HAND_OFFSET)
-                            landmark_xy.append((x, y))
-
-                if results.left_hand_landmarks:
-                    for landmark_id, landmark in enumerate(
-                        results.left_hand_landmarks.landmark
-                    ):
-                        # mediapipe expresses in terms of percent of frame, so must map to pixel positionND_OFFSET
-                        x, y = int(landmark.x * width), int(landmark.y * height)
-                        if (
-                            landmark.x < 0
-                            or landmark.x > 1
-                            or landmark.y < 0
-                            or landmark.y > 1
-                        ):
-                            # ignore
-                            pass
-                        else:
-                            point_ids.append(landmark_id + LEFT_HAND_OFFSET)
-                            landmark_xy.append((x, y))
-
-                if results.face_landmarks:
-                    for landmark_id, landmark in enumerate(
-                        results.face_landmarks.landmark
-                    ):
-                        # mediapipe expresses in terms of percent of frame, so must map to pixel positionFSET
-                        x, y = int(landmark.x * width), int(landmark.y * height)
-                        if (
-                            landmark.x < 0
-                            or landmark.x > 1
-                            or landmark.y < 0
-                            or landmark.y > 1
-                        ):
-                            # ignore
-                            pass
-                        else:
-                            point_ids.append(landmark_id + FACE_OFFSET)
-                            landmark_xy.append((x, y))
-
-                point_ids = np.array(point_ids)
-                landmark_xy = np.array(landmark_xy)
-                landmark_xy = unrotate_points(
-                    landmark_xy, rotation_count, width, height
-                )
-                point_packet = PointPacket(point_ids, landmark_xy)
-
-                self.out_queues[port].put(point_packet)
-
-    def get_points(
-        self, frame: np.ndarray, port: int, rotation_count: int
-    ) -> PointPacket:
-        if port not in self.in_queues.keys():
-            self.in_queues[port] = Queue(1)
-            self.out_queues[port] = Queue(1)
-
-            self.threads[port] = Thread(
-                target=self.run_frame_processor,
-                args=(port, rotation_count),
-                daemon=True,
-            )
-
-            self.threads[port].start()
-
-        self.in_queues[port].put(frame)
-        point_packet = self.out_queues[port].get()
+    @property
+    def cache_parameters(self) -> dict:
+        return {"mediapipe": mp.__version__, **MEDIAPIPE_SETTINGS}
 
-        return point_packet
+    @property
+    def stateful(self) -> bool:
+        return True  # holistic tracks landmarks from one frame to the next by default
+
+    def create_model(self):
+        return mp.solutions.holistic.Holistic(**MEDIAPIPE_SETTINGS)
+
+    def landmarks_from_results(self, results, width: int, height: int) -> list[tuple]:
+        extracted = []
+        for landmarks, landmark_point_ids in [
+            (results.pose_landmarks, POSE_POINT_IDS),
+            (results.right_hand_landmarks, RIGHT_HAND_POINT_IDS),
+            (results.left_hand_landmarks, LEFT_HAND_POINT_IDS),
+            (results.face_landmarks, FACE_POINT_IDS),
+        ]:
+            if landmarks:
+                extracted.append(extract_landmarks(landmarks, landmark_point_ids, width, height, in_frame_only=True))
+        return extracted
 
     def get_point_name(self, point_id) -> str:
         if point_id < FACE_OFFSET:
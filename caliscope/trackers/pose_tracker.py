@@ -1,16 +1,12 @@
 import caliscope.logger
 
-from threading import Thread
-from queue import Queue
-
 import mediapipe as mp
-import numpy as np
-import cv2
 
-# cap = cv2.VideoCapture(0)
-from caliscope.packets import  PointPacket
-from caliscope.tracker import Tracker
-from caliscope.trackers.helper import apply_rotation, unrotate_points
+from caliscope.trackers.helper import (
+    MediapipeTracker,
+    landmark_id_map,
+    extract_landmarks,
+)
 logger = caliscope.logger.get(__name__)
 
 POINT_NAMES = {
@@ -49,78 +45,37 @@ POINT_NAMES = {
     32: "right_foot_index",
 }
 
+POSE_POINT_IDS = landmark_id_map(len(POINT_NAMES))
+
+MEDIAPIPE_SETTINGS = {
+    "static_image_mode": False,
+    "model_complexity": 1,
+    "min_detection_confidence": 0.8,
+    "min_tracking_confidence": 0.8,
+}
 
-class PoseTracker(Tracker):
-    def __init__(self) -> None:
-        # each port gets its own mediapipe context manager
-        # use a dictionary of queues for passing 
-        self.in_queues = {}
-        self.out_queues = {}
-        self.threads = {}
 
+class PoseTracker(MediapipeTracker):
     @property
     def name(self):
         return "POSE"
 
-    def run_frame_processor(self, port: int, rotation_count: int):
-        # Create a MediaPipe pose instance
-        with mp.solutions.pose.Pose(
-            static_image_mode=False,
-            model_complexity=1,
-            min_detection_confidence=0.8,
-            min_tracking_confidence=0.8,
-        ) as pose:
-            while True:
-                frame = self.in_queues[port].get()
-                # apply rotation as needed
-                frame = apply_rotation(frame, rotation_count)
-
-                height, width, color = frame.shape
-                # Convert the image to RGB format
-                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                results = pose.process(frame)
-
-                # initialize variables so none will be created if no points detected
-                point_ids = []
-                landmark_xy = []
-
-                if results.pose_landmarks:
-
-                    for landmark_id, landmark in enumerate(results.pose_landmarks.landmark):
-                        point_ids.append(landmark_id)
-
-                        # mediapipe expresses in terms of percent of frame, so must map to pixel position
-                        x, y = int(landmark.x * width), int(landmark.y * height)
-                        landmark_xy.append((x, y))
-
-
-                point_ids = np.array(point_ids)
-                landmark_xy = np.array(landmark_xy)
-                landmark_xy = unrotate_points(landmark_xy, rotation_count, width,height)
-                point_packet = PointPacket(point_ids, landmark_xy)
-
-                self.out_queues[port].put(point_packet)
-
-
-    def get_points(
-        self, frame: np.ndarray, port: int, rotation_count: int
-    ) -> PointPacket:
-        if port not in self.in_queues.keys():
-            self.in_queues[port] = Queue(1)
-            self.out_queues[port] = Queue(1)
-
-            self.threads[port] = Thread(
-                target=self.run_frame_processor,
-                args=(port, rotation_count),
-                daemon=True,
-            )
+    @property
+    def cache_parameters(self) -> dict:
+        return {"mediapipe": mp.__version__, **MEDIAPIPE_SETTINGS}
 
-            self.threads[port].start()
+    @property
+    def stateful(self) -> bool:
+        return not MEDIAPIPE_SETTINGS["static_image_mode"]
 
-        self.in_queues[port].put(frame)
-        point_packet = self.out_queues[port].get()
+    def create_model(self):
+        return mp.solutions.pose.Pose(**MEDIAPIPE_SETTINGS)
 
-        return point_packet
+    def landmarks_from_results(self, results, width: int, height: int) -> list[tuple]:
+        extracted = []
+        if results.pose_landmarks:
+            extracted.append(extract_landmarks(results.pose_landmarks, POSE_POINT_IDS, width, height))
+        return extracted
 
     def get_point_name(self, point_id) -> str:
         return POINT_NAMES[point_id]
@@ -0,0 +1,250 @@
+import caliscope.logger
+
+import os
+import json
+import shutil
+import struct
+import hashlib
+from pathlib import Path
+from threading import Lock
+
+import numpy as np
+
+from caliscope import __app_dir__
+from caliscope.packets import PointPacket
+from caliscope.tracker import Tracker
+from caliscope.recording.video_hash import hash_video
+
+logger = caliscope.logger.get(__name__)
+
+TRACKER_CACHE_DIR = Path(__app_dir__, "tracker_cache")
+CACHE_FORMAT_VERSION = 1  # bump whenever the record layout changes so old caches are simply not found
+TRACKER_CACHE_MAX_BYTES = 4 << 30  # least recently used files are removed once the cache grows beyond this
+
+# each record: frame index, point count and flags, followed by int32 point ids, float32 img_loc (x, y),
+# and (as the flags indicate) float32 obj_loc (x, y, z) and confidence
+RECORD_HEADER = struct.Struct("<qIB")
+HAS_OBJ_LOC = 1
+HAS_CONFIDENCE = 2
+
+
+def hash_playback(frame_indices) -> str:
+    """
+    Identifies the sequence of frames a stateful tracker was given, as its points depend on it
+    """
+    frame_indices = np.ascontiguousarray(frame_indices, dtype="<i8")
+    return hashlib.blake2b(frame_indices.tobytes(), digest_size=16).hexdigest()
+
+
+def hash_tracker_parameters(tracker: Tracker, rotation_count: int = 0, playback: str = None) -> str:
+    """
+    Identifies the tracker and every setting that would change the points it returns. The rotation
+    count is included as trackers expecting upright images find different points at each orientation,
+    and the playback hash (see hash_playback) as stateful trackers find different points in different sequences
+    """
+    description = {
+        "name": tracker.name,
+        "parameters": tracker.cache_parameters,
+        "rotation_count": rotation_count % 4,
+        "playback": playback,
+        "version": CACHE_FORMAT_VERSION,
+    }
+    encoded = json.dumps(description, sort_keys=True, default=str).encode()
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+
+def prune_tracker_cache(cache_dir: Path = None, max_bytes: int = None, keep: tuple[Path] = ()):
+    """
+    Remove the least recently used point files until the cache is within max_bytes.
+    Files in keep (those about to be used) are never removed
+    """
+    cache_dir = Path(TRACKER_CACHE_DIR if cache_dir is None else cache_dir)
+    max_bytes = TRACKER_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    if not cache_dir.exists():
+        return
+
+    keep = {Path(path).resolve() for path in keep}
+    point_files = []
+    for path in cache_dir.glob("*/*.bin"):
+        try:
+            point_files.append((path.stat(), path))
+        except OSError:
+            pass  # removed by another process in the meantime
+
+    total_bytes = sum(stat.st_size for stat, _ in point_files)
+    for stat, path in sorted(point_files, key=lambda stat_path: stat_path[0].st_mtime_ns):
+        if total_bytes <= max_bytes:
+            break
+        if path.resolve() in keep:
+            continue
+        try:
+            path.unlink()
+            total_bytes -= stat.st_size
+            logger.info(f"Removed least recently used tracker cache file {path}")
+        except OSError as e:
+            # e.g. still open in another stream on Windows
+            logger.warning(f"Unable to remove tracker cache file {path}: {e}")
+
+
+def clear_tracker_cache(cache_dir: Path = None):
+    """
+    Remove all cached points
+    """
+    cache_dir = Path(TRACKER_CACHE_DIR if cache_dir is None else cache_dir)
+    logger.info(f"Clearing tracker cache at {cache_dir}")
+    shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+def encode_points(frame_index: int, point_packet: PointPacket) -> bytes:
+    point_ids = np.asarray(point_packet.point_id, dtype="<i4").reshape(-1)
+    point_count = len(point_ids)
+
+    flags = 0
+    arrays = [point_ids, np.asarray(point_packet.img_loc, dtype="<f4").reshape(point_count, 2)]
+    if point_packet.obj_loc is not None:
+        flags |= HAS_OBJ_LOC
+        obj_loc = np.zeros((point_count, 3), dtype="<f4")
+        if point_count > 0:
+            given_obj_loc = np.asarray(point_packet.obj_loc).reshape(point_count, -1)
+            obj_loc[:, : given_obj_loc.shape[1]] = given_obj_loc
+        arrays.append(obj_loc)
+    if point_packet.confidence is not None:
+        flags |= HAS_CONFIDENCE
+        arrays.append(np.asarray(point_packet.confidence, dtype="<f4").reshape(point_count))
+
+    header = RECORD_HEADER.pack(frame_index, point_count, flags)
+    return header + b"".join(np.ascontiguousarray(array).tobytes() for array in arrays)
+
+
+def decode_records(buffer: bytes) -> tuple[dict, int]:
+    """
+    returns:
+        frame_index: PointPacket for every complete record in the buffer (later records win)
+        the length of the buffer made up of complete records. Anything beyond it was cut short
+    """
+    point_packets = {}
+    position = 0
+    while position + RECORD_HEADER.size <= len(buffer):
+        frame_index, point_count, flags = RECORD_HEADER.unpack_from(buffer, position)
+
+        floats_per_point = 2 + (3 if flags & HAS_OBJ_LOC else 0) + (1 if flags & HAS_CONFIDENCE else 0)
+        record_end = position + RECORD_HEADER.size + 4 * point_count * (1 + floats_per_point)
+        if record_end > len(buffer):
+            break
+
+        offset = position + RECORD_HEADER.size
+        point_ids = np.frombuffer(buffer, dtype="<i4", count=point_count, offset=offset).astype(np.int64)
+        offset += 4 * point_count
+        img_loc = np.frombuffer(buffer, dtype="<f4", count=2 * point_count, offset=offset).reshape(-1, 2)
+        offset += 8 * point_count
+
+        obj_loc = None
+        if flags & HAS_OBJ_LOC:
+            obj_loc = np.frombuffer(buffer, dtype="<f4", count=3 * point_count, offset=offset).reshape(-1, 3)
+            offset += 12 * point_count
+
+        confidence = None
+        if flags & HAS_CONFIDENCE:
+            confidence = np.frombuffer(buffer, dtype="<f4", count=point_count, offset=offset)
+
+        point_packets[frame_index] = PointPacket(point_ids, img_loc, obj_loc, confidence)
+        position = record_end
+
+    return point_packets, position
+
+
+class TrackerCache:
+    """
+    Points tracked in each frame of a video, kept on disk so that the same video is never tracked twice
+    with the same tracker and settings. Any stage that needs 2D points (intrinsic, extrinsic and post
+    processing) can read them back without running the tracker, and often without decoding the frame.
+
+    Points are content addressed: one file per (video content hash, tracker parameter hash) in a
+    subfolder of the cache directory named for the tracker. Within it, each frame is an append-only binary
+    record keyed by frame index. A record cut short (e.g. by a crash) is dropped when the file is next read.
+
+    The video is only hashed on first use so creating a cache is cheap. Loading a file marks it as
+    recently used, and the least recently used files are removed once the cache exceeds TRACKER_CACHE_MAX_BYTES.
+
+    playback: for stateful trackers, the hash_playback of the frames played, so that points are only
+              shared between identical sequences
+    cache_dir: defaults to TRACKER_CACHE_DIR within the application data directory
+    """
+
+    def __init__(
+        self,
+        video_path: Path,
+        tracker: Tracker,
+        rotation_count: int = 0,
+        playback: str = None,
+        cache_dir: Path = None,
+    ):
+        self.video_path = Path(video_path)
+        self.tracker = tracker
+        self.rotation_count = rotation_count
+        self.playback = playback
+        self.cache_dir = Path(TRACKER_CACHE_DIR if cache_dir is None else cache_dir)
+
+        self.path = None
+        self.point_packets = None  # frame_index: PointPacket, loaded on first use
+        self._file = None
+        self._lock = Lock()
+
+    def _load(self):
+        if self.point_packets is not None:
+            return
+
+        video_hash = hash_video(self.video_path)
+        parameter_hash = hash_tracker_parameters(self.tracker, self.rotation_count, self.playback)
+        self.path = Path(self.cache_dir, self.tracker.name, f"{video_hash}_{parameter_hash}.bin")
+        prune_tracker_cache(self.cache_dir, keep=[self.path])
+
+        self.point_packets = {}
+        if self.path.exists():
+            os.utime(self.path)  # mark as recently used
+            buffer = self.path.read_bytes()
+            self.point_packets, valid_length = decode_records(buffer)
+            if valid_length < len(buffer):
+                logger.warning(f"Dropping incomplete record at the end of {self.path}")
+                with open(self.path, "r+b") as f:
+                    f.truncate(valid_length)
+            logger.info(f"Loaded {len(self.point_packets)} cached frames of {self.video_path} from {self.path}")
+
+    def get(self, frame_index: int) -> PointPacket:
+        """
+        The cached points of the frame, or None if it has not been tracked
+        """
+        with self._lock:
+            self._load()
+            return self.point_packets.get(int(frame_index))
+
+    def __len__(self):
+        with self._lock:
+            self._load()
+            return len(self.point_packets)
+
+    def covers(self, frame_indices) -> bool:
+        with self._lock:
+            self._load()
+            return all(int(frame_index) in self.point_packets for frame_index in frame_indices)
+
+    def put(self, frame_index: int, point_packet: PointPacket):
+        with self._lock:
+            self._load()
+            frame_index = int(frame_index)
+            if frame_index in self.point_packets:
+                return
+
+            if self._file is None:
+                self.path.parent.mkdir(exist_ok=True, parents=True)
+                self._file = open(self.path, "ab")
+
+            self._file.write(encode_points(frame_index, point_packet))
+            self._file.flush()
+            self.point_packets[frame_index] = point_packet
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
@@ -0,0 +1,292 @@
+import caliscope.logger
+
+import os
+import weakref
+import multiprocessing
+from multiprocessing import shared_memory
+from threading import Lock
+from typing import Callable
+
+import numpy as np
+
+from caliscope.packets import PointPacket
+from caliscope.tracker import Tracker
+from caliscope.recording.frame_store import locate_frame
+
+logger = caliscope.logger.get(__name__)
+
+
+def default_worker_count(port_count: int) -> int:
+    """
+    One tracker process per port, while leaving a core free for decoding, synchronization and
+    recording. Returns 0 (track within the stream threads) when there are too few cores to benefit
+    """
+    cpu_count = os.cpu_count() or 1
+    if cpu_count < 3:
+        return 0
+    return min(port_count, cpu_count - 1)
+
+
+def _tracker_worker(tracker_factory: Callable[[], Tracker], connection):
+    """
+    Runs in a separate process. Frames are read directly out of shared memory and only
+    the resulting PointPacket is sent back over the connection.
+    """
+    tracker = tracker_factory()
+    attached = {}  # shared memory name: SharedMemory
+
+    while True:
+        request = connection.recv()
+        if request is None:
+            break
+
+        # a list of frames is tracked as a batch and answered with a list of PointPackets
+        batch = isinstance(request, list)
+        frame_requests = request if batch else [request]
+
+        frames, ports, rotation_counts = [], [], []
+        for shared_memory_name, offset, shape, dtype, port, rotation_count in frame_requests:
+            if shared_memory_name not in attached:
+                attached[shared_memory_name] = shared_memory.SharedMemory(name=shared_memory_name)
+
+            frames.append(np.ndarray(shape, dtype=dtype, buffer=attached[shared_memory_name].buf, offset=offset))
+            ports.append(port)
+            rotation_counts.append(rotation_count)
+
+        try:
+            if batch:
+                point_packet = tracker.get_points_batch(frames, ports, rotation_counts)
+            else:
+                point_packet = tracker.get_points(frames[0], ports[0], rotation_counts[0])
+        except Exception as e:
+            point_packet = e
+
+        connection.send(point_packet)
+
+    for shm in attached.values():
+        try:
+            shm.close()
+        except BufferError:
+            pass  # tracker is still holding on to a frame; released at exit
+
+
+def _release(workers: list, frame_slots: dict):
+    """
+    Stop the worker processes and free the shared memory. Used on close and at garbage collection
+    """
+    for process, connection, lock in workers:
+        with lock:
+            try:
+                connection.send(None)
+            except (OSError, ValueError):
+                pass  # worker already gone
+        process.join(timeout=5)
+        if process.is_alive():
+            process.terminate()
+    workers.clear()
+
+    for shm in frame_slots.values():
+        shm.close()
+        shm.unlink()
+    frame_slots.clear()
+
+
+class TrackerPool(Tracker):
+    """
+    Runs a tracker in separate processes so that tracking of multiple ports is not limited by the GIL.
+
+    Behaves as the Tracker it wraps and can be passed anywhere a Tracker is used. Frames that were decoded
+    into a FrameStore are read by the worker in place. Others are copied into a block of shared memory
+    for each port. Frames are never pickled, and only the PointPacket returns.
+
+    tracker_factory: picklable callable that creates the tracker, e.g. `TrackerEnum.HOLISTIC.value`
+    or `functools.partial(CharucoTracker, charuco)`. It is called once in each worker and once here
+    for everything other than get_points (names, draw instructions, etc.)
+    worker_count: None gives each port its own worker process. Otherwise ports are assigned across
+    this many workers. A port always goes to the same worker so that trackers which carry state
+    from one frame to the next (e.g. mediapipe) see a consistent sequence.
+    """
+
+    def __init__(self, tracker_factory: Callable[[], Tracker], worker_count: int = None):
+        self.tracker_factory = tracker_factory
+        self.tracker = tracker_factory()
+        self.worker_count = worker_count
+
+        # spawned rather than forked as the parent is running stream threads
+        self.context = multiprocessing.get_context("spawn")
+
+        self.workers = []  # (process, connection, lock)
+        self.port_workers = {}  # port: index into self.workers
+        self.frame_slots = {}  # port: SharedMemory
+        self._assignment_lock = Lock()
+
+        self._finalizer = weakref.finalize(self, _release, self.workers, self.frame_slots)
+
+    @property
+    def name(self):
+        return self.tracker.name
+
+    def _start_worker(self):
+        parent_connection, child_connection = self.context.Pipe()
+        process = self.context.Process(
+            target=_tracker_worker,
+            args=(self.tracker_factory, child_connection),
+            daemon=True,
+        )
+        process.start()
+        child_connection.close()
+        logger.info(f"Started {self.name} tracker worker process {process.pid}")
+        self.workers.append((process, parent_connection, Lock()))
+
+    def _get_worker(self, port: int):
+        with self._assignment_lock:
+            if port not in self.port_workers:
+                if self.worker_count is None or len(self.workers) < self.worker_count:
+                    self._start_worker()
+                    self.port_workers[port] = len(self.workers) - 1
+                else:
+                    self.port_workers[port] = len(self.port_workers) % self.worker_count
+                logger.info(f"Tracking port {port} on worker {self.port_workers[port]}")
+
+        return self.workers[self.port_workers[port]]
+
+    def _get_frame_slot(self, port: int, nbytes: int) -> shared_memory.SharedMemory:
+        # each port has at most one frame (or one batch of frames) in flight, so a single slot per port is enough
+        slot = self.frame_slots.get(port)
+        if slot is None or slot.size < nbytes:
+            if slot is not None:
+                slot.close()
+                slot.unlink()
+            slot = shared_memory.SharedMemory(create=True, size=nbytes)
+            self.frame_slots[port] = slot
+        return slot
+
+    def get_points(self, frame: np.ndarray, port: int, rotation_count: int) -> PointPacket:
+        process, connection, lock = self._get_worker(port)
+
+        with lock:
+            location = locate_frame(frame)
+            if location is None:
+                slot = self._get_frame_slot(port, frame.nbytes)
+                np.ndarray(frame.shape, dtype=frame.dtype, buffer=slot.buf)[:] = frame
+                location = (slot.name, 0)
+
+            shared_memory_name, offset = location
+            connection.send(
+                (shared_memory_name, offset, frame.shape, frame.dtype.str, port, rotation_count)
+            )
+            point_packet = connection.recv()
+
+        if isinstance(point_packet, Exception):
+            raise point_packet
+
+        return point_packet
+
+    def get_points_batch(
+        self, frames: list[np.ndarray], ports: list[int], rotation_counts: list[int]
+    ) -> list[PointPacket]:
+        """
+        The frames of each worker are sent as a single request, and all requests are sent
+        before any results are collected so the workers track their share of the batch side by side
+        """
+        worker_frames = {}  # worker index: list of positions in the batch
+        for position, port in enumerate(ports):
+            self._get_worker(port)
+            worker_frames.setdefault(self.port_workers[port], []).append(position)
+
+        # locks are always taken in the same order so that concurrent batches cannot deadlock
+        worker_indices = sorted(worker_frames)
+        locks = [self.workers[worker_index][2] for worker_index in worker_indices]
+        for lock in locks:
+            lock.acquire()
+
+        try:
+            # frames outside of a FrameStore are copied back to back into the slot of their port
+            slot_sizes = {}
+            for frame, port in zip(frames, ports):
+                if locate_frame(frame) is None:
+                    slot_sizes[port] = slot_sizes.get(port, 0) + frame.nbytes
+            slots = {port: self._get_frame_slot(port, nbytes) for port, nbytes in slot_sizes.items()}
+            slot_offsets = dict.fromkeys(slots, 0)
+
+            for worker_index in worker_indices:
+                requests = []
+                for position in worker_frames[worker_index]:
+                    frame, port = frames[position], ports[position]
+                    location = locate_frame(frame)
+                    if location is None:
+                        offset = slot_offsets[port]
+                        np.ndarray(frame.shape, dtype=frame.dtype, buffer=slots[port].buf, offset=offset)[:] = frame
+                        slot_offsets[port] += frame.nbytes
+                        location = (slots[port].name, offset)
+
+                    shared_memory_name, offset = location
+                    requests.append(
+                        (shared_memory_name, offset, frame.shape, frame.dtype.str, port, rotation_counts[position])
+                    )
+                self.workers[worker_index][1].send(requests)
+
+            point_packets = [None] * len(frames)
+            errors = []
+            for worker_index in worker_indices:
+                worker_packets = self.workers[worker_index][1].recv()
+                if isinstance(worker_packets, Exception):
+                    errors.append(worker_packets)
+                    continue
+                for position, point_packet in zip(worker_frames[worker_index], worker_packets):
+                    point_packets[position] = point_packet
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+        if errors:
+            raise errors[0]
+
+        return point_packets
+
+    def close(self):
+        """
+        Stop all worker processes and release the shared memory
+        """
+        logger.info(f"Closing {self.name} tracker pool")
+        _release(self.workers, self.frame_slots)
+        # workers will be started again if more frames arrive
+        self.port_workers.clear()
+
+    def get_point_name(self, point_id: int) -> str:
+        return self.tracker.get_point_name(point_id)
+
+    def get_point_id(self, point_name: str) -> int:
+        return self.tracker.get_point_id(point_name)
+
+    def scatter_draw_instructions(self, point_id: int) -> dict:
+        return self.tracker.scatter_draw_instructions(point_id)
+
+    def get_connected_points(self):
+        return self.tracker.get_connected_points()
+
+    @property
+    def cache_parameters(self) -> dict:
+        return self.tracker.cache_parameters
+
+    @property
+    def stateful(self) -> bool:
+        return self.tracker.stateful
+
+    @property
+    def metarig_mapped(self):
+        return self.tracker.metarig_mapped
+
+    @property
+    def metarig_symmetrical_measures(self):
+        return self.tracker.metarig_symmetrical_measures
+
+    @property
+    def metarig_bilateral_measures(self):
+        return self.tracker.metarig_bilateral_measures
+
+    def __getattr__(self, attribute):
+        # anything else specific to the wrapped tracker (e.g. wireframe, charuco)
+        if attribute == "tracker":
+            raise AttributeError(attribute)
+        return getattr(self.tracker, attribute)
@@ -6,7 +6,7 @@ from pathlib import Path
 from itertools import combinations
 
 from caliscope.triangulate.stereo_points_builder import StereoPointsBuilder, StereoPointsPacket, SynchedStereoPointsPacket
-from caliscope.triangulate.triangulation import undistort
+from caliscope.triangulate.undistorter import Undistorter
 from caliscope.cameras.camera_array import CameraData, CameraArray
 logger = caliscope.logger.get(__name__)
 
@@ -20,6 +20,8 @@ class ArrayStereoTriangulator:
         self.ports = list(camera_array.port_index.keys())
         self.pairs = [(i,j) for i,j in combinations(self.ports,2) if i<j]
 
+        # a single undistorter is shared by all of the pairwise triangulators
+        self.undistorter = Undistorter(camera_array)
 
         # create the triangulators for each pair of cameras
         self.triangulators = {}
@@ -30,7 +32,7 @@ class ArrayStereoTriangulator:
             camera_A:CameraData = self.camera_array.cameras[port_A]
             camera_B:CameraData = self.camera_array.cameras[port_B]
 
-            self.triangulators[pair] = StereoPairTriangulator(camera_A, camera_B)
+            self.triangulators[pair] = StereoPairTriangulator(camera_A, camera_B, self.undistorter)
             
     def triangulate_synched_points(self, synced_paired_points:SynchedStereoPointsPacket):
         for pair,paired_point_packet  in synced_paired_points.stereo_points_packets.items():
@@ -40,10 +42,11 @@ class ArrayStereoTriangulator:
 
 
 class StereoPairTriangulator:
-    def __init__(self, camera_A: CameraData, camera_B: CameraData):
+    def __init__(self, camera_A: CameraData, camera_B: CameraData, undistorter: Undistorter):
 
         self.camera_A = camera_A
         self.camera_B = camera_B
+        self.undistorter = undistorter
         self.portA = camera_A.port
         self.portB = camera_B.port
         self.pair = (self.portA, self.portB)
@@ -68,23 +71,30 @@ class StereoPairTriangulator:
             xy_B = paired_points.img_loc_B
          
         if xy_A.shape[0] > 0:
-
-            points_A_undistorted = undistort(xy_A,self.camera_A)
-            points_B_undistorted = undistort(xy_B,self.camera_B)
-
-            # triangulate points outputs data in 4D homogenous coordinate system
-            # note that these are in a world frame of reference
-            xyzw_h = cv2.triangulatePoints(
-                self.proj_A, self.proj_B, points_A_undistorted, points_B_undistorted
-            )
-
-            xyz_h = xyzw_h.T[:, :3]
-            w = xyzw_h[3, :]
-            xyz = np.divide(xyz_h.T, w).T  # convert to euclidean coordinates
+            xyz = self.triangulate(xy_A, xy_B)
         else:
             xyz = np.array([])
 
         # update the paired point packet with the 3d positions
         paired_points.xyz = xyz
-        
-        
\ No newline at end of file
+
+    def triangulate(self, xy_A: np.ndarray, xy_B: np.ndarray) -> np.ndarray:
+        """
+        xy_A, xy_B: (n,2) matched image points as viewed by camera A and B
+        returns: (n,3) points in the world frame of reference
+        """
+        # cv2.triangulatePoints expects (2,n) arrays
+        points_A_undistorted = self.undistorter.undistort_points(xy_A, np.full(len(xy_A), self.portA)).T
+        points_B_undistorted = self.undistorter.undistort_points(xy_B, np.full(len(xy_B), self.portB)).T
+
+        # triangulate points outputs data in 4D homogenous coordinate system
+        # note that these are in a world frame of reference
+        xyzw_h = cv2.triangulatePoints(
+            self.proj_A, self.proj_B, points_A_undistorted, points_B_undistorted
+        )
+
+        xyz_h = xyzw_h.T[:, :3]
+        w = xyzw_h[3, :]
+        xyz = np.divide(xyz_h.T, w).T  # convert to euclidean coordinates
+
+        return xyz
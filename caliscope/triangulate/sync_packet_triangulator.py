@@ -6,12 +6,16 @@ from queue import Queue
 from threading import Thread, Event
 from pathlib import Path
 from caliscope.packets import XYZPacket
+from caliscope.bounded_queue import BoundedQueue, OverflowPolicy
 
 from caliscope.triangulate.triangulation import triangulate_sync_index
+from caliscope.triangulate.undistorter import Undistorter
 import caliscope.logger
 
 logger = caliscope.logger.get(__name__)
 
+TRIANGULATOR_QUEUE_SIZE = 8  # sync packets with frames awaiting triangulation
+
 class SyncPacketTriangulator:
     """
     Will place 3d packets on subscribed queues and save consolidated data in csv
@@ -24,7 +28,13 @@ class SyncPacketTriangulator:
         synchronizer: Synchronizer,
         recording_directory: Path = None,
         tracker_name:str = None,  # used only for getting the point names and tracker name
+        max_queue_size: int = TRIANGULATOR_QUEUE_SIZE,
+        overflow_policy: OverflowPolicy = OverflowPolicy.DROP_FRAMES,
     ):
+        """
+        Only the points of each sync packet are triangulated, so by default a backlog beyond max_queue_size
+        has its frames stripped rather than holding full-resolution images in memory
+        """
         self.camera_array = camera_array
         self.synchronizer = synchronizer
         self.recording_directory = recording_directory
@@ -42,10 +52,11 @@ class SyncPacketTriangulator:
             "z_coord": [],
         }
 
-        self.sync_packet_in_q = Queue(-1)
+        self.sync_packet_in_q = BoundedQueue(max_queue_size, overflow_policy, name="sync_packet_triangulator")
         self.synchronizer.subscribe_to_sync_packets(self.sync_packet_in_q)
 
         self.projection_matrices = self.camera_array.projection_matrices
+        self.undistorter = Undistorter(self.camera_array)
         
         self.subscribers = []
         self.running = True
@@ -85,6 +96,11 @@ class SyncPacketTriangulator:
                     point_ids = np.array(point_ids)
                     imgs_xy = np.array(imgs_xy)
 
+                    # points from cameras without an intrinsic calibration cannot be undistorted
+                    calibrated = self.undistorter.covers(cameras)
+                    cameras, point_ids, imgs_xy = cameras[calibrated], point_ids[calibrated], imgs_xy[calibrated]
+                    imgs_xy = self.undistorter.undistort_points(imgs_xy, cameras)
+
                     logger.debug(f"Cameras are {cameras} and point_ids are {point_ids}")
                     if len(np.unique(cameras)) >= 2:
                         logger.debug(f"Points observed on cameras {np.unique(cameras)}")
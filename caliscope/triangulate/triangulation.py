@@ -3,12 +3,17 @@
 import caliscope.logger
 import pandas as pd
 from time import time
-from numba import jit
+from numba import jit, prange
 from numba.typed import Dict, List
-from caliscope.cameras.camera_array import CameraArray, CameraData
+from caliscope.cameras.camera_array import CameraArray
+from caliscope.triangulate.undistorter import Undistorter
 import numpy as np
 logger = caliscope.logger.get(__name__)
 
+# views that reproject further than this (in pixels) from the consensus estimate are rejected
+# when triangulating in robust mode
+ROBUST_REPROJECTION_THRESHOLD = 15.0
+
 # helper function to avoid use of np.unique(return_counts=True) which doesn't work with jit
 @jit(nopython=True, cache=True)
 def unique_with_counts(arr):
@@ -89,117 +94,290 @@ def triangulate_sync_index(
             obj_xyz.append(point_xyz)
 
     return point_indices_xyz, obj_xyz
+
+
+@jit(nopython=True, parallel=True, cache=True)
+def triangulate_segments(
+    projection_stack: np.ndarray,
+    camera_slots: np.ndarray,
+    img_xy: np.ndarray,
+    segment_starts: np.ndarray,
+    segment_ends: np.ndarray,
+) -> np.ndarray:
+    """
+    Batched variant of the DLT above. Observations must already be sorted so that
+    each (sync_index, point_id) occupies the contiguous rows segment_starts[i]:segment_ends[i]
+
+    projection_stack: (n_cameras, 3, 4) projection matrices
+    camera_slots: index into projection_stack for each observation
+    img_xy: (n, 2) undistorted image points
+
+    returns: (n_segments, 3) array of triangulated points
+    """
+    segment_count = len(segment_starts)
+    xyz = np.empty((segment_count, 3))
+
+    for segment in prange(segment_count):
+        start = segment_starts[segment]
+        num_cams = segment_ends[segment] - start
+        A = np.zeros((num_cams * 2, 4))
+        for i in range(num_cams):
+            x = img_xy[start + i, 0]
+            y = img_xy[start + i, 1]
+            P = projection_stack[camera_slots[start + i]]
+            A[i * 2] = x * P[2] - P[0]
+            A[i * 2 + 1] = y * P[2] - P[1]
+        u, s, vh = np.linalg.svd(A, full_matrices=True)
+        point_xyzw = vh[-1]
+        xyz[segment] = point_xyzw[:3] / point_xyzw[3]
+
+    return xyz
+
+
+@jit(nopython=True, cache=True)
+def weighted_dlt(
+    projection_stack: np.ndarray,
+    camera_slots: np.ndarray,
+    img_xy: np.ndarray,
+    weights: np.ndarray,
+    rows: np.ndarray,
+) -> np.ndarray:
+    """
+    DLT as above, restricted to the observations at `rows`, with each pair of
+    equations scaled by the weight of the observation
+    """
+    A = np.zeros((len(rows) * 2, 4))
+    for i in range(len(rows)):
+        row = rows[i]
+        x = img_xy[row, 0]
+        y = img_xy[row, 1]
+        P = projection_stack[camera_slots[row]]
+        A[i * 2] = weights[row] * (x * P[2] - P[0])
+        A[i * 2 + 1] = weights[row] * (y * P[2] - P[1])
+    u, s, vh = np.linalg.svd(A, full_matrices=True)
+    point_xyzw = vh[-1]
+    return point_xyzw[:3] / point_xyzw[3]
 # End of adapted code
 ##################################################################################
 
 
-def triangulate_xy(xy: pd.DataFrame, camera_array:CameraArray) -> pd.DataFrame:
+@jit(nopython=True, cache=True)
+def reprojection_errors(
+    projection_stack: np.ndarray,
+    camera_slots: np.ndarray,
+    img_xy: np.ndarray,
+    rows: np.ndarray,
+    xyz: np.ndarray,
+) -> np.ndarray:
+    """
+    pixel distance between each observation at `rows` and the projection of xyz
+    into the corresponding camera. Points landing behind a camera get an infinite error
+    """
+    errors = np.empty(len(rows))
+    for i in range(len(rows)):
+        row = rows[i]
+        P = projection_stack[camera_slots[row]]
+        u = P[0, 0] * xyz[0] + P[0, 1] * xyz[1] + P[0, 2] * xyz[2] + P[0, 3]
+        v = P[1, 0] * xyz[0] + P[1, 1] * xyz[1] + P[1, 2] * xyz[2] + P[1, 3]
+        w = P[2, 0] * xyz[0] + P[2, 1] * xyz[1] + P[2, 2] * xyz[2] + P[2, 3]
+        if w <= 0:
+            errors[i] = np.inf
+        else:
+            errors[i] = np.sqrt((u / w - img_xy[row, 0]) ** 2 + (v / w - img_xy[row, 1]) ** 2)
+    return errors
+
+
+@jit(nopython=True, parallel=True, cache=True)
+def triangulate_segments_robust(
+    projection_stack: np.ndarray,
+    camera_slots: np.ndarray,
+    img_xy: np.ndarray,
+    weights: np.ndarray,
+    segment_starts: np.ndarray,
+    segment_ends: np.ndarray,
+    reprojection_threshold: float,
+):
+    """
+    RANSAC-style counterpart to `triangulate_segments`. Because a point is seen
+    by only a handful of cameras, every camera pair is tried as a hypothesis rather
+    than sampling randomly. The pair that brings the most views within
+    `reprojection_threshold` pixels wins, and the point is then re-solved with a
+    confidence weighted DLT over those inlier views only.
+
+    returns:
+        xyz: (n_segments, 3); NaN where no pair could reach a consensus of two views
+        reprojection_error: (n_segments,) mean pixel error across the inlier views
+        inlier_count: (n_segments,) number of views used in the final estimate
+    """
+    segment_count = len(segment_starts)
+    xyz = np.full((segment_count, 3), np.nan)
+    reprojection_error = np.full(segment_count, np.nan)
+    inlier_count = np.zeros(segment_count, dtype=np.int64)
+
+    for segment in prange(segment_count):
+        start = segment_starts[segment]
+        rows = np.arange(start, segment_ends[segment])
+        num_cams = len(rows)
+
+        best_count = 0
+        best_error = np.inf
+        best_inliers = rows[:0]
+
+        for a in range(num_cams - 1):
+            for b in range(a + 1, num_cams):
+                pair = np.array([rows[a], rows[b]])
+                candidate = weighted_dlt(projection_stack, camera_slots, img_xy, weights, pair)
+                errors = reprojection_errors(projection_stack, camera_slots, img_xy, rows, candidate)
+                inliers = rows[errors < reprojection_threshold]
+                total_error = errors[errors < reprojection_threshold].sum()
+
+                if len(inliers) > best_count or (
+                    len(inliers) == best_count and total_error < best_error
+                ):
+                    best_count = len(inliers)
+                    best_error = total_error
+                    best_inliers = inliers
+
+        if best_count >= 2:
+            point_xyz = weighted_dlt(projection_stack, camera_slots, img_xy, weights, best_inliers)
+            errors = reprojection_errors(projection_stack, camera_slots, img_xy, best_inliers, point_xyz)
+            xyz[segment] = point_xyz
+            reprojection_error[segment] = errors.mean()
+            inlier_count[segment] = best_count
+
+    return xyz, reprojection_error, inlier_count
+
+
+def get_triangulation_segments(sync_index: np.ndarray, point_id: np.ndarray):
+    """
+    Returns the sort order of the observations along with the start/stop
+    rows of each (sync_index, point_id) group that was seen by more than one camera.
+    Grouping is done once over the whole table rather than once per sync_index.
+    """
+    order = np.lexsort((point_id, sync_index))
+    sorted_sync_index = sync_index[order]
+    sorted_point_id = point_id[order]
+
+    if len(order) == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return order, empty, empty
+
+    new_group = np.empty(len(order), dtype=bool)
+    new_group[0] = True
+    new_group[1:] = (sorted_sync_index[1:] != sorted_sync_index[:-1]) | (
+        sorted_point_id[1:] != sorted_point_id[:-1]
+    )
+
+    segment_starts = np.flatnonzero(new_group)
+    segment_ends = np.append(segment_starts[1:], len(order))
+
+    multi_view = (segment_ends - segment_starts) > 1
+    return order, segment_starts[multi_view], segment_ends[multi_view]
+
+
+def triangulate_xy(
+    xy: pd.DataFrame,
+    camera_array: CameraArray,
+    robust: bool = False,
+    reprojection_threshold: float = ROBUST_REPROJECTION_THRESHOLD,
+    undistorter: Undistorter = None,
+) -> pd.DataFrame:
     """
     xy data comes in as viewed by the camera and it is undistorted as
     part of the triangulation process
+
+    The full table is sorted once by (sync_index, point_id) and all points are
+    solved in a single parallel pass
+
+    robust: weight each view by its `confidence` (if the xy data has one) and reject
+    views whose reprojection error exceeds `reprojection_threshold` pixels. The
+    returned table then also carries `reprojection_error` and `inlier_count` columns
+
+    undistorter: may be provided to avoid rebuilding it (and any remap tables) on repeated calls
     """    
-    # assemble numba compatible dictionary
-    projection_matrices = camera_array.projection_matrices
+    if undistorter is None:
+        undistorter = Undistorter(camera_array)
 
-    # Code here to undistort all image points 
-    undistorted_xy = undistort_batch(xy, camera_array)
-    
-    xyz = {
-        "sync_index": [],
-        "point_id": [],
-        "x_coord": [],
-        "y_coord": [],
-        "z_coord": [],
-    }
+    undistorted_xy = undistorter.undistort_xy(xy)
 
-    sync_index_max = xy["sync_index"].max()
+    ports = np.array(sorted(camera_array.cameras.keys()), dtype=np.int64)
+    projection_stack = np.array(
+        [camera_array.cameras[port].projection_matrix for port in ports], dtype=np.float64
+    )
 
+    logger.info("About to begin triangulation...due to jit, first round of calculations may take a moment.")
     start = time()
-    last_log_update = int(start)  # only report progress each second
 
-    logger.info("About to begin triangulation...due to jit, first round of calculations may take a moment.")
-    for index in xy["sync_index"].unique():
-        active_index = xy["sync_index"] == index
-
-        # load variables for given sync index
-        port = xy["port"][active_index].to_numpy()
-        point_ids = undistorted_xy["point_id"][active_index].to_numpy()
-        img_loc_x = undistorted_xy["img_loc_undistort_x"][active_index].to_numpy()
-        img_loc_y = undistorted_xy["img_loc_undistort_y"][active_index].to_numpy()
-        raw_xy = np.vstack([img_loc_x, img_loc_y]).T
-
-        # the fancy part
-        point_id_xyz, points_xyz = triangulate_sync_index(
-            projection_matrices, port, point_ids, raw_xy
+    sync_index = undistorted_xy["sync_index"].to_numpy(dtype=np.int64)
+    point_id = undistorted_xy["point_id"].to_numpy(dtype=np.int64)
+    camera_slots = np.searchsorted(ports, undistorted_xy["port"].to_numpy(dtype=np.int64))
+    img_xy = np.column_stack(
+        [
+            undistorted_xy["img_loc_undistort_x"].to_numpy(dtype=np.float64),
+            undistorted_xy["img_loc_undistort_y"].to_numpy(dtype=np.float64),
+        ]
+    )
+
+    order, segment_starts, segment_ends = get_triangulation_segments(sync_index, point_id)
+    first_rows = order[segment_starts]
+
+    xyz = {
+        "sync_index": sync_index[first_rows],
+        "point_id": point_id[first_rows],
+    }
+
+    if robust:
+        weights = get_confidence_weights(undistorted_xy)
+        points_xyz, reprojection_error, inlier_count = triangulate_segments_robust(
+            projection_stack,
+            camera_slots[order],
+            img_xy[order],
+            weights[order],
+            segment_starts,
+            segment_ends,
+            reprojection_threshold,
+        )
+    elif len(segment_starts) > 0:
+        points_xyz = triangulate_segments(
+            projection_stack,
+            camera_slots[order],
+            img_xy[order],
+            segment_starts,
+            segment_ends,
         )
+    else:
+        points_xyz = np.zeros((0, 3))
+
+    xyz["x_coord"] = points_xyz[:, 0]
+    xyz["y_coord"] = points_xyz[:, 1]
+    xyz["z_coord"] = points_xyz[:, 2]
+
+    if robust:
+        xyz["reprojection_error"] = reprojection_error
+        xyz["inlier_count"] = inlier_count
 
-        if len(point_id_xyz) > 0:
-            # there are points to store so store them...
-            xyz["sync_index"].extend([index] * len(point_id_xyz))
-            xyz["point_id"].extend(point_id_xyz)
-
-            points_xyz = np.array(points_xyz)
-            xyz["x_coord"].extend(points_xyz[:, 0].tolist())
-            xyz["y_coord"].extend(points_xyz[:, 1].tolist())
-            xyz["z_coord"].extend(points_xyz[:, 2].tolist())
-
-        # only log percent complete each second
-        if int(time()) - last_log_update >= 1:
-            percent_complete = int(100*(index/sync_index_max))
-            logger.info(
-                f"(Stage 2 of 2): Triangulation of (x,y) point estimates is {percent_complete}% complete"
-            )
-            last_log_update = int(time())
-
-    # convert to dataframe prior to returning
     xyz = pd.DataFrame(xyz)
-    return xyz
 
+    if robust:
+        # points that could not reach a consensus among at least two views are dropped
+        rejected = xyz["x_coord"].isna()
+        logger.info(f"Robust triangulation rejected {rejected.sum()} of {len(xyz)} points")
+        xyz = xyz[~rejected].reset_index(drop=True)
 
+    logger.info(
+        f"(Stage 2 of 2): Triangulated {len(xyz)} points in {round(time()-start, 2)} seconds"
+    )
+    return xyz
 
-def undistort(points, camera: CameraData, iter_num=3) -> np.ndarray: 
+
+def get_confidence_weights(xy: pd.DataFrame) -> np.ndarray:
     """
-    points: (n,2) dimensional np.ndarray 
-    returns: (2,n) dimensional np.ndarray... definitely not happy with this but not going to start refactoring this at this moment
+    Per observation weights for the DLT. Trackers that don't report a confidence
+    (and points created by gap filling) are given full weight
     """
-
-    # implementing a function described here: https://yangyushi.github.io/code/2020/03/04/opencv-undistort.html
-    # supposedly a better implementation than OpenCV
-    k1, k2, p1, p2, k3 = camera.distortions
-    fx, fy = camera.matrix[0, 0], camera.matrix[1, 1]
-    cx, cy = camera.matrix[:2, 2]
-        
-    x, y = points.T[0], points.T[1]
-
-    x = (x - cx) / fx
-    x0 = x
-    y = (y - cy) / fy
-    y0 = y
-
-    for _ in range(iter_num):
-        r2 = x**2 + y**2
-        k_inv = 1 / (1 + k1 * r2 + k2 * r2**2 + k3 * r2**3)
-        delta_x = 2 * p1 * x * y + p2 * (r2 + 2 * x**2)
-        delta_y = p1 * (r2 + 2 * y**2) + 2 * p2 * x * y
-        x = (x0 - delta_x) * k_inv
-        y = (y0 - delta_y) * k_inv
-    return np.array((x * fx + cx, y * fy + cy))
-
-
-def undistort_batch(xy_df:pd.DataFrame, camera_array:CameraArray)->pd.DataFrame:
-    
-    undistorted_points = []
-    for port, camera in camera_array.cameras.items():
-        logger.info(f"Processing points from camera {port}")
-        subset_xy = xy_df.query(f"port == {port}").copy()
-        points = np.vstack([subset_xy["img_loc_x"],subset_xy["img_loc_y"]]).T
-        x,y = undistort(points, camera)
-        subset_xy["img_loc_undistort_x"] = x
-        subset_xy["img_loc_undistort_y"] = y
-        undistorted_points.append(subset_xy)
-        
-    logger.info("Assembling undistorted dataframe")
-
-    xy_undistorted_df = pd.concat(undistorted_points)
-    return xy_undistorted_df
-    
\ No newline at end of file
+    if "confidence" in xy.columns:
+        weights = xy["confidence"].to_numpy(dtype=np.float64)
+        weights = np.where(np.isnan(weights), 1.0, weights)
+    else:
+        weights = np.ones(len(xy))
+    return weights
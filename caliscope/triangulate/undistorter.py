@@ -0,0 +1,204 @@
+import caliscope.logger
+
+import numpy as np
+import pandas as pd
+from numba import jit, prange
+
+from caliscope.cameras.camera_array import CameraArray
+
+logger = caliscope.logger.get(__name__)
+
+
+@jit(nopython=True, parallel=True, cache=True)
+def undistort_points_kernel(
+    points: np.ndarray,
+    slots: np.ndarray,
+    intrinsics: np.ndarray,
+    distortions: np.ndarray,
+    iter_num: int,
+) -> np.ndarray:
+    """
+    Fixed point undistortion applied to every point in one pass. Each point looks up
+    its camera parameters via `slots`
+
+    points: (n,2) distorted image points
+    slots: (n,) row of intrinsics/distortions associated with each point
+    intrinsics: (n_cameras, 4) as fx, fy, cx, cy
+    distortions: (n_cameras, 5) as k1, k2, p1, p2, k3
+    """
+    # implementing a function described here: https://yangyushi.github.io/code/2020/03/04/opencv-undistort.html
+    # supposedly a better implementation than OpenCV
+    undistorted = np.empty_like(points)
+
+    for i in prange(points.shape[0]):
+        slot = slots[i]
+        fx = intrinsics[slot, 0]
+        fy = intrinsics[slot, 1]
+        cx = intrinsics[slot, 2]
+        cy = intrinsics[slot, 3]
+        k1 = distortions[slot, 0]
+        k2 = distortions[slot, 1]
+        p1 = distortions[slot, 2]
+        p2 = distortions[slot, 3]
+        k3 = distortions[slot, 4]
+
+        x0 = (points[i, 0] - cx) / fx
+        y0 = (points[i, 1] - cy) / fy
+        x = x0
+        y = y0
+
+        for _ in range(iter_num):
+            r2 = x**2 + y**2
+            k_inv = 1 / (1 + k1 * r2 + k2 * r2**2 + k3 * r2**3)
+            delta_x = 2 * p1 * x * y + p2 * (r2 + 2 * x**2)
+            delta_y = p1 * (r2 + 2 * y**2) + 2 * p2 * x * y
+            x = (x0 - delta_x) * k_inv
+            y = (y0 - delta_y) * k_inv
+
+        undistorted[i, 0] = x * fx + cx
+        undistorted[i, 1] = y * fy + cy
+
+    return undistorted
+
+
+class Undistorter:
+    """
+    Holds the intrinsic parameters of all cameras in a CameraArray as port-indexed arrays
+    so that points from any mix of cameras can be undistorted in a single call.
+
+    Built once and shared by the offline and real-time triangulation paths.
+
+    Trackers that report integer pixel locations (the mediapipe based trackers) can
+    use dense remap tables, in which case undistortion is a lookup rather than an iteration.
+    A table costs 8 bytes per pixel per camera, so they are only built on request.
+    """
+
+    def __init__(self, camera_array: CameraArray, iter_num=3, use_remap_tables=False):
+        self.iter_num = iter_num
+
+        # only cameras with an intrinsic calibration can be undistorted
+        self.ports = np.array(
+            sorted(
+                port
+                for port, camera in camera_array.cameras.items()
+                if camera.matrix is not None and camera.distortions is not None
+            ),
+            dtype=np.int64,
+        )
+
+        self.intrinsics = np.zeros((len(self.ports), 4), dtype=np.float64)
+        self.distortions = np.zeros((len(self.ports), 5), dtype=np.float64)
+
+        for slot, port in enumerate(self.ports):
+            camera = camera_array.cameras[port]
+            self.intrinsics[slot] = [
+                camera.matrix[0, 0],
+                camera.matrix[1, 1],
+                camera.matrix[0, 2],
+                camera.matrix[1, 2],
+            ]
+            self.distortions[slot] = np.ravel(camera.distortions)[:5]
+
+        self.remap_tables = {}
+        if use_remap_tables:
+            for slot, port in enumerate(self.ports):
+                size = camera_array.cameras[port].size
+                if size is not None:
+                    self.remap_tables[slot] = self._build_remap_table(slot, size)
+
+    def _build_remap_table(self, slot: int, size) -> np.ndarray:
+        """
+        (height, width, 2) table of the undistorted location of every integer pixel
+        """
+        width, height = int(size[0]), int(size[1])
+        logger.info(f"Building {width}x{height} undistortion remap table for port {self.ports[slot]}")
+        grid_x, grid_y = np.meshgrid(np.arange(width), np.arange(height))
+        grid = np.column_stack([grid_x.ravel(), grid_y.ravel()]).astype(np.float64)
+        slots = np.full(grid.shape[0], slot, dtype=np.int64)
+
+        table = undistort_points_kernel(
+            grid, slots, self.intrinsics, self.distortions, self.iter_num
+        )
+        return table.reshape(height, width, 2).astype(np.float32)
+
+    def covers(self, ports: np.ndarray) -> np.ndarray:
+        """
+        boolean mask of which ports have intrinsics available for undistortion
+        """
+        return np.isin(ports, self.ports)
+
+    def undistort_points(self, points: np.ndarray, ports: np.ndarray) -> np.ndarray:
+        """
+        points: (n,2) image points as viewed by the camera
+        ports: (n,) port each point was observed on; all must be covered by this Undistorter
+
+        returns: (n,2) undistorted image points
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        ports = np.asarray(ports, dtype=np.int64)
+
+        covered = self.covers(ports)
+        if not covered.all():
+            raise ValueError(f"No intrinsic calibration to undistort points from ports {np.unique(ports[~covered])}")
+        slots = np.searchsorted(self.ports, ports)
+
+        if len(self.remap_tables) == 0:
+            return undistort_points_kernel(
+                points, slots, self.intrinsics, self.distortions, self.iter_num
+            )
+
+        undistorted = np.empty_like(points)
+        needs_iteration = np.ones(points.shape[0], dtype=bool)
+
+        for slot, table in self.remap_tables.items():
+            height, width = table.shape[:2]
+            x = points[:, 0]
+            y = points[:, 1]
+            lookup = (
+                (slots == slot)
+                & (x == np.round(x))
+                & (y == np.round(y))
+                & (x >= 0)
+                & (x < width)
+                & (y >= 0)
+                & (y < height)
+            )
+            undistorted[lookup] = table[y[lookup].astype(np.int64), x[lookup].astype(np.int64)]
+            needs_iteration[lookup] = False
+
+        if needs_iteration.any():
+            undistorted[needs_iteration] = undistort_points_kernel(
+                points[needs_iteration],
+                slots[needs_iteration],
+                self.intrinsics,
+                self.distortions,
+                self.iter_num,
+            )
+
+        return undistorted
+
+    def undistort_xy(self, xy: pd.DataFrame) -> pd.DataFrame:
+        """
+        Returns the rows of the xy table from calibrated cameras with `img_loc_undistort_x`
+        and `img_loc_undistort_y` columns added.
+        """
+        ports = xy["port"].to_numpy(dtype=np.int64)
+        covered = self.covers(ports)
+
+        if covered.all():
+            xy_undistorted = xy.copy()
+        else:
+            logger.info(f"Ignoring points from uncalibrated ports {np.unique(ports[~covered])}")
+            xy_undistorted = xy[covered].copy()
+
+        points = np.column_stack(
+            [
+                xy_undistorted["img_loc_x"].to_numpy(dtype=np.float64),
+                xy_undistorted["img_loc_y"].to_numpy(dtype=np.float64),
+            ]
+        )
+        undistorted = self.undistort_points(points, ports[covered])
+
+        xy_undistorted["img_loc_undistort_x"] = undistorted[:, 0]
+        xy_undistorted["img_loc_undistort_y"] = undistorted[:, 1]
+        return xy_undistorted
@@ -0,0 +1,77 @@
+"""
+Compare charuco detection at native resolution with pyramid detection (markers found on a
+downscaled image, corners refined at full resolution) on the extrinsic test recordings,
+upscaled to simulate high resolution cameras.
+
+Reports time per frame and the difference in corner positions between the two modes.
+Run from the repository root: python dev/bench_charuco_pyramid.py
+"""
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+import caliscope.logger
+from caliscope import __root__
+from caliscope.configurator import Configurator
+from caliscope.trackers.charuco_tracker import CharucoTracker
+
+logger = caliscope.logger.get(__name__)
+
+session_path = Path(__root__, "tests", "sessions", "post_monocal")
+charuco = Configurator(session_path).get_charuco()
+
+
+def read_frames(video_path: Path, upscale: float) -> list:
+    capture = cv2.VideoCapture(str(video_path))
+    frames = []
+    while True:
+        success, frame = capture.read()
+        if not success:
+            break
+        if upscale != 1:
+            frame = cv2.resize(frame, None, fx=upscale, fy=upscale, interpolation=cv2.INTER_CUBIC)
+        frames.append(frame)
+    capture.release()
+    return frames
+
+
+def track_all(frames: list, port: int, pyramid: bool):
+    # roi tracking is off to isolate the effect of the pyramid
+    tracker = CharucoTracker(charuco, track_roi=False, pyramid=pyramid)
+    start = time.perf_counter()
+    point_packets = [tracker.get_points(frame, port, 0) for frame in frames]
+    return time.perf_counter() - start, point_packets
+
+
+for upscale in [1, 2, 3]:
+    native_time = pyramid_time = 0
+    frame_count = native_corners = missing = extra = 0
+    differences = []
+
+    for port in range(4):
+        frames = read_frames(Path(session_path, "calibration", "extrinsic", f"port_{port}.mp4"), upscale)
+        elapsed, native_packets = track_all(frames, port, pyramid=False)
+        native_time += elapsed
+        elapsed, pyramid_packets = track_all(frames, port, pyramid=True)
+        pyramid_time += elapsed
+        frame_count += len(frames)
+
+        for native, pyramid in zip(native_packets, pyramid_packets):
+            common, native_index, pyramid_index = np.intersect1d(native.point_id, pyramid.point_id, return_indices=True)
+            native_corners += len(native.point_id)
+            missing += len(native.point_id) - len(common)
+            extra += len(pyramid.point_id) - len(common)
+            if len(common) > 0:
+                differences.append(np.linalg.norm(native.img_loc[native_index] - pyramid.img_loc[pyramid_index], axis=1))
+
+        resolution = frames[0].shape[1::-1]
+
+    differences = np.concatenate(differences)
+    logger.info(
+        f"{resolution}: native {1000 * native_time / frame_count:.1f} ms/frame, "
+        f"pyramid {1000 * pyramid_time / frame_count:.1f} ms/frame ({native_time / pyramid_time:.2f}x); "
+        f"corners {native_corners} native, {missing} missed, {extra} extra; "
+        f"corner difference mean {differences.mean():.4f} px, p99 {np.percentile(differences, 99):.4f} px, max {differences.max():.4f} px"
+    )
@@ -0,0 +1,21 @@
+import pytest
+
+import caliscope.trackers.tracker_cache as tracker_cache
+import caliscope.recording.seek_index as seek_index
+import caliscope.recording.video_hash as video_hash
+
+
+@pytest.fixture(autouse=True, scope="session")
+def isolated_app_data(tmp_path_factory):
+    """
+    Tracked points, seek indices and video hashes are normally kept in the user's application data
+    directory. The test session gets its own so that nothing is left behind and each run starts afresh
+    """
+    app_data = tmp_path_factory.mktemp("app_data")
+    defaults = (tracker_cache.TRACKER_CACHE_DIR, seek_index.SEEK_INDEX_DIR, video_hash.VIDEO_HASH_PATH)
+
+    tracker_cache.TRACKER_CACHE_DIR = app_data / "tracker_cache"
+    seek_index.SEEK_INDEX_DIR = app_data / "seek_index"
+    video_hash.VIDEO_HASH_PATH = app_data / "video_hashes.json"
+    yield
+    tracker_cache.TRACKER_CACHE_DIR, seek_index.SEEK_INDEX_DIR, video_hash.VIDEO_HASH_PATH = defaults
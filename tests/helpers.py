@@ -0,0 +1,77 @@
+"""
+Helpers shared by the tracker and recorded stream tests
+"""
+from pathlib import Path
+from queue import Queue
+
+import cv2
+import numpy as np
+
+from caliscope.packets import PointPacket
+from caliscope.calibration.charuco import Charuco
+from caliscope.recording.recorded_stream import RecordedStream
+
+
+def get_charuco(inverted=True) -> Charuco:
+    """
+    The board seen in the post_monocal and 4_cam_recording sessions
+    """
+    return Charuco(4, 5, 11, 8.5, aruco_scale=0.75, square_size_overide_cm=5.25, inverted=inverted)
+
+
+def read_frames(video_path: Path, count: int = None, upscale: float = 1) -> list:
+    """
+    The first count frames of the video (all of them by default), optionally upscaled
+    to stand in for a higher resolution camera
+    """
+    capture = cv2.VideoCapture(str(video_path))
+    frames = []
+    while count is None or len(frames) < count:
+        success, frame = capture.read()
+        if not success:
+            break
+        if upscale != 1:
+            frame = cv2.resize(frame, None, fx=upscale, fy=upscale, interpolation=cv2.INTER_CUBIC)
+        frames.append(frame)
+    capture.release()
+    return frames
+
+
+def assert_same_points(expected: PointPacket, actual: PointPacket):
+    """
+    Points are compared at the precision of `actual`, so that points read back from the
+    float32 tracker cache can be checked against those just tracked
+    """
+    np.testing.assert_array_equal(expected.point_id, actual.point_id)
+    point_count = len(expected.point_id)
+    if point_count == 0:
+        return
+
+    for expected_values, actual_values in [
+        (expected.img_loc, actual.img_loc),
+        (expected.obj_loc, actual.obj_loc),
+        (expected.confidence, actual.confidence),
+    ]:
+        if expected_values is None:
+            continue
+        actual_values = np.asarray(actual_values).reshape(point_count, -1)
+        expected_values = np.asarray(expected_values, dtype=actual_values.dtype).reshape(point_count, -1)
+        np.testing.assert_array_equal(expected_values, actual_values)
+
+
+def play(stream: RecordedStream) -> list:
+    """
+    Plays the stream through to its end and returns every frame packet it published
+    """
+    frame_q = Queue()
+    stream.subscribe(frame_q)
+    stream.play_video()
+
+    frame_packets = []
+    while True:
+        frame_packet = frame_q.get()
+        if frame_packet.frame_index == -1:
+            break
+        frame_packets.append(frame_packet)
+    stream.thread.join()
+    return frame_packets
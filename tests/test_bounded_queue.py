@@ -0,0 +1,71 @@
+import caliscope.logger
+
+import numpy as np
+from queue import Full
+
+import pytest
+
+from caliscope.bounded_queue import BoundedQueue, OverflowPolicy
+from caliscope.packets import FramePacket, PointPacket, SyncPacket
+
+logger = caliscope.logger.get(__name__)
+
+
+def make_frame_packet(frame_index: int) -> FramePacket:
+    return FramePacket(
+        port=0,
+        frame_index=frame_index,
+        frame_time=frame_index / 30,
+        frame=np.zeros((8, 8, 3), dtype=np.uint8),
+        points=PointPacket(point_id=np.array([1]), img_loc=np.array([[2.0, 3.0]])),
+    )
+
+
+def test_block():
+    q = BoundedQueue(2, OverflowPolicy.BLOCK)
+    q.put(make_frame_packet(0))
+    q.put(make_frame_packet(1))
+
+    with pytest.raises(Full):
+        q.put(make_frame_packet(2), timeout=0.01)
+
+    assert q.metrics["high_water_mark"] == 2
+
+
+def test_drop_oldest():
+    q = BoundedQueue(2, OverflowPolicy.DROP_OLDEST)
+    for frame_index in range(5):
+        q.put(make_frame_packet(frame_index))
+    # end of stream signal is never dropped, even once it is the oldest item
+    q.put(None)
+    q.put(make_frame_packet(5))
+
+    remaining = [q.get() for _ in range(q.qsize())]
+    assert remaining[0] is None
+    assert [packet.frame_index for packet in remaining[1:]] == [5]
+    assert q.dropped_count == 5
+    assert q.high_water_mark == 2
+
+
+def test_drop_frames():
+    q = BoundedQueue(2, OverflowPolicy.DROP_FRAMES)
+    for frame_index in range(4):
+        q.put(SyncPacket(frame_index, {0: make_frame_packet(frame_index), 1: None}))
+
+    packets = [q.get() for _ in range(q.qsize())]
+
+    # nothing is lost but the frames of everything beyond the limit
+    assert [packet.sync_index for packet in packets] == [0, 1, 2, 3]
+    assert [packet.frame_packets[0].frame is not None for packet in packets] == [True, True, False, False]
+    for packet in packets:
+        assert packet.frame_packets[1] is None
+        assert packet.frame_packets[0].to_tidy_table(packet.sync_index)["img_loc_x"] == [2.0]
+
+    assert q.stripped_count == 2
+    assert q.high_water_mark == 4
+
+
+if __name__ == "__main__":
+    test_block()
+    test_drop_oldest()
+    test_drop_frames()
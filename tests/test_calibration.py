@@ -20,12 +20,12 @@ from caliscope.calibration.capture_volume.quality_controller import QualityContr
 from caliscope.synchronized_stream_manager import SynchronizedStreamManager
 from caliscope.helper import copy_contents
 
-from caliscope.controller import FILTERED_FRACTION
 from caliscope.configurator import Configurator
 
 logger = caliscope.logger.get(__name__)
 
 TEST_SESSIONS = ["mediapipe_calibration"]
+FILTERED_FRACTION = 0.025  # 2.5% of image points with highest reprojection error are filtered out
 
 
 # def copy_contents(src_folder, dst_folder):
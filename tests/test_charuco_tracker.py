@@ -0,0 +1,115 @@
+import caliscope.logger
+
+import cv2
+import numpy as np
+from pathlib import Path
+
+from caliscope import __root__
+from caliscope.configurator import Configurator
+from caliscope.trackers.charuco_tracker import CharucoTracker
+from tests.helpers import read_frames
+
+logger = caliscope.logger.get(__name__)
+
+
+def test_roi_tracking_matches_full_frame():
+    session_path = Path(__root__, "tests", "sessions", "post_monocal")
+    charuco = Configurator(session_path).get_charuco()
+    port = 1
+    frames = read_frames(Path(session_path, "calibration", "extrinsic", f"port_{port}.mp4"))
+
+    full_frame_tracker = CharucoTracker(charuco, track_roi=False)
+    roi_tracker = CharucoTracker(charuco, track_roi=True)
+
+    full_frame_count = 0
+    missing_count = 0
+    for frame in frames:
+        full_frame_points = full_frame_tracker.get_points(frame, port, 0)
+        roi_points = roi_tracker.get_points(frame, port, 0)
+
+        # corners found in both agree to well within a pixel
+        common_ids, full_index, roi_index = np.intersect1d(
+            full_frame_points.point_id, roi_points.point_id, return_indices=True
+        )
+        if len(common_ids) > 0:
+            assert np.abs(full_frame_points.img_loc[full_index] - roi_points.img_loc[roi_index]).max() < 0.01
+
+        full_frame_count += len(full_frame_points.point_id)
+        missing_count += len(full_frame_points.point_id) - len(common_ids)
+
+    logger.info(f"ROI tracking missed {missing_count} of {full_frame_count} corners")
+    assert missing_count <= 0.02 * full_frame_count
+
+
+def test_roi_follows_board_per_port():
+    session_path = Path(__root__, "tests", "sessions", "post_monocal")
+    charuco = Configurator(session_path).get_charuco()
+    frames = read_frames(Path(session_path, "calibration", "extrinsic", "port_1.mp4"))
+    frame = next(frame for frame in frames if len(CharucoTracker(charuco).get_points(frame, 0, 0).point_id) > 4)
+    height, width = frame.shape[:2]
+
+    tracker = CharucoTracker(charuco, track_roi=True)
+    points = tracker.get_points(frame, 0, 0)
+
+    x_min, y_min, x_max, y_max = tracker.board_regions[0]
+    assert 0 <= x_min < x_max <= width and 0 <= y_min < y_max <= height
+    assert (x_max - x_min) * (y_max - y_min) < width * height
+    assert np.all(points.img_loc >= [x_min, y_min]) and np.all(points.img_loc <= [x_max, y_max])
+
+    # another port starts without any region
+    assert 1 not in tracker.board_regions
+
+    # the board is lost in a blank frame and searched for across the full frame again
+    tracker.get_points(np.zeros_like(frame), 0, 0)
+    assert tracker.board_regions[0] is None
+    recovered = tracker.get_points(frame, 0, 0)
+    np.testing.assert_array_equal(np.sort(recovered.point_id), np.sort(points.point_id))
+
+    # a board only visible in the mirror image is looked for mirrored first from then on
+    mirrored_frame = cv2.flip(frame, 1)
+    tracker.get_points(mirrored_frame, 2, 0)
+    assert tracker.last_mirrored.get(2, False) != tracker.last_mirrored.get(0, False)
+
+
+def test_pyramid_detection_matches_native():
+    session_path = Path(__root__, "tests", "sessions", "post_monocal")
+    charuco = Configurator(session_path).get_charuco()
+    port = 2
+    # upscaled to stand in for a high resolution camera
+    frames = read_frames(Path(session_path, "calibration", "extrinsic", f"port_{port}.mp4"), upscale=2)
+
+    native_tracker = CharucoTracker(charuco, track_roi=False, pyramid=False)
+    pyramid_tracker = CharucoTracker(charuco, track_roi=False, pyramid=True)
+
+    scales = []
+    differences = []
+    native_count = 0
+    missing_count = 0
+    for frame in frames:
+        scales.append(pyramid_tracker.get_detection_scale(port))
+        native_points = native_tracker.get_points(frame, port, 0)
+        pyramid_points = pyramid_tracker.get_points(frame, port, 0)
+
+        common_ids, native_index, pyramid_index = np.intersect1d(
+            native_points.point_id, pyramid_points.point_id, return_indices=True
+        )
+        differences.append(
+            np.linalg.norm(native_points.img_loc[native_index] - pyramid_points.img_loc[pyramid_index], axis=1)
+        )
+        native_count += len(native_points.point_id)
+        missing_count += len(native_points.point_id) - len(common_ids)
+
+    # the first frame is searched at full resolution, then at a scale set by the size of the markers
+    assert scales[0] == 1
+    assert min(scales) < 1
+
+    differences = np.concatenate(differences)
+    logger.info(f"Pyramid corners differ from native by a mean of {differences.mean()} px; {missing_count} missed")
+    assert np.percentile(differences, 99) < 0.01
+    assert missing_count <= 0.05 * native_count
+
+
+if __name__ == "__main__":
+    test_roi_tracking_matches_full_frame()
+    test_roi_follows_board_per_port()
+    test_pyramid_detection_matches_native()
@@ -0,0 +1,53 @@
+import caliscope.logger
+
+import copy
+import numpy as np
+from pathlib import Path
+
+from caliscope import __root__
+from caliscope.configurator import Configurator
+from caliscope.calibration.capture_volume.capture_volume import CaptureVolume
+from caliscope.calibration.capture_volume.helper_functions.select_sync_indices import (
+    select_sync_indices,
+)
+
+logger = caliscope.logger.get(__name__)
+
+
+def test_coarse_to_fine():
+    session_path = Path(__root__, "tests", "sessions", "post_optimization")
+    config = Configurator(session_path)
+    capture_volume = CaptureVolume(config.get_camera_array(), config.get_point_estimates())
+
+    # knock the solution off of its optimum so that there is work to do
+    rng = np.random.default_rng(0)
+    params = capture_volume.get_vectorized_params()
+    params = params + rng.normal(0, 0.01, params.size)
+    capture_volume.camera_array.update_extrinsic_params(params)
+    capture_volume.point_estimates.update_obj_xyz(params)
+
+    pair_budget = 5
+    selected = select_sync_indices(capture_volume.point_estimates, pair_budget)
+    all_sync_indices = np.unique(capture_volume.point_estimates.sync_indices)
+    camera_count = capture_volume.point_estimates.n_cameras
+    pair_count = camera_count * (camera_count - 1) // 2
+
+    assert np.isin(selected, all_sync_indices).all()
+    assert selected.size <= pair_budget * pair_count
+    assert selected.size < all_sync_indices.size
+
+    subset, obj_rows = capture_volume.point_estimates.get_sync_index_subset(selected)
+    assert np.allclose(subset.obj, capture_volume.point_estimates.obj[obj_rows])
+    assert np.isin(subset.sync_indices, selected).all()
+
+    full_volume = copy.deepcopy(capture_volume)
+    full_volume.optimize()
+    capture_volume.optimize_coarse_to_fine(pair_budget=pair_budget)
+
+    logger.info(f"Phase timings: {capture_volume.phase_timings}")
+    assert set(capture_volume.phase_timings.keys()) == {"selection", "coarse", "refinement"}
+    assert abs(capture_volume.rmse["overall"] - full_volume.rmse["overall"]) < 0.01
+
+
+if __name__ == "__main__":
+    test_coarse_to_fine()
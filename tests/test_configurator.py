@@ -35,6 +35,9 @@ def test_configurator():
 
     config = Configurator(test_delete_path)
 
+    # extrinsic calibration tracks every frame unless sampling is requested
+    assert config.get_extrinsic_sync_sample_count() == 0
+
     # load camera array
     camera_array = config.get_camera_array()
     assert(isinstance(camera_array, CameraArray))
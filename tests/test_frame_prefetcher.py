@@ -0,0 +1,64 @@
+import caliscope.logger
+
+import cv2
+import numpy as np
+from pathlib import Path
+
+from caliscope import __root__
+from caliscope.recording.frame_prefetcher import FramePrefetcher
+
+logger = caliscope.logger.get(__name__)
+
+
+def test_frame_prefetcher():
+    video_path = str(
+        Path(__root__, "tests", "sessions", "4_cam_recording", "calibration", "extrinsic", "port_1.mp4")
+    )
+
+    reference = cv2.VideoCapture(video_path)
+    reference_frames = []
+    while True:
+        success, frame = reference.read()
+        if not success:
+            break
+        reference_frames.append(frame)
+
+    capture = cv2.VideoCapture(video_path)
+    prefetcher = FramePrefetcher(capture, depth=3)
+
+    # frames come out in order and are not overwritten by later decoding
+    frames = []
+    for _ in range(10):
+        success, frame = prefetcher.read()
+        assert success
+        frames.append(frame)
+
+    # each frame has memory of its own, which the prefetcher lets go of once it is read
+    for frame, other_frame in zip(frames[:-1], frames[1:]):
+        assert not np.shares_memory(frame, other_frame)
+    assert not any(buffer is frame for buffer in prefetcher.buffers for frame in frames)
+
+    for frame, reference_frame in zip(frames, reference_frames[:10]):
+        assert np.array_equal(frame, reference_frame)
+
+    # seeking discards whatever was decoded ahead
+    prefetcher.seek(5)
+    success, frame = prefetcher.read()
+    assert success
+    assert np.array_equal(frame, reference_frames[5])
+
+    # end of video is reported like cv2.VideoCapture.read
+    read_count = 1
+    while True:
+        success, frame = prefetcher.read()
+        if not success:
+            break
+        read_count += 1
+    assert read_count == len(reference_frames) - 5
+    assert frame is None
+
+    prefetcher.stop()
+
+
+if __name__ == "__main__":
+    test_frame_prefetcher()
@@ -0,0 +1,156 @@
+import caliscope.logger
+
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pandas as pd
+
+from caliscope import __root__
+from caliscope.configurator import Configurator
+from caliscope.helper import copy_contents
+from caliscope.trackers.charuco_tracker import CharucoTracker
+from caliscope.recording.recorded_stream import RecordedStream
+from caliscope.recording.frame_sampler import (
+    strided_frame_indices,
+    select_spread,
+    screen_frames,
+    sample_charuco_frames,
+    UNREADABLE,
+)
+from caliscope.cameras.sync_planner import plan_synchronization, sample_plan
+from caliscope.synchronized_stream_manager import SynchronizedStreamManager
+from tests.helpers import get_charuco, read_frames, play
+
+logger = caliscope.logger.get(__name__)
+
+
+def get_recording_directory():
+    original_data_path = Path(__root__, "tests", "sessions", "post_monocal", "calibration", "extrinsic")
+    destination_path = Path(__root__, "tests", "sessions_copy_delete", "frame_sampler")
+    copy_contents(original_data_path, destination_path)
+    return destination_path
+
+
+def test_strided_and_spread_selection():
+    np.testing.assert_array_equal(strided_frame_indices(0, 4, 10), np.arange(5))
+    np.testing.assert_array_equal(strided_frame_indices(0, 100, 5), [0, 25, 50, 75, 100])
+
+    candidates = np.arange(0, 60, 5)
+    scores = np.array([0, 3, 1, 9, 0, 0, 2, 2, 0, 0, 0, 0])
+    # best of each run of candidates, even where nothing scored
+    np.testing.assert_array_equal(select_spread(candidates, scores, 3), [15, 30, 40])
+
+
+def test_sample_charuco_frames():
+    recording_directory = get_recording_directory()
+    video_path = Path(recording_directory, "port_1.mp4")
+    charuco = get_charuco()
+
+    capture = cv2.VideoCapture(str(video_path))
+    last_frame_index = int(capture.get(cv2.CAP_PROP_FRAME_COUNT)) - 1
+    capture.release()
+
+    candidates = strided_frame_indices(0, last_frame_index, 30)
+    marker_counts = screen_frames(video_path, candidates, charuco)
+    assert marker_counts.max() > 0
+
+    frame_sample = sample_charuco_frames(video_path, 0, last_frame_index, 10, charuco=charuco, candidates_per_sample=3)
+    assert len(frame_sample) == 10
+    assert np.all(np.diff(frame_sample) > 0)
+
+    # screening favors frames that show more of the board than simply striding would
+    strided_sample = strided_frame_indices(0, last_frame_index, 10)
+    screened_total = screen_frames(video_path, frame_sample, charuco).sum()
+    strided_total = screen_frames(video_path, strided_sample, charuco).sum()
+    logger.info(f"Markers in screened sample: {screened_total}; in strided sample: {strided_total}")
+    assert screened_total >= strided_total
+
+
+def test_unreadable_frames_are_not_sampled():
+    recording_directory = get_recording_directory()
+    video_path = Path(recording_directory, "port_1.mp4")
+    charuco = get_charuco()
+
+    capture = cv2.VideoCapture(str(video_path))
+    last_frame_index = int(capture.get(cv2.CAP_PROP_FRAME_COUNT)) - 1
+    capture.release()
+
+    # candidates past the end of the video cannot be decoded
+    candidates = np.array([0, last_frame_index // 2, last_frame_index + 5, last_frame_index + 10])
+    marker_counts = screen_frames(video_path, candidates, charuco)
+    assert np.all(marker_counts[:2] >= 0)
+    assert np.all(marker_counts[2:] == UNREADABLE)
+
+    # half of the candidates screened are beyond the end, and none of them are sampled
+    frame_sample = sample_charuco_frames(video_path, 0, 2 * last_frame_index, 10, charuco=charuco)
+    assert len(frame_sample) > 0
+    assert frame_sample.max() <= last_frame_index
+
+
+def test_sampled_playback():
+    recording_directory = get_recording_directory()
+    tracker = CharucoTracker(get_charuco())
+
+    sequential_frames = read_frames(Path(recording_directory, "port_1.mp4"))
+
+    frame_sample = [2, 3, 4, 17, 30, 31, len(sequential_frames) - 1]
+
+    stream = RecordedStream(recording_directory, port=1, tracker=tracker, fps_target=None)
+    stream.set_frame_sample(frame_sample)
+    assert stream.final_frame_index == len(sequential_frames) - 1
+
+    frame_packets = play(stream)
+    assert [frame_packet.frame_index for frame_packet in frame_packets] == frame_sample
+    for frame_packet in frame_packets:
+        np.testing.assert_array_equal(frame_packet.frame, sequential_frames[frame_packet.frame_index])
+
+
+def test_sampled_sync_stream_manager():
+    original_workspace = Path(__root__, "tests", "sessions", "4_cam_recording")
+    test_workspace = Path(__root__, "tests", "sessions_copy_delete", "4_cam_recording_sampled")
+    copy_contents(original_workspace, test_workspace)
+
+    config = Configurator(test_workspace)
+    tracker = CharucoTracker(config.get_charuco())
+    camera_array = config.get_camera_array()
+    recording_dir = Path(test_workspace, "calibration", "extrinsic")
+
+    sync_sample_count = 12
+    sync_stream_manager = SynchronizedStreamManager(
+        recording_dir=recording_dir,
+        all_camera_data=camera_array.cameras,
+        tracker=tracker,
+        sync_sample_count=sync_sample_count,
+    )
+    assert sync_stream_manager.batch
+
+    expected_plan = sample_plan(
+        plan_synchronization({port: stream.frame_times for port, stream in sync_stream_manager.streams.items()}),
+        sync_sample_count,
+    )
+    assert expected_plan["sync_index"].nunique() == sync_sample_count
+
+    sync_stream_manager.process_streams(include_video=False)
+
+    xy_path = Path(recording_dir, "CHARUCO", "xy_CHARUCO.csv")
+    while not xy_path.exists():
+        logger.info("Waiting for sampled xy data")
+        time.sleep(1)
+
+    xy = pd.read_csv(xy_path)
+    assert set(xy["sync_index"]).issubset(set(expected_plan["sync_index"]))
+
+    # each port tracked exactly the frames it was assigned in the sampled plan
+    for port, port_xy in xy.groupby("port"):
+        planned_frames = set(expected_plan.loc[expected_plan["port"] == port, "frame_index"])
+        assert set(port_xy["frame_index"]).issubset(planned_frames)
+
+
+if __name__ == "__main__":
+    test_strided_and_spread_selection()
+    test_sample_charuco_frames()
+    test_unreadable_frames_are_not_sampled()
+    test_sampled_playback()
+    test_sampled_sync_stream_manager()
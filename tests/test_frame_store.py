@@ -0,0 +1,89 @@
+import caliscope.logger
+
+import cv2
+import numpy as np
+from pathlib import Path
+
+from caliscope import __root__
+from caliscope.packets import FramePacket, PointPacket
+from caliscope.recording.frame_prefetcher import FramePrefetcher
+from caliscope.recording.frame_store import FrameStore, locate_frame
+
+logger = caliscope.logger.get(__name__)
+
+
+def test_frame_store_slots():
+    store = FrameStore((4, 6, 3), slot_count=2)
+
+    frame_a = store.acquire()
+    frame_b = store.acquire()
+    assert store.slots_in_use == 2
+    assert locate_frame(frame_a) == (store.shm.name, 0)
+    assert locate_frame(frame_b[:, 1:]) is None  # not contiguous
+
+    # every slot taken, so the next frame comes from the heap
+    frame_c = store.acquire()
+    assert locate_frame(frame_c) is None
+    assert store.overflow_count == 1
+
+    # a slot is only recycled once no view of it remains
+    view = frame_a[:2]
+    del frame_a
+    assert store.slots_in_use == 2
+    del view
+    assert store.slots_in_use == 1
+
+    del frame_b, frame_c
+    assert store.slots_in_use == 0
+    assert store.high_water_mark == 2
+    store.close()
+
+
+def test_prefetch_into_frame_store():
+    video_path = str(
+        Path(__root__, "tests", "sessions", "4_cam_recording", "calibration", "extrinsic", "port_1.mp4")
+    )
+
+    reference = cv2.VideoCapture(video_path)
+    reference_frames = [reference.read()[1] for _ in range(12)]
+
+    capture = cv2.VideoCapture(video_path)
+    size = (int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)), int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    store = FrameStore((size[1], size[0], 3), slot_count=6)
+    prefetcher = FramePrefetcher(capture, depth=3, frame_store=store)
+
+    # frames are handed out in place and are not overwritten while they are held
+    frames = []
+    for _ in range(12):
+        success, frame = prefetcher.read()
+        assert success
+        frames.append(frame)
+
+    for frame, reference_frame in zip(frames, reference_frames):
+        assert np.array_equal(frame, reference_frame)
+
+    assert sum(locate_frame(frame) is not None for frame in frames) == store.slot_count
+    prefetcher.stop()
+    store.close()
+
+
+def test_frame_with_points_rendered_once():
+    frame_packet = FramePacket(
+        port=0,
+        frame_index=0,
+        frame_time=0,
+        frame=np.zeros((20, 20, 3), dtype=np.uint8),
+        points=PointPacket(point_id=np.array([0]), img_loc=np.array([[10.0, 10.0]])),
+        draw_instructions=lambda point_id: {"radius": 2, "color": (0, 0, 255), "thickness": 1},
+    )
+
+    annotated = frame_packet.frame_with_points
+    assert annotated is frame_packet.frame_with_points
+    assert annotated.any()
+    assert not frame_packet.frame.any()
+
+
+if __name__ == "__main__":
+    test_frame_store_slots()
+    test_prefetch_into_frame_store()
+    test_frame_with_points_rendered_once()
@@ -53,7 +53,48 @@ def test_gap_fill_xyz():
     assert base_length < filled_length
     assert xyz_all_filled["gap_size"].max() > 0
 
+
+def test_gap_fill_max_gap_size():
+    # one point observed at sync indices 0, 4 and 9: a gap of 3 frames and then a gap of 4
+    max_gap_size = 3
+    observed = np.array([0, 4, 9])
+    xy_base = pd.DataFrame(
+        {
+            "sync_index": observed,
+            "port": 0,
+            "point_id": 7,
+            "frame_time": observed / 30,
+            "img_loc_x": observed * 10.0,
+            "img_loc_y": observed * 20.0,
+        }
+    )
+    xyz_base = pd.DataFrame(
+        {
+            "sync_index": observed,
+            "point_id": 7,
+            "x_coord": observed * 1.0,
+            "y_coord": observed * 2.0,
+            "z_coord": observed * 3.0,
+        }
+    )
+
+    xy_filled = gap_fill_xy(xy_base, max_gap_size=max_gap_size)
+    xyz_filled = gap_fill_xyz(xyz_base, max_gap_size=max_gap_size)
+
+    # the gap of max_gap_size is filled; the longer gap is left empty in its entirety
+    expected_sync_index = [0, 1, 2, 3, 4, 9]
+    for filled in [xy_filled, xyz_filled]:
+        assert filled["sync_index"].to_list() == expected_sync_index
+        assert filled["gap_size"].to_list() == [0, 1, 2, 3, 0, 0]
+
+    np.testing.assert_allclose(xy_filled["img_loc_x"], np.array(expected_sync_index) * 10.0)
+    np.testing.assert_allclose(xy_filled["img_loc_y"], np.array(expected_sync_index) * 20.0)
+    np.testing.assert_allclose(xy_filled["frame_time"], np.array(expected_sync_index) / 30)
+    np.testing.assert_allclose(xyz_filled["x_coord"], np.array(expected_sync_index) * 1.0)
+    np.testing.assert_allclose(xyz_filled["z_coord"], np.array(expected_sync_index) * 3.0)
+
 if __name__ == "__main__":
     test_gap_fill_xy()
     test_gap_fill_xyz()
+    test_gap_fill_max_gap_size()
 
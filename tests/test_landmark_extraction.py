@@ -0,0 +1,89 @@
+import caliscope.logger
+
+import numpy as np
+from mediapipe.framework.formats import landmark_pb2
+
+from caliscope.trackers.helper import landmark_id_map, extract_landmarks, combine_landmarks
+from caliscope.trackers.holistic_opensim_tracker import POINT_NAMES, POSE_POINT_IDS, FACE_POINT_IDS
+
+logger = caliscope.logger.get(__name__)
+
+
+def make_landmarks(xy: np.ndarray, visibility: np.ndarray = None):
+    landmarks = landmark_pb2.NormalizedLandmarkList()
+    for i, (x, y) in enumerate(xy):
+        landmark = landmarks.landmark.add()
+        landmark.x, landmark.y = x, y
+        if visibility is not None:
+            landmark.visibility = visibility[i]
+    return landmarks
+
+
+def loop_extract(landmarks, offset, width, height, point_names=None):
+    """
+    the per landmark conversion that extract_landmarks replaces
+    """
+    point_ids = []
+    landmark_xy = []
+    for landmark_id, landmark in enumerate(landmarks.landmark):
+        x, y = int(landmark.x * width), int(landmark.y * height)
+        if landmark.x < 0 or landmark.x > 1 or landmark.y < 0 or landmark.y > 1:
+            pass
+        elif point_names is None or landmark_id + offset in point_names:
+            point_ids.append(landmark_id + offset)
+            landmark_xy.append((x, y))
+    return np.array(point_ids), np.array(landmark_xy)
+
+
+def test_matches_landmark_loop():
+    rng = np.random.default_rng(0)
+    width, height = 1280, 720
+
+    # some landmarks placed beyond the edges of the frame
+    xy = rng.uniform(-0.1, 1.1, (478, 2)).astype(np.float32)
+    face = make_landmarks(xy)
+    point_ids, landmark_xy, confidence = extract_landmarks(face, FACE_POINT_IDS, width, height, in_frame_only=True)
+
+    expected_ids, expected_xy = loop_extract(face, 500, width, height, POINT_NAMES)
+    np.testing.assert_array_equal(point_ids, expected_ids)
+    np.testing.assert_array_equal(landmark_xy, expected_xy)
+    assert set(point_ids).issubset(POINT_NAMES.keys())
+
+    # face mesh does not report visibility
+    assert len(confidence) == len(point_ids)
+    assert np.all(np.isnan(confidence))
+
+
+def test_visibility_as_confidence():
+    rng = np.random.default_rng(1)
+    xy = rng.uniform(0, 1, (33, 2)).astype(np.float32)
+    visibility = rng.uniform(0, 1, 33).astype(np.float32)
+    pose = make_landmarks(xy, visibility)
+
+    point_ids, landmark_xy, confidence = extract_landmarks(pose, POSE_POINT_IDS, 640, 480)
+    keep = POSE_POINT_IDS >= 0
+    np.testing.assert_array_equal(point_ids, POSE_POINT_IDS[keep])
+    np.testing.assert_allclose(confidence, visibility[keep])
+
+    # without the in_frame_only filter every mapped landmark is kept
+    all_point_ids, all_xy, _ = extract_landmarks(make_landmarks(xy - 0.5), landmark_id_map(33), 640, 480)
+    assert len(all_point_ids) == 33
+    np.testing.assert_array_equal(all_xy, np.trunc((xy - 0.5) * (640, 480)).astype(np.int64))
+
+
+def test_combine_landmarks():
+    point_ids, landmark_xy, confidence = combine_landmarks([])
+    assert point_ids.shape == (0,) and landmark_xy.shape == (0, 2) and confidence.shape == (0,)
+
+    hand = make_landmarks(np.full((21, 2), 0.5, dtype=np.float32))
+    left = extract_landmarks(hand, landmark_id_map(21, 200), 100, 100)
+    right = extract_landmarks(hand, landmark_id_map(21, 100), 100, 100)
+    point_ids, landmark_xy, confidence = combine_landmarks([right, left])
+    np.testing.assert_array_equal(point_ids, np.concatenate([np.arange(100, 121), np.arange(200, 221)]))
+    assert landmark_xy.shape == (42, 2)
+
+
+if __name__ == "__main__":
+    test_matches_landmark_loop()
+    test_visibility_as_confidence()
+    test_combine_landmarks()
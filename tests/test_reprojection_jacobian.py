@@ -0,0 +1,82 @@
+import caliscope.logger
+
+import cv2
+import numpy as np
+from pathlib import Path
+
+from caliscope import __root__
+from caliscope.configurator import Configurator
+from caliscope.calibration.capture_volume.capture_volume import (
+    CaptureVolume,
+    xy_reprojection_error,
+    xy_reprojection_jacobian,
+)
+from caliscope.calibration.capture_volume.point_estimates import CAMERA_PARAM_COUNT
+
+logger = caliscope.logger.get(__name__)
+
+
+def get_capture_volume() -> CaptureVolume:
+    session_path = Path(__root__, "tests", "sessions", "post_monocal")
+    config = Configurator(session_path)
+    return CaptureVolume(config.get_camera_array(), config.get_point_estimates())
+
+
+def test_residuals_match_project_points():
+    capture_volume = get_capture_volume()
+    camera_array = capture_volume.camera_array
+    point_estimates = capture_volume.point_estimates
+
+    params = capture_volume.get_vectorized_params()
+    residuals = xy_reprojection_error(params, capture_volume).reshape(-1, 2)
+
+    n_cameras = len(camera_array.port_index)
+    camera_params = params[: n_cameras * CAMERA_PARAM_COUNT].reshape(n_cameras, CAMERA_PARAM_COUNT)
+    points_3d = params[n_cameras * CAMERA_PARAM_COUNT :].reshape(-1, 3)
+
+    for port, slot in camera_array.port_index.items():
+        camera = camera_array.cameras[port]
+        observed = point_estimates.camera_indices == port
+        assert observed.any()
+
+        projected, _ = cv2.projectPoints(
+            points_3d[point_estimates.obj_indices[observed]],
+            camera_params[slot, 0:3],
+            camera_params[slot, 3:6],
+            camera.matrix,
+            camera.distortions,
+        )
+        expected = projected.reshape(-1, 2) - point_estimates.img[observed]
+        np.testing.assert_allclose(residuals[observed], expected, rtol=1e-9, atol=1e-7)
+
+
+def test_jacobian_matches_finite_differences():
+    capture_volume = get_capture_volume()
+    params = capture_volume.get_vectorized_params()
+    jacobian = xy_reprojection_jacobian(params, capture_volume).tocsc()
+    assert jacobian.shape == (2 * capture_volume.point_estimates.n_img_points, params.size)
+
+    # every camera parameter along with a sample of the object point coordinates
+    camera_param_count = len(capture_volume.camera_array.port_index) * CAMERA_PARAM_COUNT
+    rng = np.random.default_rng(0)
+    columns = np.concatenate(
+        [np.arange(camera_param_count), rng.choice(np.arange(camera_param_count, params.size), 60, replace=False)]
+    )
+
+    step = 1e-6
+    for column in columns:
+        offset = np.zeros_like(params)
+        offset[column] = step
+        numeric = (
+            xy_reprojection_error(params + offset, capture_volume)
+            - xy_reprojection_error(params - offset, capture_volume)
+        ) / (2 * step)
+        analytic = jacobian[:, column].toarray().ravel()
+
+        # derivatives run to around a thousand pixels per radian; central differences agree to within rounding
+        np.testing.assert_allclose(analytic, numeric, rtol=1e-6, atol=1e-5)
+
+
+if __name__ == "__main__":
+    test_residuals_match_project_points()
+    test_jacobian_matches_finite_differences()
@@ -0,0 +1,63 @@
+import caliscope.logger
+
+import copy
+import numpy as np
+from pathlib import Path
+
+from caliscope import __root__
+from caliscope.configurator import Configurator
+from caliscope.calibration.capture_volume.capture_volume import CaptureVolume
+
+logger = caliscope.logger.get(__name__)
+
+
+def test_robust_bundle_adjustment():
+    session_path = Path(__root__, "tests", "sessions", "post_optimization")
+    config = Configurator(session_path)
+    capture_volume = CaptureVolume(config.get_camera_array(), config.get_point_estimates())
+
+    # corrupt a small fraction of the observations with gross errors
+    rng = np.random.default_rng(0)
+    n_img_points = capture_volume.point_estimates.n_img_points
+    corrupted = rng.choice(n_img_points, size=n_img_points // 50, replace=False)
+    capture_volume.point_estimates.img[corrupted] += rng.choice([-40.0, 40.0], size=(corrupted.size, 2))
+    corrupted_sync_point = set(
+        zip(
+            capture_volume.point_estimates.sync_indices[corrupted],
+            capture_volume.point_estimates.camera_indices[corrupted],
+            capture_volume.point_estimates.point_id[corrupted],
+        )
+    )
+
+    plain_volume = copy.deepcopy(capture_volume)
+    plain_volume.optimize()
+
+    capture_volume.optimize_robust()
+    assert capture_volume.stage == 1
+
+    # the corrupted observations have been removed from the point estimates...
+    remaining = set(
+        zip(
+            capture_volume.point_estimates.sync_indices,
+            capture_volume.point_estimates.camera_indices,
+            capture_volume.point_estimates.point_id,
+        )
+    )
+    # a point seen by only two cameras cannot reveal a shift along its epipolar line,
+    # so a few corrupted observations may be indistinguishable from good ones
+    assert len(remaining & corrupted_sync_point) < 0.1 * len(corrupted_sync_point)
+    assert capture_volume.point_estimates.n_img_points > 0.85 * n_img_points
+
+    # remaining object points can all still be located
+    obj_counts = np.bincount(capture_volume.point_estimates.obj_indices)
+    assert obj_counts.size == capture_volume.point_estimates.n_obj_points
+    assert (obj_counts > 1).all()
+
+    robust_rmse = capture_volume.rmse
+    logger.info(f"RMSE with plain optimization: {plain_volume.rmse}; with robust optimization {robust_rmse}")
+    assert robust_rmse.keys() == plain_volume.rmse.keys()
+    assert robust_rmse["overall"] < plain_volume.rmse["overall"]
+
+
+if __name__ == "__main__":
+    test_robust_bundle_adjustment()
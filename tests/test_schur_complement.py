@@ -0,0 +1,42 @@
+import caliscope.logger
+
+import copy
+import numpy as np
+from pathlib import Path
+
+from caliscope import __root__
+from caliscope.configurator import Configurator
+from caliscope.calibration.capture_volume.capture_volume import CaptureVolume
+
+logger = caliscope.logger.get(__name__)
+
+
+def test_schur_solver_matches_trf():
+    session_path = Path(__root__, "tests", "sessions", "4_cam_recording")
+    config = Configurator(session_path)
+    capture_volume = CaptureVolume(config.get_camera_array(), config.get_point_estimates())
+
+    # knock the solution off of its optimum so that both solvers have work to do
+    rng = np.random.default_rng(0)
+    params = capture_volume.get_vectorized_params()
+    params = params + rng.normal(0, 0.01, params.size)
+    capture_volume.camera_array.update_extrinsic_params(params)
+    capture_volume.point_estimates.update_obj_xyz(params)
+    initial_rmse = capture_volume.rmse["overall"]
+
+    schur_volume = copy.deepcopy(capture_volume)
+
+    capture_volume.optimize()
+    schur_volume.optimize(solver="schur")
+
+    trf_rmse = capture_volume.rmse
+    schur_rmse = schur_volume.rmse
+    logger.info(f"Initial RMSE: {initial_rmse}; trf: {trf_rmse}; schur: {schur_rmse}")
+
+    assert schur_rmse.keys() == trf_rmse.keys()
+    assert schur_rmse["overall"] < initial_rmse
+    assert abs(schur_rmse["overall"] - trf_rmse["overall"]) < 0.01
+
+
+if __name__ == "__main__":
+    test_schur_solver_matches_trf()
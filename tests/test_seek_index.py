@@ -0,0 +1,122 @@
+import caliscope.logger
+
+import os
+import shutil
+import cv2
+import numpy as np
+from pathlib import Path
+
+from caliscope import __root__
+from caliscope.helper import copy_contents
+from caliscope.recording.seek_index import SeekIndex, FrameSeeker, read_mp4_seek_tables
+from caliscope.recording.video_hash import hash_video
+
+logger = caliscope.logger.get(__name__)
+
+
+def get_video_path() -> Path:
+    original_data_path = Path(__root__, "tests", "sessions", "4_cam_recording", "calibration", "extrinsic")
+    destination_path = Path(__root__, "tests", "sessions_copy_delete", "seek_index")
+    copy_contents(original_data_path, destination_path)
+    return Path(destination_path, "port_1.mp4")
+
+
+def test_seek_tables():
+    video_path = get_video_path()
+    keyframes, frame_times = read_mp4_seek_tables(video_path)
+
+    capture = cv2.VideoCapture(str(video_path))
+    frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = capture.get(cv2.CAP_PROP_FPS)
+    capture.release()
+
+    assert len(frame_times) == frame_count
+    assert keyframes[0] == 0
+    assert np.all(np.diff(keyframes) > 0)
+    assert np.allclose(np.diff(frame_times), 1 / fps)
+
+
+def test_seek_index_persistence():
+    video_path = get_video_path()
+    index_dir = Path(video_path.parent.parent, "seek_index_store")
+    shutil.rmtree(index_dir, ignore_errors=True)
+    index_path = Path(index_dir, f"{hash_video(video_path)}.npz")
+    recording_files = sorted(video_path.parent.iterdir())
+
+    seek_index = SeekIndex.load_or_build(video_path, index_dir)
+    assert index_path.exists()
+    # the recording directory is left as it was
+    assert sorted(video_path.parent.iterdir()) == recording_files
+
+    reloaded = SeekIndex.load_or_build(video_path, index_dir)
+    np.testing.assert_array_equal(seek_index.keyframes, reloaded.keyframes)
+    np.testing.assert_array_equal(seek_index.frame_times, reloaded.frame_times)
+
+    # nearest keyframe at or before a frame
+    for frame_index in range(len(seek_index.frame_times)):
+        keyframe = seek_index.keyframe_before(frame_index)
+        assert keyframe <= frame_index
+        assert keyframe == seek_index.keyframes[seek_index.keyframes <= frame_index].max()
+
+    # an unreadable index is rebuilt rather than trusted
+    index_path.write_bytes(os.urandom(64))
+    rebuilt = SeekIndex.load_or_build(video_path, index_dir)
+    np.testing.assert_array_equal(seek_index.keyframes, rebuilt.keyframes)
+
+    # a copy of the video finds the same index
+    copied_video_path = Path(index_dir, "copy", "port_1.mp4")
+    copied_video_path.parent.mkdir()
+    shutil.copy(video_path, copied_video_path)
+    assert hash_video(copied_video_path) == hash_video(video_path)
+
+    # not an mp4, so there is no index and the seeker falls back to the capture's own seeking
+    not_a_video = Path(video_path.parent, "port_9.mp4")
+    not_a_video.write_bytes(os.urandom(64))
+    assert SeekIndex.load_or_build(not_a_video, index_dir) is None
+
+
+def test_frame_seeker():
+    video_path = get_video_path()
+
+    capture = cv2.VideoCapture(str(video_path))
+    sequential_frames = []
+    while True:
+        success, frame = capture.read()
+        if not success:
+            break
+        sequential_frames.append(frame)
+    capture.release()
+
+    seek_index = SeekIndex.load_or_build(video_path)
+    for index in [seek_index, None]:
+        capture = cv2.VideoCapture(str(video_path))
+        seeker = FrameSeeker(capture, index, cache_size=4)
+
+        rng = np.random.default_rng(42)
+        targets = list(rng.integers(0, len(sequential_frames), 20))
+        # scrubbing back and forth over a few frames
+        targets += [30, 29, 30, 31, 30, 29, 5, 6, 7, 47]
+
+        for frame_index in targets:
+            success, frame = seeker.read(int(frame_index))
+            assert success
+            np.testing.assert_array_equal(frame, sequential_frames[frame_index])
+
+        assert len(seeker.cache) == 4
+
+        # the capture is left ready to decode the frame that was sought
+        assert seeker.seek(20)
+        assert int(capture.get(cv2.CAP_PROP_POS_FRAMES)) == 20
+        success, frame = seeker.read(20)
+        np.testing.assert_array_equal(frame, sequential_frames[20])
+
+        # reading beyond the end fails cleanly
+        success, frame = seeker.read(len(sequential_frames))
+        assert not success
+        capture.release()
+
+
+if __name__ == "__main__":
+    test_seek_tables()
+    test_seek_index_persistence()
+    test_frame_seeker()
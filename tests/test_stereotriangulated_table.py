@@ -0,0 +1,50 @@
+import caliscope.logger
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from caliscope import __root__
+from caliscope.configurator import Configurator
+from caliscope.helper import copy_contents
+from caliscope.calibration.capture_volume.helper_functions.get_stereotriangulated_table import (
+    get_stereotriangulated_table,
+    STEREOTRIANGULATED_COLUMNS,
+)
+
+logger = caliscope.logger.get(__name__)
+
+REFERENCE_TABLE_PATH = Path(
+    __root__, "tests", "reference", "stereotriangulated_table", "stereotriangulated_points.csv"
+)
+
+
+def test_stereotriangulated_table_matches_reference():
+    original_session_path = Path(__root__, "tests", "sessions", "post_optimization")
+    session_path = Path(__root__, "tests", "sessions_copy_delete", "stereotriangulated_table")
+    copy_contents(original_session_path, session_path)
+
+    camera_array = Configurator(session_path).get_camera_array()
+    point_data_path = Path(session_path, "calibration", "extrinsic", "xy.csv")
+    table = get_stereotriangulated_table(camera_array, point_data_path)
+
+    reference = pd.read_csv(REFERENCE_TABLE_PATH)
+    assert list(table.columns) == STEREOTRIANGULATED_COLUMNS
+    assert table.shape == reference.shape
+
+    # same rows in the same order: sync_index, then camera pair, then point_id
+    assert [str(pair) for pair in table["pair"]] == reference["pair"].to_list()
+    for column in ["port_A", "port_B", "sync_index", "point_id"]:
+        np.testing.assert_array_equal(table[column].to_numpy(), reference[column].to_numpy())
+
+    for column in ["x_pos", "y_pos", "z_pos", "x_A", "y_A", "x_B", "y_B"]:
+        np.testing.assert_allclose(table[column].to_numpy(), reference[column].to_numpy(), rtol=1e-9, atol=1e-12)
+
+    # a copy is saved alongside the point data for inspection
+    saved_table = pd.read_csv(Path(point_data_path.parent, "stereotriangulated_points.csv"))
+    assert saved_table.shape[0] == reference.shape[0]
+
+
+if __name__ == "__main__":
+    test_stereotriangulated_table_matches_reference()
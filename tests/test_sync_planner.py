@@ -0,0 +1,110 @@
+import caliscope.logger
+
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from queue import Queue
+from threading import Thread, Event
+
+from caliscope import __root__
+from caliscope.packets import FramePacket
+from caliscope.cameras.sync_planner import PlannedSynchronizer, plan_synchronization, plan_from_frame_time_history
+
+logger = caliscope.logger.get(__name__)
+
+
+def test_plan_matches_live_synchronizer():
+    """
+    xy_HOLISTIC.csv was created by the threaded Synchronizer, so the plan must assign
+    the same frame to each port at every sync index recorded there
+    """
+    recording_dir = Path(__root__, "tests", "sessions", "4_cam_recording", "recording_1")
+    plan = plan_from_frame_time_history(Path(recording_dir, "frame_time_history.csv"))
+
+    xy = pd.read_csv(Path(recording_dir, "HOLISTIC", "xy_HOLISTIC.csv"))
+    observed = xy[["sync_index", "port", "frame_index"]].drop_duplicates()
+
+    merged = observed.merge(plan, on=["sync_index", "port"], how="left", suffixes=("", "_planned"))
+    assert (merged["frame_index"] == merged["frame_index_planned"]).all()
+
+
+def test_plan_with_mismatched_frame_rates():
+    # port 1 runs at twice the frame rate of port 0 so port 0 is absent from every other sync index
+    frame_times = {0: np.arange(0, 10) * 0.1, 1: np.arange(0, 20) * 0.05}
+    plan = plan_synchronization(frame_times)
+
+    # each port advances through its frames in order without skipping any
+    for port, port_plan in plan.groupby("port"):
+        assert (port_plan["frame_index"].to_numpy() == np.arange(len(port_plan))).all()
+        assert port_plan["sync_index"].is_monotonic_increasing
+
+    # the faster port is present at every sync index and paired frames share the same time
+    assert (plan.groupby("sync_index")["port"].apply(lambda ports: 1 in set(ports))).all()
+    paired = plan.pivot(index="sync_index", columns="port", values="frame_time").dropna()
+    assert len(paired) == (plan["port"] == 0).sum()
+    assert np.allclose(paired[0], paired[1])
+
+
+class DroppingStream:
+    """
+    Publishes a packet for each frame in turn, as a RecordedStream would, except for frames
+    in `dropped` (e.g. ones that failed to decode)
+    """
+
+    def __init__(self, port: int, frame_times: np.ndarray, dropped: list):
+        self.port = port
+        self.frame_times = frame_times
+        self.dropped = dropped
+        self.stop_event = Event()
+        self.subscribers = []
+
+    def subscribe(self, q):
+        self.subscribers.append(q)
+
+    def unsubscribe(self, q):
+        self.subscribers.remove(q)
+
+    def play_video(self):
+        self.thread = Thread(target=self._play_worker, daemon=True)
+        self.thread.start()
+
+    def _play_worker(self):
+        for frame_index, frame_time in enumerate(self.frame_times):
+            if frame_index not in self.dropped:
+                for q in self.subscribers:
+                    q.put(FramePacket(self.port, frame_index, frame_time, frame=None))
+        for q in self.subscribers:
+            q.put(FramePacket(self.port, -1, -1, frame=None))
+
+
+def test_planned_synchronizer_with_dropped_frames():
+    frame_times = np.arange(0, 12) / 30
+    dropped = {0: [5, 6], 1: [3, 8, 9]}
+    streams = {port: DroppingStream(port, frame_times, dropped[port]) for port in [0, 1]}
+
+    synchronizer = PlannedSynchronizer(streams)
+    sync_packet_q = Queue()
+    synchronizer.subscribe_to_sync_packets(sync_packet_q)
+    for stream in streams.values():
+        stream.play_video()
+
+    sync_packets = []
+    while (sync_packet := sync_packet_q.get(timeout=10)) is not None:
+        sync_packets.append(sync_packet)
+
+    # every sync index is still published, with the dropped frames left out rather than replaced by later ones
+    planned_frames = synchronizer.plan.pivot(index="sync_index", columns="port", values="frame_index")
+    assert [sync_packet.sync_index for sync_packet in sync_packets] == list(planned_frames.index)
+    for sync_packet in sync_packets:
+        for port, frame_packet in sync_packet.frame_packets.items():
+            planned_frame_index = planned_frames.loc[sync_packet.sync_index, port]
+            if planned_frame_index in dropped[port]:
+                assert frame_packet is None
+            else:
+                assert frame_packet.frame_index == planned_frame_index
+
+
+if __name__ == "__main__":
+    test_plan_matches_live_synchronizer()
+    test_plan_with_mismatched_frame_rates()
+    test_planned_synchronizer_with_dropped_frames()
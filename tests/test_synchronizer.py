@@ -8,6 +8,10 @@ import time
 from caliscope.configurator import Configurator
 from caliscope.helper import copy_contents
 from caliscope.synchronized_stream_manager import SynchronizedStreamManager
+from caliscope.cameras.synchronizer import Synchronizer
+from caliscope.cameras.sync_planner import plan_from_frame_time_history
+from caliscope.recording.recorded_stream import RecordedStream
+from caliscope.recording.video_recorder import VideoRecorder
 
 logger = caliscope.logger.get(__name__)
 
@@ -61,5 +65,52 @@ def test_synchronizer():
         assert group["max"].iloc[i] < group["min"].iloc[i + 1]
 
 
+def test_synchronizer_matches_plan():
+    """
+    Live synchronization of unthrottled recorded streams (with and without a cap on pending frames)
+    must assign exactly the frames computed offline from the recorded frame times
+    """
+    original_session_path = Path(__root__, "tests", "sessions", "4_cam_recording")
+    session_path = Path(
+        original_session_path.parent.parent,
+        "sessions_copy_delete",
+        "synchronizer_plan_test",
+    )
+
+    if session_path.exists() and session_path.is_dir():
+        shutil.rmtree(session_path)
+    copy_contents(original_session_path, session_path)
+
+    config = Configurator(session_path)
+    recording_directory = Path(session_path, "calibration", "extrinsic")
+    planned = plan_from_frame_time_history(Path(recording_directory, "frame_time_history.csv"))
+
+    for max_pending_frames in [None, 3]:
+        streams = {
+            port: RecordedStream(recording_directory, port)
+            for port in config.get_camera_array().cameras.keys()
+        }
+        for stream in streams.values():
+            stream.set_fps_target(None)
+
+        synchronizer = Synchronizer(streams, max_pending_frames=max_pending_frames)
+        recorder = VideoRecorder(synchronizer)
+        destination = Path(recording_directory, f"synched_{max_pending_frames}")
+        recorder.start_recording(destination, include_video=True, store_point_history=False)
+        for stream in streams.values():
+            stream.play_video()
+
+        target_frame_time_path = Path(destination, "frame_time_history.csv")
+        while not target_frame_time_path.exists():
+            time.sleep(0.5)
+        time.sleep(0.5)  # allow file write to complete
+
+        synched = pd.read_csv(target_frame_time_path)
+        merged = synched.merge(planned, on=["sync_index", "port"], how="outer", suffixes=("", "_planned"))
+        assert len(synched) == len(planned)
+        assert (merged["frame_index"] == merged["frame_index_planned"]).all()
+
+
 if __name__ == "__main__":
     test_synchronizer()
+    test_synchronizer_matches_plan()
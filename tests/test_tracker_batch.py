@@ -0,0 +1,80 @@
+import caliscope.logger
+
+from pathlib import Path
+import numpy as np
+
+from caliscope import __root__
+from caliscope.trackers.charuco_tracker import CharucoTracker
+from caliscope.trackers.pose_tracker import PoseTracker
+from caliscope.recording.recorded_stream import RecordedStream
+from tests.helpers import get_charuco, read_frames, assert_same_points, play
+
+logger = caliscope.logger.get(__name__)
+
+RECORDING_DIRECTORY = Path(__root__, "tests", "sessions", "post_monocal", "calibration", "extrinsic")
+
+
+def test_default_batch_matches_single_frames():
+    frames = {port: read_frames(Path(RECORDING_DIRECTORY, f"port_{port}.mp4"), 12) for port in [1, 2]}
+
+    # ports interleaved within the batch as they would be when several streams share a tracker
+    batch_frames, batch_ports = [], []
+    for frame_1, frame_2 in zip(frames[1], frames[2]):
+        batch_frames += [frame_1, frame_2]
+        batch_ports += [1, 2]
+
+    single_tracker = CharucoTracker(get_charuco())
+    expected = [single_tracker.get_points(frame, port, 0) for frame, port in zip(batch_frames, batch_ports)]
+
+    batch_tracker = CharucoTracker(get_charuco())
+    batched = batch_tracker.get_points_batch(batch_frames, batch_ports, [0] * len(batch_frames))
+
+    assert len(batched) == len(expected)
+    for expected_points, batched_points in zip(expected, batched):
+        assert_same_points(expected_points, batched_points)
+
+
+def test_mediapipe_batch_matches_single_frames():
+    frames = read_frames(Path(RECORDING_DIRECTORY, "port_1.mp4"), 6)
+    ports = [1] * len(frames)
+
+    single_tracker = PoseTracker()
+    expected = [single_tracker.get_points(frame, 1, 0) for frame in frames]
+
+    batched = PoseTracker().get_points_batch(frames, ports, [0] * len(frames))
+
+    assert len(batched) == len(expected)
+    for expected_points, batched_points in zip(expected, batched):
+        assert_same_points(expected_points, batched_points)
+
+
+def test_batched_recorded_stream():
+    sequential_frames = read_frames(Path(RECORDING_DIRECTORY, "port_1.mp4"))
+    # runs of consecutive frames as well as gaps that straddle the batches
+    frame_sample = [0, 1, 2, 3, 4, 9, 10, 20, 21, 22, 30, len(sequential_frames) - 1]
+
+    for sample in [None, frame_sample]:
+        single_stream = RecordedStream(RECORDING_DIRECTORY, port=1, tracker=CharucoTracker(get_charuco()), fps_target=None)
+        single_stream.set_frame_sample(sample)
+        expected = play(single_stream)
+
+        batched_stream = RecordedStream(
+            RECORDING_DIRECTORY,
+            port=1,
+            tracker=CharucoTracker(get_charuco()),
+            fps_target=None,
+            tracker_batch_size=4,
+        )
+        batched_stream.set_frame_sample(sample)
+        batched = play(batched_stream)
+
+        assert [packet.frame_index for packet in batched] == [packet.frame_index for packet in expected]
+        for expected_packet, batched_packet in zip(expected, batched):
+            np.testing.assert_array_equal(batched_packet.frame, sequential_frames[batched_packet.frame_index])
+            assert_same_points(expected_packet.points, batched_packet.points)
+
+
+if __name__ == "__main__":
+    test_default_batch_matches_single_frames()
+    test_mediapipe_batch_matches_single_frames()
+    test_batched_recorded_stream()
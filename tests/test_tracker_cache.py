@@ -0,0 +1,238 @@
+import caliscope.logger
+
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+from caliscope import __root__
+from caliscope.helper import copy_contents
+from caliscope.packets import PointPacket
+from caliscope.trackers.charuco_tracker import CharucoTracker
+from caliscope.recording.recorded_stream import RecordedStream
+import caliscope.trackers.tracker_cache as tracker_cache
+from caliscope.trackers.tracker_cache import TrackerCache, encode_points, decode_records, prune_tracker_cache
+from tests.helpers import get_charuco, assert_same_points, play
+
+logger = caliscope.logger.get(__name__)
+
+
+def get_test_directories():
+    original_data_path = Path(__root__, "tests", "sessions", "post_monocal", "calibration", "extrinsic")
+    test_directory = Path(__root__, "tests", "sessions_copy_delete", "tracker_cache")
+    if test_directory.exists():
+        shutil.rmtree(test_directory)
+
+    recording_directory = Path(test_directory, "recording")
+    copy_contents(original_data_path, recording_directory)
+    return recording_directory, Path(test_directory, "cache")
+
+
+class CountingTracker(CharucoTracker):
+    """
+    stateless unless told otherwise, so that any subset of cached frames can be read back
+    """
+
+    def __init__(self, charuco, track_roi=False, pyramid=False):
+        super().__init__(charuco, track_roi=track_roi, pyramid=pyramid)
+        self.tracked_count = 0
+
+    def get_points(self, frame, port, rotation_count):
+        self.tracked_count += 1
+        return super().get_points(frame, port, rotation_count)
+
+
+def test_record_round_trip():
+    charuco_points = PointPacket(
+        np.array([0, 3, 7]),
+        np.array([[1.5, 2.25], [3.0, 4.0], [100.125, 700.5]], dtype=np.float32),
+        np.array([[0, 0, 0], [1, 2, 0], [3, 4, 0]], dtype=np.float32),
+    )
+    mediapipe_points = PointPacket(
+        np.array([0, 100, 500]), np.array([[10, 20], [30, 40], [50, 60]]), confidence=np.array([0.9, np.nan, 0.5])
+    )
+    empty_points = PointPacket(np.array([]), np.array([]), np.array([]))
+
+    buffer = b"".join(
+        [encode_points(0, charuco_points), encode_points(5, mediapipe_points), encode_points(9, empty_points)]
+    )
+    point_packets, valid_length = decode_records(buffer)
+    assert valid_length == len(buffer)
+    assert_same_points(charuco_points, point_packets[0])
+    assert_same_points(mediapipe_points, point_packets[5])
+    assert point_packets[5].obj_loc is None
+    assert len(point_packets[9].point_id) == 0
+
+    # a record cut short is left out
+    point_packets, valid_length = decode_records(buffer[:-3])
+    assert set(point_packets.keys()) == {0, 5}
+    assert valid_length == len(buffer) - len(encode_points(9, empty_points))
+
+
+def test_cache_is_content_addressed():
+    recording_directory, cache_dir = get_test_directories()
+    video_path = Path(recording_directory, "port_1.mp4")
+    tracker = CharucoTracker(get_charuco())
+    points = PointPacket(np.array([1, 2]), np.array([[1.0, 2.0], [3.0, 4.0]], dtype=np.float32))
+
+    cache = TrackerCache(video_path, tracker, cache_dir=cache_dir)
+    assert cache.get(3) is None
+    cache.put(3, points)
+    cache.close()
+
+    # a copy of the video elsewhere finds the same points
+    copied_video_path = Path(recording_directory, "copy", "port_1.mp4")
+    copied_video_path.parent.mkdir()
+    shutil.copy(video_path, copied_video_path)
+    copied_cache = TrackerCache(copied_video_path, CharucoTracker(get_charuco()), cache_dir=cache_dir)
+    assert_same_points(points, copied_cache.get(3))
+    assert copied_cache.covers([3]) and not copied_cache.covers([3, 4])
+
+    # but not with different tracker settings, a different orientation or a different video
+    assert TrackerCache(video_path, CharucoTracker(get_charuco(inverted=False)), cache_dir=cache_dir).get(3) is None
+    assert TrackerCache(video_path, tracker, rotation_count=1, cache_dir=cache_dir).get(3) is None
+    assert TrackerCache(Path(recording_directory, "port_2.mp4"), tracker, cache_dir=cache_dir).get(3) is None
+
+
+def test_stream_reads_cached_points():
+    recording_directory, cache_dir = get_test_directories()
+    default_cache_dir = tracker_cache.TRACKER_CACHE_DIR
+    tracker_cache.TRACKER_CACHE_DIR = cache_dir
+
+    try:
+        frame_sample = [0, 1, 2, 10, 11, 30]
+        for tracker_batch_size in [1, 4]:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+            first_tracker = CountingTracker(get_charuco())
+            stream = RecordedStream(
+                recording_directory,
+                port=1,
+                tracker=first_tracker,
+                fps_target=None,
+                tracker_batch_size=tracker_batch_size,
+                cache_points=True,
+            )
+            stream.set_frame_sample(frame_sample)
+            tracked = play(stream)
+            assert first_tracker.tracked_count == len(frame_sample)
+
+            # played again, every frame is found in the cache, so nothing is tracked or decoded
+            second_tracker = CountingTracker(get_charuco())
+            stream = RecordedStream(
+                recording_directory,
+                port=1,
+                tracker=second_tracker,
+                fps_target=None,
+                tracker_batch_size=tracker_batch_size,
+                cache_points=True,
+            )
+            stream.decode_cached_frames = False
+            stream.set_frame_sample(frame_sample[:3] + [20] + frame_sample[3:])
+            cached = play(stream)
+
+            assert second_tracker.tracked_count == 1  # only the frame that was not in the first playback
+            assert [packet.frame_index for packet in cached] == [0, 1, 2, 10, 11, 20, 30]
+            for packet in cached:
+                if packet.frame_index == 20:
+                    assert packet.frame is not None
+                else:
+                    assert packet.frame is None
+
+            cached = [packet for packet in cached if packet.frame_index != 20]
+            for tracked_packet, cached_packet in zip(tracked, cached):
+                assert_same_points(tracked_packet.points, cached_packet.points)
+    finally:
+        tracker_cache.TRACKER_CACHE_DIR = default_cache_dir
+
+
+def test_stream_rotated_mid_session():
+    recording_directory, cache_dir = get_test_directories()
+    default_cache_dir = tracker_cache.TRACKER_CACHE_DIR
+    tracker_cache.TRACKER_CACHE_DIR = cache_dir
+
+    try:
+        frame_sample = [0, 10, 20, 30]
+        tracker = CountingTracker(get_charuco())
+        stream = RecordedStream(recording_directory, port=1, tracker=tracker, fps_target=None, cache_points=True)
+        stream.set_frame_sample(frame_sample)
+        upright = play(stream)
+        upright_cache = stream._get_tracker_cache()
+        assert upright_cache.rotation_count == 0
+
+        # as IntrinsicStreamManager.set_stream_rotation does
+        stream.rotation_count = 1
+        rotated_cache = stream._get_tracker_cache()
+        assert rotated_cache is not upright_cache
+        assert rotated_cache.rotation_count == 1
+        assert len(rotated_cache) == 0
+
+        play(stream)
+        assert tracker.tracked_count == 2 * len(frame_sample)
+        assert rotated_cache.covers(frame_sample)
+
+        # points tracked while rotated never land under the upright key
+        reloaded = TrackerCache(Path(recording_directory, "port_1.mp4"), tracker, rotation_count=0)
+        for frame_packet in upright:
+            assert_same_points(frame_packet.points, reloaded.get(frame_packet.frame_index))
+    finally:
+        tracker_cache.TRACKER_CACHE_DIR = default_cache_dir
+
+
+def test_stateful_tracker_caches_each_sequence():
+    recording_directory, cache_dir = get_test_directories()
+    default_cache_dir = tracker_cache.TRACKER_CACHE_DIR
+    tracker_cache.TRACKER_CACHE_DIR = cache_dir
+
+    def play_sample(frame_sample):
+        tracker = CountingTracker(get_charuco(), track_roi=True)
+        assert tracker.stateful
+        stream = RecordedStream(recording_directory, port=1, tracker=tracker, fps_target=None, cache_points=True)
+        stream.set_frame_sample(frame_sample)
+        return tracker, play(stream)
+
+    try:
+        first_sample = [0, 1, 2, 3, 4]
+        tracker, tracked = play_sample(first_sample)
+        assert tracker.tracked_count == len(first_sample)
+
+        # the region tracked from frame 2 to frame 3 is not the one tracked from frame 1, so a
+        # different sequence is tracked in full even though its frames were cached
+        second_sample = [0, 1, 3, 4]
+        tracker, _ = play_sample(second_sample)
+        assert tracker.tracked_count == len(second_sample)
+
+        # the same sequence again is read back from the cache
+        tracker, cached = play_sample(first_sample)
+        assert tracker.tracked_count == 0
+        for tracked_packet, cached_packet in zip(tracked, cached):
+            assert_same_points(tracked_packet.points, cached_packet.points)
+    finally:
+        tracker_cache.TRACKER_CACHE_DIR = default_cache_dir
+
+
+def test_prune_tracker_cache():
+    _, cache_dir = get_test_directories()
+    paths = [Path(cache_dir, "CHARUCO", f"{i}.bin") for i in range(4)]
+    paths[0].parent.mkdir(parents=True)
+    for age, path in zip([40, 30, 20, 10], paths):
+        path.write_bytes(bytes(100))
+        modified = path.stat().st_mtime - age
+        os.utime(path, (modified, modified))
+
+    # the oldest files go first, but never one that is about to be used
+    prune_tracker_cache(cache_dir, max_bytes=250, keep=[paths[0]])
+    assert [path.exists() for path in paths] == [True, False, False, True]
+
+    prune_tracker_cache(cache_dir, max_bytes=1000)
+    assert [path.exists() for path in paths] == [True, False, False, True]
+
+
+if __name__ == "__main__":
+    test_record_round_trip()
+    test_cache_is_content_addressed()
+    test_stream_reads_cached_points()
+    test_stream_rotated_mid_session()
+    test_stateful_tracker_caches_each_sequence()
+    test_prune_tracker_cache()
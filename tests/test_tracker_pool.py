@@ -0,0 +1,57 @@
+import caliscope.logger
+
+from functools import partial
+from pathlib import Path
+
+import numpy as np
+
+from caliscope import __root__
+from caliscope.configurator import Configurator
+from caliscope.trackers.charuco_tracker import CharucoTracker
+from caliscope.trackers.tracker_pool import TrackerPool
+from tests.helpers import read_frames
+
+logger = caliscope.logger.get(__name__)
+
+
+def test_tracker_pool():
+    session_path = Path(__root__, "tests", "sessions", "4_cam_recording")
+    charuco = Configurator(session_path).get_charuco()
+    tracker = CharucoTracker(charuco)
+
+    extrinsic_dir = Path(session_path, "calibration", "extrinsic")
+    frames = {port: read_frames(Path(extrinsic_dir, f"port_{port}.mp4"), 10) for port in [1, 2]}
+
+    # one process per port as well as ports sharing a single process
+    for worker_count in [None, 1]:
+        pool = TrackerPool(partial(CharucoTracker, charuco), worker_count=worker_count)
+        assert pool.name == tracker.name
+
+        for port, port_frames in frames.items():
+            for frame in port_frames:
+                expected = tracker.get_points(frame, port, 0)
+                pooled = pool.get_points(frame, port, 0)
+
+                assert np.array_equal(expected.point_id, pooled.point_id)
+                assert np.allclose(expected.img_loc, pooled.img_loc)
+                assert np.allclose(expected.obj_loc, pooled.obj_loc)
+
+        assert len(pool.workers) == (2 if worker_count is None else 1)
+
+        # a batch spanning both ports is split across the workers and returned in the order given
+        batch_frames = frames[1][:5] + frames[2][:5]
+        batch_ports = [1] * 5 + [2] * 5
+        batch_tracker = CharucoTracker(charuco)
+        pooled_batch = pool.get_points_batch(batch_frames, batch_ports, [0] * len(batch_frames))
+        for frame, port, pooled in zip(batch_frames, batch_ports, pooled_batch):
+            expected = batch_tracker.get_points(frame, port, 0)
+            assert np.array_equal(expected.point_id, pooled.point_id)
+            assert np.allclose(expected.img_loc, pooled.img_loc)
+
+        pool.close()
+        assert len(pool.workers) == 0
+        assert len(pool.frame_slots) == 0
+
+
+if __name__ == "__main__":
+    test_tracker_pool()
@@ -0,0 +1,61 @@
+import caliscope.logger
+
+import numpy as np
+import pandas as pd
+import pytest
+from pathlib import Path
+
+from caliscope import __root__
+from caliscope.configurator import Configurator
+from caliscope.triangulate.undistorter import Undistorter
+
+logger = caliscope.logger.get(__name__)
+
+
+def test_undistorter():
+    session_path = Path(__root__, "tests", "sessions", "4_cam_recording")
+    camera_array = Configurator(session_path).get_camera_array()
+
+    xy_path = Path(session_path, "recording_1", "HOLISTIC", "xy_HOLISTIC.csv")
+    xy = pd.read_csv(xy_path)
+
+    undistorter = Undistorter(camera_array)
+    xy_undistorted = undistorter.undistort_xy(xy)
+
+    # row order is retained and the original data is left untouched
+    assert (xy_undistorted.index == xy.index).all()
+    assert "img_loc_undistort_x" not in xy.columns
+
+    # undistorting a single camera gives the same result as undistorting all of them together
+    port = xy["port"].iloc[0]
+    single_port = xy[xy["port"] == port]
+    points = single_port[["img_loc_x", "img_loc_y"]].to_numpy()
+    single_undistorted = undistorter.undistort_points(points, np.full(len(points), port))
+    together = xy_undistorted.loc[single_port.index, ["img_loc_undistort_x", "img_loc_undistort_y"]].to_numpy()
+    assert np.allclose(single_undistorted, together)
+
+    # the mediapipe trackers report integer pixels, so the remap tables should reproduce the iteration
+    remap_undistorter = Undistorter(camera_array, use_remap_tables=True)
+    xy_remapped = remap_undistorter.undistort_xy(xy)
+    max_difference = np.abs(
+        xy_remapped[["img_loc_undistort_x", "img_loc_undistort_y"]].to_numpy()
+        - xy_undistorted[["img_loc_undistort_x", "img_loc_undistort_y"]].to_numpy()
+    ).max()
+    logger.info(f"Maximum difference between remap table and iterative undistortion: {max_difference}")
+    assert max_difference < 0.001
+
+    # sub-pixel points fall back to the iterative undistortion
+    subpixel = np.array([[100.5, 200.25]])
+    assert np.allclose(
+        remap_undistorter.undistort_points(subpixel, [port]),
+        undistorter.undistort_points(subpixel, [port]),
+    )
+
+    # a port without intrinsics is refused rather than borrowing those of a neighbouring port
+    unknown_port = undistorter.ports.max() + 1
+    with pytest.raises(ValueError, match=str(unknown_port)):
+        undistorter.undistort_points(np.array([[100.0, 200.0], [300.0, 400.0]]), [port, unknown_port])
+
+
+if __name__ == "__main__":
+    test_undistorter()
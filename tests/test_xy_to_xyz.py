@@ -1,12 +1,15 @@
 import caliscope.logger
 
 import time
+import numpy as np
 import pandas as pd
 from pathlib import Path
 from caliscope import __root__
 from caliscope.configurator import Configurator
 # from caliscope.post_processing.post_processor import PostProcessor
 from caliscope.triangulate.triangulation import triangulate_xy
+from caliscope.post_processing.post_processor import read_xy_chunks, stream_xyz
+from caliscope.post_processing.gap_filling import gap_fill_xy
 
 from caliscope.helper import copy_contents
 from caliscope.trackers.tracker_enum import TrackerEnum
@@ -64,5 +67,92 @@ def test_xy_to_xyz_postprocessing():
     xyz_history = pd.DataFrame(xyz_history)
     xyz_history.to_csv(output_path)
 
+
+def test_robust_triangulation():
+    origin_data = Path(__root__, "tests", "sessions", "4_cam_recording")
+    config = Configurator(origin_data)
+    camera_array = config.get_camera_array()
+
+    xy_path = Path(origin_data, "recording_1", "HOLISTIC", "xy_HOLISTIC.csv")
+    xy_data = pd.read_csv(xy_path)
+
+    # shift every observation from one camera well off of its true location
+    corrupted_xy = xy_data.copy()
+    corrupted_xy.loc[corrupted_xy["port"] == 1, "img_loc_x"] += 80
+
+    xyz_clean = triangulate_xy(xy_data, camera_array)
+    xyz_plain = triangulate_xy(corrupted_xy, camera_array)
+    xyz_robust = triangulate_xy(corrupted_xy, camera_array, robust=True)
+
+    assert {"reprojection_error", "inlier_count"}.issubset(xyz_robust.columns)
+    assert (xyz_robust["inlier_count"] >= 2).all()
+    assert (xyz_robust["reprojection_error"] < 15).all()
+
+    def median_offset(xyz):
+        merged = xyz_clean.merge(xyz, on=["sync_index", "point_id"])
+        offsets = [merged[f"{axis}_coord_x"] - merged[f"{axis}_coord_y"] for axis in "xyz"]
+        return (sum(offset**2 for offset in offsets) ** 0.5).median()
+
+    logger.info(f"Median offset from uncorrupted: plain {median_offset(xyz_plain)}, robust {median_offset(xyz_robust)}")
+    assert median_offset(xyz_robust) < median_offset(xyz_plain)
+
+
+def test_read_xy_chunks():
+    xy_path = Path(__root__, "tests", "sessions", "4_cam_recording", "recording_1", "HOLISTIC", "xy_HOLISTIC.csv")
+    xy_data = pd.read_csv(xy_path)
+
+    chunks = list(read_xy_chunks(xy_path, chunk_size=5000))
+    assert len(chunks) > 1
+
+    # chunks should cover every row, stay in order and never split a sync index between them
+    assert sum(chunk.shape[0] for chunk in chunks) == xy_data.shape[0]
+    for previous, following in zip(chunks[:-1], chunks[1:]):
+        assert previous["sync_index"].max() < following["sync_index"].min()
+
+
+def test_stream_xyz_matches_single_pass():
+    origin_data = Path(__root__, "tests", "sessions", "4_cam_recording")
+    camera_array = Configurator(origin_data).get_camera_array()
+    test_directory = Path(__root__, "tests", "sessions_copy_delete", "stream_xyz")
+    test_directory.mkdir(parents=True, exist_ok=True)
+    xy_path = Path(test_directory, "xy_HOLISTIC.csv")
+    xyz_path = Path(test_directory, "xyz_HOLISTIC.csv")
+
+    # the opening of the recording is plenty to cover many chunks
+    xy = pd.read_csv(Path(origin_data, "recording_1", "HOLISTIC", "xy_HOLISTIC.csv"))
+    xy[xy["sync_index"] < 80].to_csv(xy_path, index=False)
+
+    # as create_xyz does without chunking
+    xy_gap_fill = 3
+    xy_filled = gap_fill_xy(pd.read_csv(xy_path), max_gap_size=xy_gap_fill)
+    single_pass = triangulate_xy(xy_filled, camera_array)
+
+    # a few sync indices per chunk, so that windows end partway through gaps
+    chunk_size = 1000
+    chunk_ends = [chunk["sync_index"].max() for chunk in read_xy_chunks(xy_path, chunk_size)][:-1]
+    filled = xy_filled[xy_filled["gap_size"] > 0]
+    for port, point_id, sync_index, gap_size in filled[["port", "point_id", "sync_index", "gap_size"]].values:
+        if any(sync_index - gap_size <= chunk_end < sync_index for chunk_end in chunk_ends):
+            break
+    else:
+        raise AssertionError("no gap is split between chunks")
+
+    row_count = stream_xyz(xy_path, xyz_path, camera_array, chunk_size, xy_gap_fill=xy_gap_fill)
+    chunked = pd.read_csv(xyz_path, index_col=0)
+    assert row_count == chunked.shape[0] == single_pass.shape[0]
+
+    def ordered(xyz):
+        return xyz.sort_values(["sync_index", "point_id"]).reset_index(drop=True)
+
+    single_pass = ordered(single_pass)
+    chunked = ordered(chunked)
+    np.testing.assert_array_equal(single_pass[["sync_index", "point_id"]], chunked[["sync_index", "point_id"]])
+    # only the round trip through csv separates them
+    np.testing.assert_allclose(single_pass[["x_coord", "y_coord", "z_coord"]], chunked[["x_coord", "y_coord", "z_coord"]], rtol=1e-12)
+
+
 if __name__ == "__main__":
     test_xy_to_xyz_postprocessing()
+    test_robust_triangulation()
+    test_read_xy_chunks()
+    test_stream_xyz_matches_single_pass()